@@ -57,9 +57,10 @@ def create_app(env=None,name=None):
     # 1. 更新 BASE_LOGGING 中的日志路径
     Config.BASE_LOGGING['handlers']['info_file']['filename'] = Config.LOGGING_INFO_FILE
     Config.BASE_LOGGING['handlers']['error_file']['filename'] = Config.LOGGING_ERROR_FILE
+    Config.BASE_LOGGING['handlers']['slow_query_file']['filename'] = Config.LOGGING_SLOW_QUERY_FILE
 
     # 2. 确保日志目录存在
-    for log_file in [Config.LOGGING_INFO_FILE, Config.LOGGING_ERROR_FILE]:
+    for log_file in [Config.LOGGING_INFO_FILE, Config.LOGGING_ERROR_FILE, Config.LOGGING_SLOW_QUERY_FILE]:
         log_dir = os.path.dirname(log_file)
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir, exist_ok=True)
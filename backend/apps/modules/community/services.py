@@ -5,15 +5,42 @@ from datetime import datetime
 from typing import Dict, Any, List, Optional
 from sanic.log import logger
 
+from apps.modules.tags.services import TagService
+from apps.utils.counter_buffer import counter_buffer
+from apps.utils.fulltext import build_search
+from apps.utils.pagination import (
+    InvalidCursorError, build_cursor_page, build_offset_page, count_total, decode_cursor,
+    invalidate_counts, keyset_condition
+)
+
 
 class CommunityService:
+    COMMENT_LIST_SQL = """
+        SELECT 
+            c.id, c.prompt_id, c.user_id, c.parent_id, c.content, c.is_edited,
+            c.create_time, c.update_time,
+            u.name as user_name, u.avatar as user_avatar,
+            pu.name as parent_user_name
+        FROM prompt_comments c
+        LEFT JOIN users u ON c.user_id = u.id
+        LEFT JOIN prompt_comments pc ON c.parent_id = pc.id
+        LEFT JOIN users pu ON pc.user_id = pu.id
+        WHERE {where}
+        ORDER BY c.create_time ASC, c.id ASC
+        {pagination}
+    """
+
     def __init__(self, db):
         self.db = db
     
     async def get_public_prompts(self, page: int = 1, limit: int = 20, 
                                   sort: str = 'hot', tag: str = None, 
-                                  keyword: str = None, current_user_id: int = None) -> Dict[str, Any]:
-        """获取公开提示词列表"""
+                                  keyword: str = None, current_user_id: int = None,
+                                  cursor: Optional[str] = None, count_mode: str = 'exact') -> Dict[str, Any]:
+        """获取公开提示词列表（传入 cursor 时使用游标分页，count_mode 决定总数计算方式）
+
+        keyword 走全文检索（标题/描述/正文），sort=relevance 时按相关度排序（仅页码分页）
+        """
         try:
             offset = (page - 1) * limit
             
@@ -22,27 +49,51 @@ class CommunityService:
             params = []
             
             if tag:
-                where_clauses.append('(p.tags LIKE ? OR p.tags LIKE ? OR p.tags LIKE ?)')
-                params.extend([f'{tag},%', f'%,{tag},%', f'%,{tag}'])
-            
-            if keyword:
-                where_clauses.append('(p.title LIKE ? OR p.description LIKE ?)')
-                search_term = f'%{keyword}%'
-                params.extend([search_term, search_term])
-            
-            where_sql = ' AND '.join(where_clauses)
-            
-            # 排序逻辑
-            if sort == 'latest':
-                order_sql = 'ORDER BY p.create_time DESC'
+                where_clauses.append(TagService.PUBLIC_TAG_FILTER.format(column='p.id'))
+                params.append(tag.strip())
+            
+            # 关键词检索（全文索引不可用或关键词过短时为 LIKE 条件）
+            search = build_search(self.db, keyword, 'p')
+            filter_clauses, filter_params = list(where_clauses), list(params)
+            if search:
+                where_clauses.append(search.condition)
+                params.extend(search.params)
+            
+            # 排序逻辑（id 作为同值时的次序，保证游标位置唯一）
+            join_sql = ''
+            list_clauses, list_params = where_clauses, params
+            if sort == 'relevance' and cursor is None and search and search.rankable:
+                # 按相关度排序：JOIN 全文命中集合取得分（计数仍只用筛选条件，不必计算得分）
+                search_condition, search_params = search.ranked_filter()
+                join_sql = search.rank_join
+                list_clauses = filter_clauses + ([search_condition] if search_condition else [])
+                list_params = search.rank_join_params + filter_params + search_params + search.rank_params
+                sort_columns = []
+                order_sql = f'ORDER BY {search.rank_sql} DESC, p.id DESC'
+            elif sort == 'latest':
+                sort_columns = ['p.create_time', 'p.id']
+                order_sql = 'ORDER BY p.create_time DESC, p.id DESC'
             else:  # hot
                 # 热度算法: 按hot_score排序
-                order_sql = 'ORDER BY p.hot_score DESC, p.create_time DESC'
+                sort = 'hot'
+                sort_columns = ['p.hot_score', 'p.create_time', 'p.id']
+                order_sql = 'ORDER BY p.hot_score DESC, p.create_time DESC, p.id DESC'
+            
+            total, is_estimate = None, False
+            if cursor is not None:
+                cursor_values = decode_cursor(cursor, sort, len(sort_columns))
+                if cursor_values:
+                    cursor_condition, cursor_params = keyset_condition(sort_columns, cursor_values)
+                    where_clauses.append(cursor_condition)
+                    params.extend(cursor_params)
+            else:
+                # 统计总数
+                total, is_estimate = await count_total(
+                    self.db, count_mode, 'public_prompts',
+                    f"FROM prompts p WHERE {' AND '.join(where_clauses)}", params
+                )
             
-            # 统计总数
-            count_sql = f'SELECT COUNT(*) as total FROM prompts p WHERE {where_sql}'
-            total_row = await self.db.get(count_sql, params)
-            total = total_row['total'] if total_row else 0
+            where_sql = ' AND '.join(list_clauses)
             
             # 查询列表
             query_sql = f"""
@@ -52,34 +103,38 @@ class CommunityService:
                     p.user_id, u.name as author_name, u.avatar as author_avatar,
                     p.view_count, p.use_count, p.like_count, p.comment_count, p.hot_score,
                     p.create_time, p.update_time
-                FROM prompts p
+                FROM prompts p{join_sql}
                 LEFT JOIN users u ON p.user_id = u.id
                 WHERE {where_sql}
                 {order_sql}
-                LIMIT ? OFFSET ?
+                LIMIT ? {'' if cursor is not None else 'OFFSET ?'}
             """
-            params.extend([limit, offset])
-            rows = await self.db.query(query_sql, params)
+            # 多取一行用于判断 has_more
+            list_params = list_params + ([limit + 1] if cursor is not None else [limit + 1, offset])
+            rows = await self.db.query(query_sql, list_params)
             
-            # 查询当前用户的点赞状态
+            # 查询当前用户的点赞状态（多取的一行只用于判断 has_more，跳过）
             items = []
-            for row in rows:
+            for index, row in enumerate(rows):
                 item = self._serialize_row(row)
                 item['is_liked'] = False
                 
-                if current_user_id:
+                if current_user_id and index < limit:
                     like_sql = 'SELECT id FROM prompt_likes WHERE prompt_id = ? AND user_id = ?'
                     like_row = await self.db.get(like_sql, [row['id'], current_user_id])
                     item['is_liked'] = bool(like_row)
                 
                 items.append(item)
             
-            return {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'items': items
-            }
+            if cursor is not None:
+                return build_cursor_page(
+                    items, limit, sort,
+                    lambda row: [row[column.split('.')[1]] for column in sort_columns]
+                )
+            
+            return build_offset_page(items, page, limit, count_mode, total, is_estimate)
+        except InvalidCursorError:
+            raise
         except Exception as exc:
             logger.error(f'❌ 获取公开提示词列表失败: {exc}')
             raise
@@ -99,10 +154,12 @@ class CommunityService:
             
             if not prompt:
                 return None
+            prompt.pop('content_digests', None)
             
-            # 增加浏览次数
+            # 增加浏览次数（叠加尚未写回的增量）
+            pending_views = counter_buffer.pending('prompts', prompt_id, 'view_count')
             await self.increment_view_count(prompt_id)
-            prompt['view_count'] = (prompt.get('view_count') or 0) + 1
+            prompt['view_count'] = (prompt.get('view_count') or 0) + pending_views + 1
             
             # 记录访问足迹（如果用户已登录）
             if current_user_id:
@@ -121,10 +178,9 @@ class CommunityService:
             raise
     
     async def increment_view_count(self, prompt_id: int):
-        """增加浏览次数"""
+        """增加浏览次数（合并写入，定时批量写回）"""
         try:
-            sql = 'UPDATE prompts SET view_count = view_count + 1 WHERE id = ?'
-            await self.db.execute(sql, [prompt_id])
+            await counter_buffer.increment(self.db, 'prompts', prompt_id, 'view_count')
         except Exception as exc:
             logger.error(f'❌ 增加浏览次数失败: {exc}')
     
@@ -195,39 +251,48 @@ class CommunityService:
         except Exception as exc:
             logger.error(f'❌ 更新热度分数失败: {exc}')
     
-    async def get_comments(self, prompt_id: int, page: int = 1, limit: int = 20) -> Dict[str, Any]:
-        """获取评论列表"""
+    async def get_comments(self, prompt_id: int, page: int = 1, limit: int = 20,
+                           cursor: Optional[str] = None, count_mode: str = 'exact') -> Dict[str, Any]:
+        """获取评论列表（传入 cursor 时使用游标分页，count_mode 决定总数计算方式）"""
         try:
             offset = (page - 1) * limit
             
+            if cursor is not None:
+                where_sql = 'c.prompt_id = ? AND c.is_deleted = 0'
+                params: List[Any] = [prompt_id]
+                cursor_values = decode_cursor(cursor, 'create_time', 2)
+                if cursor_values:
+                    cursor_condition, cursor_params = keyset_condition(
+                        ['c.create_time', 'c.id'], cursor_values, descending=False
+                    )
+                    where_sql += f' AND {cursor_condition}'
+                    params.extend(cursor_params)
+                rows = await self.db.query(
+                    self.COMMENT_LIST_SQL.format(where=where_sql, pagination='LIMIT ?'),
+                    params + [limit + 1]
+                )
+                return build_cursor_page(
+                    [self._serialize_row(row) for row in rows], limit, 'create_time',
+                    lambda row: [row['create_time'], row['id']]
+                )
+            
             # 统计总数
-            count_sql = 'SELECT COUNT(*) as total FROM prompt_comments WHERE prompt_id = ? AND is_deleted = 0'
-            total_row = await self.db.get(count_sql, [prompt_id])
-            total = total_row['total'] if total_row else 0
+            total, is_estimate = await count_total(
+                self.db, count_mode, self._comment_count_scope(prompt_id),
+                'FROM prompt_comments WHERE prompt_id = ? AND is_deleted = 0', [prompt_id]
+            )
             
-            # 查询评论列表
-            query_sql = """
-                SELECT 
-                    c.id, c.prompt_id, c.user_id, c.parent_id, c.content, c.is_edited,
-                    c.create_time, c.update_time,
-                    u.name as user_name, u.avatar as user_avatar,
-                    pu.name as parent_user_name
-                FROM prompt_comments c
-                LEFT JOIN users u ON c.user_id = u.id
-                LEFT JOIN prompt_comments pc ON c.parent_id = pc.id
-                LEFT JOIN users pu ON pc.user_id = pu.id
-                WHERE c.prompt_id = ? AND c.is_deleted = 0
-                ORDER BY c.create_time ASC
-                LIMIT ? OFFSET ?
-            """
-            rows = await self.db.query(query_sql, [prompt_id, limit, offset])
+            # 查询评论列表（多取一行用于判断 has_more）
+            query_sql = self.COMMENT_LIST_SQL.format(
+                where='c.prompt_id = ? AND c.is_deleted = 0', pagination='LIMIT ? OFFSET ?'
+            )
+            rows = await self.db.query(query_sql, [prompt_id, limit + 1, offset])
             
-            return {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'items': [self._serialize_row(row) for row in rows]
-            }
+            return build_offset_page(
+                [self._serialize_row(row) for row in rows], page, limit, count_mode, total, is_estimate
+            )
+        except InvalidCursorError:
+            raise
         except Exception as exc:
             logger.error(f'❌ 获取评论列表失败: {exc}')
             raise
@@ -243,6 +308,7 @@ class CommunityService:
                 'parent_id': parent_id
             }
             comment_id = await self.db.table_insert('prompt_comments', fields)
+            invalidate_counts(self.db, self._comment_count_scope(prompt_id))
             
             # 增加评论计数
             update_sql = 'UPDATE prompts SET comment_count = comment_count + 1 WHERE id = ?'
@@ -314,6 +380,7 @@ class CommunityService:
                 UPDATE prompt_comments SET is_deleted = 1 WHERE id IN (SELECT id FROM comment_tree)
             """
             await self.db.execute(delete_sql, [comment_id])
+            invalidate_counts(self.db, self._comment_count_scope(comment['prompt_id']))
             
             # 统计删除的评论数量（包括子回复）
             count_sql = """
@@ -479,6 +546,11 @@ class CommunityService:
             logger.error(f'❌ 获取访问者列表失败: {exc}')
             raise
 
+    @staticmethod
+    def _comment_count_scope(prompt_id: int) -> str:
+        """评论列表计数缓存的域"""
+        return f'comments:{prompt_id}'
+
     @staticmethod
     def _serialize_row(row: Dict[str, Any]) -> Dict[str, Any]:
         """将数据库记录转换为JSON-friendly字典"""
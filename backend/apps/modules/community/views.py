@@ -6,11 +6,15 @@ from sanic_ext import openapi
 from sanic.log import logger
 
 from apps.utils.auth_middleware import auth_required, optional_auth
+from apps.utils.db_utils import error_response, register_unit_of_work
+from apps.utils.pagination import InvalidCursorError, get_cursor_arg, normalize_count_mode
 from .services import CommunityService
 from .models import PromptListQuery, CommentCreate, CommentUpdate
 
 # 创建社区功能蓝图（变量名必须与模块名相同）
 community = Blueprint('community', url_prefix='/api/community')
+# 请求级工作单元：同一请求共用一个连接和事务
+register_unit_of_work(community)
 
 
 @community.get('/prompts')
@@ -18,17 +22,21 @@ community = Blueprint('community', url_prefix='/api/community')
 @openapi.summary('获取公开提示词列表')
 @openapi.parameter('page', int, 'query', description='页码', required=False)
 @openapi.parameter('limit', int, 'query', description='每页数量', required=False)
-@openapi.parameter('sort', str, 'query', description='排序方式: hot/latest', required=False)
+@openapi.parameter('sort', str, 'query', description='排序方式: hot/latest/relevance（按关键词相关度，未指定排序且带关键词时默认）', required=False)
 @openapi.parameter('tag', str, 'query', description='标签筛选', required=False)
 @openapi.parameter('keyword', str, 'query', description='关键词搜索', required=False)
+@openapi.parameter('cursor', str, 'query', description='分页游标（首页传空字符串，后续传上一页的 next_cursor）', required=False)
+@openapi.parameter('count', str, 'query', description='总数计算方式 exact（默认，带缓存）/approx（封顶近似）/none（仅返回 has_more）', required=False)
 async def get_public_prompts(request):
     """获取公开提示词列表（支持分页、筛选、排序）"""
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
-        sort = request.args.get('sort', 'hot')
         tag = request.args.get('tag')
         keyword = request.args.get('keyword')
+        sort = request.args.get('sort') or ('relevance' if keyword and keyword.strip() else 'hot')
+        cursor = get_cursor_arg(request)
+        count_mode = normalize_count_mode(request.args.get('count'))
         
         # 获取当前用户ID（可选）
         current_user_id = getattr(request.ctx, 'user_id', None)
@@ -40,13 +48,17 @@ async def get_public_prompts(request):
             sort=sort,
             tag=tag,
             keyword=keyword,
-            current_user_id=current_user_id
+            current_user_id=current_user_id,
+            cursor=cursor,
+            count_mode=count_mode
         )
         
         return sanic_json({'code': 200, 'data': result})
+    except InvalidCursorError as exc:
+        return error_response(request, 400, str(exc))
     except Exception as exc:
         logger.error(f'❌ 获取公开提示词列表失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'查询失败: {str(exc)}'})
+        return error_response(request, 500, f'查询失败: {str(exc)}')
 
 
 @community.get('/prompts/<prompt_id:int>')
@@ -61,12 +73,12 @@ async def get_prompt_detail(request, prompt_id):
         prompt = await service.get_prompt_detail(prompt_id, current_user_id)
         
         if not prompt:
-            return sanic_json({'code': 404, 'message': '提示词不存在或未公开'})
+            return error_response(request, 404, '提示词不存在或未公开')
         
         return sanic_json({'code': 200, 'data': prompt})
     except Exception as exc:
         logger.error(f'❌ 获取提示词详情失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'查询失败: {str(exc)}'})
+        return error_response(request, 500, f'查询失败: {str(exc)}')
 
 
 @community.post('/prompts/<prompt_id:int>/like')
@@ -83,13 +95,15 @@ async def toggle_like(request, prompt_id):
         return sanic_json({'code': 200, 'data': result})
     except Exception as exc:
         logger.error(f'❌ 切换点赞失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'操作失败: {str(exc)}'})
+        return error_response(request, 500, f'操作失败: {str(exc)}')
 
 
 @community.get('/prompts/<prompt_id:int>/comments')
 @openapi.summary('获取评论列表')
 @openapi.parameter('page', int, 'query', description='页码', required=False)
 @openapi.parameter('limit', int, 'query', description='每页数量', required=False)
+@openapi.parameter('cursor', str, 'query', description='分页游标（首页传空字符串，后续传上一页的 next_cursor）', required=False)
+@openapi.parameter('count', str, 'query', description='总数计算方式 exact（默认，带缓存）/approx（封顶近似）/none（仅返回 has_more）', required=False)
 async def get_comments(request, prompt_id):
     """获取评论列表"""
     try:
@@ -97,12 +111,16 @@ async def get_comments(request, prompt_id):
         limit = int(request.args.get('limit', 20))
         
         service = CommunityService(request.app.ctx.db)
-        result = await service.get_comments(prompt_id, page, limit)
+        result = await service.get_comments(
+            prompt_id, page, limit, get_cursor_arg(request), normalize_count_mode(request.args.get('count'))
+        )
         
         return sanic_json({'code': 200, 'data': result})
+    except InvalidCursorError as exc:
+        return error_response(request, 400, str(exc))
     except Exception as exc:
         logger.error(f'❌ 获取评论列表失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'查询失败: {str(exc)}'})
+        return error_response(request, 500, f'查询失败: {str(exc)}')
 
 
 @community.post('/prompts/<prompt_id:int>/comments')
@@ -118,10 +136,10 @@ async def create_comment(request, prompt_id):
         parent_id = data.get('parent_id')  # 获取parent_id
         
         if not content:
-            return sanic_json({'code': 400, 'message': '评论内容不能为空'})
+            return error_response(request, 400, '评论内容不能为空')
         
         if len(content) > 1000:
-            return sanic_json({'code': 400, 'message': '评论内容不能超过1000个字符'})
+            return error_response(request, 400, '评论内容不能超过1000个字符')
         
         service = CommunityService(request.app.ctx.db)
         comment_id = await service.create_comment(prompt_id, user_id, content, parent_id)
@@ -129,7 +147,7 @@ async def create_comment(request, prompt_id):
         return sanic_json({'code': 200, 'data': {'id': comment_id}, 'message': '评论成功'})
     except Exception as exc:
         logger.error(f'❌ 创建评论失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'操作失败: {str(exc)}'})
+        return error_response(request, 500, f'操作失败: {str(exc)}')
 
 
 @community.put('/comments/<comment_id:int>')
@@ -144,22 +162,22 @@ async def update_comment(request, comment_id):
         content = data.get('content', '').strip()
         
         if not content:
-            return sanic_json({'code': 400, 'message': '评论内容不能为空'})
+            return error_response(request, 400, '评论内容不能为空')
         
         if len(content) > 1000:
-            return sanic_json({'code': 400, 'message': '评论内容不能超过1000个字符'})
+            return error_response(request, 400, '评论内容不能超过1000个字符')
         
         service = CommunityService(request.app.ctx.db)
         await service.update_comment(comment_id, user_id, content)
         
         return sanic_json({'code': 200, 'message': '更新成功'})
     except ValueError as exc:
-        return sanic_json({'code': 404, 'message': str(exc)})
+        return error_response(request, 404, str(exc))
     except PermissionError as exc:
-        return sanic_json({'code': 403, 'message': str(exc)})
+        return error_response(request, 403, str(exc))
     except Exception as exc:
         logger.error(f'❌ 更新评论失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'操作失败: {str(exc)}'})
+        return error_response(request, 500, f'操作失败: {str(exc)}')
 
 
 @community.delete('/comments/<comment_id:int>')
@@ -180,12 +198,12 @@ async def delete_comment(request, comment_id):
         
         return sanic_json({'code': 200, 'message': '删除成功'})
     except ValueError as exc:
-        return sanic_json({'code': 404, 'message': str(exc)})
+        return error_response(request, 404, str(exc))
     except PermissionError as exc:
-        return sanic_json({'code': 403, 'message': str(exc)})
+        return error_response(request, 403, str(exc))
     except Exception as exc:
         logger.error(f'❌ 删除评论失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'操作失败: {str(exc)}'})
+        return error_response(request, 500, f'操作失败: {str(exc)}')
 
 
 @community.get('/prompts/<prompt_id:int>/author-prompts')
@@ -201,7 +219,7 @@ async def get_author_other_prompts(request, prompt_id):
         prompt = await request.app.ctx.db.get(prompt_sql, [prompt_id])
         
         if not prompt:
-            return sanic_json({'code': 404, 'message': '提示词不存在'})
+            return error_response(request, 404, '提示词不存在')
         
         service = CommunityService(request.app.ctx.db)
         prompts = await service.get_author_other_prompts(prompt['user_id'], prompt_id, limit)
@@ -209,7 +227,7 @@ async def get_author_other_prompts(request, prompt_id):
         return sanic_json({'code': 200, 'data': prompts})
     except Exception as exc:
         logger.error(f'❌ 获取作者其他提示词失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'查询失败: {str(exc)}'})
+        return error_response(request, 500, f'查询失败: {str(exc)}')
 
 
 @community.get('/prompts/<prompt_id:int>/playground-shares')
@@ -226,7 +244,7 @@ async def get_related_playground_shares(request, prompt_id):
         return sanic_json({'code': 200, 'data': shares})
     except Exception as exc:
         logger.error(f'❌ 获取相关操练场快照失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'查询失败: {str(exc)}'})
+        return error_response(request, 500, f'查询失败: {str(exc)}')
 
 
 @community.get('/prompts/<prompt_id:int>/visitors')
@@ -243,4 +261,4 @@ async def get_recent_visitors(request, prompt_id):
         return sanic_json({'code': 200, 'data': visitors})
     except Exception as exc:
         logger.error(f'❌ 获取访问者列表失败: {exc}')
-        return sanic_json({'code': 500, 'message': f'查询失败: {str(exc)}'})
+        return error_response(request, 500, f'查询失败: {str(exc)}')
@@ -6,10 +6,18 @@ from typing import Any, Dict, List, Optional
 
 from sanic.log import logger
 
+from apps.utils.counter_buffer import counter_buffer
+from apps.utils.pagination import (
+    build_cursor_page, build_offset_page, count_total, decode_cursor, invalidate_counts, keyset_condition
+)
 from apps.utils.password_utils import PasswordUtil
+from apps.utils.text_blobs import externalize_rows, release_rows, resolve_rows
 
 MAX_PAYLOAD_BYTES = 1024 * 1024  # 1MB
 ALLOWED_ACCESS_MODES = {'public', 'auth_only'}
+# 外置到 text_blobs 的大文本字段
+BLOB_FIELDS = ('system_prompt', 'messages_json')
+EXTERNALIZE_BATCH_SIZE = 200
 
 
 class PlaygroundShareService:
@@ -97,44 +105,74 @@ class PlaygroundShareService:
             'is_active': 1
         }
 
-        await self.db.table_insert('playground_shares', fields)
+        # 系统提示词与对话快照较大时外置到 text_blobs，相同内容的多次分享只存一份；
+        # 引用计数与分享行在同一事务中写入，插入失败时一并回滚
+        uow, token = self.db.begin_unit_of_work()
+        commit = False
+        try:
+            await externalize_rows(self.db, [fields], BLOB_FIELDS)
+            await self.db.table_insert('playground_shares', fields)
+            commit = True
+        finally:
+            await self.db.end_unit_of_work(uow, token, commit)
+        invalidate_counts(self.db, self._count_scope(user_id))
         logger.info(f'✅ 操练场分享创建成功: user_id={user_id}, share_code={share_code}')
         return {
             'share_code': share_code,
             'share_path': f'/playground/share/{share_code}'
         }
 
-    async def list_shares(self, user_id: int, page: int = 1, limit: int = 10) -> Dict[str, Any]:
-        offset = (page - 1) * limit if page > 0 else 0
-        total_sql = 'SELECT COUNT(*) as total FROM playground_shares WHERE user_id = ?'
-        total_row = await self.db.get(total_sql, [user_id])
-        total = total_row['total'] if total_row else 0
-
-        query = (
-            "SELECT share_code, title, access_mode, is_permanent, expires_at, view_count, "
+    async def list_shares(self, user_id: int, page: int = 1, limit: int = 10,
+                          cursor: Optional[str] = None, count_mode: str = 'exact') -> Dict[str, Any]:
+        """分享列表；传入 cursor（首页传空字符串）时按 (create_time, id) 游标分页，count_mode 决定总数计算方式"""
+        select_sql = (
+            "SELECT id, share_code, title, access_mode, is_permanent, expires_at, view_count, "
             "password_hash, is_active, create_time "
-            "FROM playground_shares WHERE user_id = ? ORDER BY create_time DESC LIMIT ? OFFSET ?"
+            "FROM playground_shares WHERE user_id = ?"
         )
-        rows = await self.db.query(query, [user_id, limit, offset])
+        if cursor is not None:
+            params: List[Any] = [user_id]
+            cursor_values = decode_cursor(cursor, 'create_time', 2)
+            if cursor_values:
+                cursor_condition, cursor_params = keyset_condition(['create_time', 'id'], cursor_values)
+                select_sql += f" AND {cursor_condition}"
+                params.extend(cursor_params)
+            rows = await self.db.query(select_sql + " ORDER BY create_time DESC, id DESC LIMIT ?", params + [limit + 1])
+            page_result = build_cursor_page([self._serialize_row(row) for row in rows], limit, 'create_time',
+                                            lambda row: [row['create_time'], row['id']])
+            page_result['items'] = [self._format_share_item(row) for row in page_result['items']]
+            return page_result
+
+        offset = (page - 1) * limit if page > 0 else 0
+        total, is_estimate = await count_total(
+            self.db, count_mode, self._count_scope(user_id),
+            'FROM playground_shares WHERE user_id = ?', [user_id]
+        )
+
+        query = select_sql + " ORDER BY create_time DESC, id DESC LIMIT ? OFFSET ?"
+        rows = await self.db.query(query, [user_id, limit + 1, offset])
         items = []
         for row in rows:
-            normalized = self._serialize_row(row)
-            items.append({
-                'share_code': normalized.get('share_code'),
-                'title': normalized.get('title'),
-                'access_mode': normalized.get('access_mode'),
-                'is_permanent': bool(normalized.get('is_permanent')),
-                'expires_at': normalized.get('expires_at'),
-                'view_count': normalized.get('view_count', 0),
-                'has_password': bool(normalized.get('password_hash')),
-                'is_active': bool(normalized.get('is_active', 1)),
-                'create_time': normalized.get('create_time')
-            })
+            items.append(self._format_share_item(self._serialize_row(row)))
+        return build_offset_page(items, page, limit, count_mode, total, is_estimate)
+
+    @staticmethod
+    def _count_scope(user_id: int) -> str:
+        """分享列表计数缓存的域"""
+        return f'shares:{user_id}'
+
+    @staticmethod
+    def _format_share_item(normalized: Dict[str, Any]) -> Dict[str, Any]:
         return {
-            'total': total,
-            'page': page,
-            'limit': limit,
-            'items': items
+            'share_code': normalized.get('share_code'),
+            'title': normalized.get('title'),
+            'access_mode': normalized.get('access_mode'),
+            'is_permanent': bool(normalized.get('is_permanent')),
+            'expires_at': normalized.get('expires_at'),
+            'view_count': normalized.get('view_count', 0),
+            'has_password': bool(normalized.get('password_hash')),
+            'is_active': bool(normalized.get('is_active', 1)),
+            'create_time': normalized.get('create_time')
         }
 
     async def get_share_for_viewer(self, share_code: str) -> Optional[Dict[str, Any]]:
@@ -144,23 +182,70 @@ class PlaygroundShareService:
             "WHERE ps.share_code = ?"
         )
         result = await self.db.get(sql, [share_code])
-        return self._serialize_row(result) if result else None
+        if not result:
+            return None
+        await resolve_rows(self.db, [result], BLOB_FIELDS)
+        return self._serialize_row(result)
 
     async def record_view(self, share_id: int):
+        """记录一次访问（合并写入，定时批量写回）"""
         now_str = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        update_sql = (
-            "UPDATE playground_shares SET view_count = view_count + 1, last_access_time = ? "
-            "WHERE id = ?"
+        await counter_buffer.increment(
+            self.db, 'playground_shares', share_id, 'view_count', touch={'last_access_time': now_str}
         )
-        await self.db.execute(update_sql, [now_str, share_id])
 
     async def delete_share(self, user_id: int, share_code: str) -> bool:
-        """物理删除分享记录"""
-        sql = "DELETE FROM playground_shares WHERE user_id = ? AND share_code = ?"
-        await self.db.execute(sql, [user_id, share_code])
+        """物理删除分享记录（与引用计数回退在同一事务中）"""
+        uow, token = self.db.begin_unit_of_work()
+        commit = False
+        try:
+            shares = await self.db.query(
+                f"SELECT {', '.join(BLOB_FIELDS)} FROM playground_shares WHERE user_id = ? AND share_code = ?",
+                [user_id, share_code]
+            )
+            sql = "DELETE FROM playground_shares WHERE user_id = ? AND share_code = ?"
+            if await self.db.execute(sql, [user_id, share_code]):
+                await release_rows(self.db, shares, BLOB_FIELDS)
+            commit = True
+        finally:
+            await self.db.end_unit_of_work(uow, token, commit)
+        invalidate_counts(self.db, self._count_scope(user_id))
         logger.info(f'✅ 删除操练场分享: user_id={user_id}, share_code={share_code}')
         return True
 
+    async def externalize_existing(self) -> Dict[str, int]:
+        """
+        将已有分享中的大文本改存为 text_blobs 引用
+
+        按 id 分批处理，每批一个事务；可重复执行，已外置的行不再改写。
+        """
+        result = {'shares': 0, 'rows': 0}
+        last_id = 0
+        while True:
+            batch = await self.db.query(
+                f"SELECT id, {', '.join(BLOB_FIELDS)} FROM playground_shares WHERE id > ? ORDER BY id LIMIT ?",
+                [last_id, EXTERNALIZE_BATCH_SIZE]
+            )
+            if not batch:
+                return result
+            last_id = batch[-1]['id']
+            result['shares'] += len(batch)
+            originals = [dict(row) for row in batch]
+
+            uow, token = self.db.begin_unit_of_work()
+            commit = False
+            try:
+                await externalize_rows(self.db, batch, BLOB_FIELDS)
+                for row, original in zip(batch, originals):
+                    if row != original:
+                        await self.db.table_update(
+                            'playground_shares', {field: row[field] for field in BLOB_FIELDS}, f"id = {int(row['id'])}"
+                        )
+                        result['rows'] += 1
+                commit = True
+            finally:
+                await self.db.end_unit_of_work(uow, token, commit)
+
     async def update_share(self, user_id: int, share_code: str, payload: Dict[str, Any]) -> bool:
         existing = await self.db.get(
             "SELECT id FROM playground_shares WHERE user_id = ? AND share_code = ?",
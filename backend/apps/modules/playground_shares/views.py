@@ -8,6 +8,8 @@ from sanic_ext import openapi
 from sanic.log import logger
 
 from apps.utils.auth_middleware import auth_required, optional_auth
+from apps.utils.counter_buffer import counter_buffer
+from apps.utils.pagination import InvalidCursorError, get_cursor_arg, normalize_count_mode
 from apps.utils.password_utils import PasswordUtil
 from .models import (
     CreateShareRequest,
@@ -40,6 +42,8 @@ async def create_share(request):
 @playground_shares.get('/')
 @auth_required
 @openapi.summary('获取我的分享列表')
+@openapi.parameter('cursor', str, 'query', description='分页游标（首页传空字符串，后续传上一页的 next_cursor）', required=False)
+@openapi.parameter('count', str, 'query', description='总数计算方式 exact（默认，带缓存）/approx（封顶近似）/none（仅返回 has_more）', required=False)
 @openapi.response(200, {"application/json": ShareListResponse})
 async def list_shares(request):
     try:
@@ -51,8 +55,12 @@ async def list_shares(request):
         if limit < 1 or limit > 50:
             limit = 10
         service = PlaygroundShareService(request.app.ctx.db)
-        data = await service.list_shares(user_id, page, limit)
+        data = await service.list_shares(
+            user_id, page, limit, get_cursor_arg(request), normalize_count_mode(request.args.get('count'))
+        )
         return sanic_json({'code': 200, 'data': data})
+    except InvalidCursorError as exc:
+        return sanic_json({'code': 400, 'message': str(exc)})
     except Exception as exc:
         logger.error(f'❌ 获取分享列表失败: {exc}')
         return sanic_json({'code': 500, 'message': '获取分享列表失败'})
@@ -99,6 +107,8 @@ async def get_share(request, share_code):
                 'content': share.get('artifact_content')
             }
 
+        # 叠加尚未写回的访问次数
+        pending_views = counter_buffer.pending('playground_shares', share['id'], 'view_count')
         await service.record_view(share['id'])
 
         response = {
@@ -114,7 +124,7 @@ async def get_share(request, share_code):
                 'avatar': share.get('owner_avatar')
             },
             'created_at': share.get('create_time'),
-            'view_count': (share.get('view_count') or 0) + 1,
+            'view_count': (share.get('view_count') or 0) + pending_views + 1,
             'access_mode': access_mode,
             'is_permanent': bool(share.get('is_permanent')),
             'expires_at': share.get('expires_at'),
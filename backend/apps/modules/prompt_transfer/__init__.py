@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""提示词批量导入导出模块"""
@@ -0,0 +1,23 @@
+"""OpenAPI 模型定义"""
+from sanic_ext import openapi
+
+
+@openapi.component
+class ImportRowError:
+    line: int = openapi.Integer(description="行号（从1开始）")
+    message: str = openapi.String(description="错误原因")
+
+
+@openapi.component
+class ImportResult:
+    imported: int = openapi.Integer(description="成功导入的行数")
+    failed: int = openapi.Integer(description="失败的行数")
+    truncated: bool = openapi.Boolean(description="是否因超过单次导入上限而忽略了后续行")
+    errors: list = openapi.Array(ImportRowError, description="失败行明细（最多返回前100条）")
+
+
+@openapi.component
+class ImportResponse:
+    code: int = openapi.Integer(description="状态码", default=200)
+    message: str = openapi.String(description="响应消息")
+    data: ImportResult = openapi.Object(ImportResult, description="导入结果")
@@ -0,0 +1,261 @@
+"""
+提示词批量导入导出服务
+
+导出：按 id 顺序通过服务端游标分批读取，每个提示词输出一行 JSON（NDJSON），可附带版本历史。
+导入：逐行解析并校验 NDJSON，每 IMPORT_CHUNK_SIZE 行在一个事务内写入提示词、初始版本
+（多行插入）与标签关联（批量 upsert）；某批写入失败时回滚该批并逐行重试，只跳过出错的行。
+"""
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sanic.log import logger
+
+from apps.modules.prompts.services import PromptService
+from apps.modules.tags.services import TagService
+from apps.modules.versions.services import VersionService
+from apps.utils.library_cache import invalidate_library
+from apps.utils.version_storage import STORAGE_COLUMNS, expand_versions, store_keyframes
+
+EXPORT_COLUMNS = (
+    'id', 'title', 'description', 'requirement_report', 'thinking_points', 'initial_prompt', 'advice',
+    'final_prompt', 'language', 'format', 'prompt_type', 'system_prompt', 'conversation_history',
+    'tags', 'is_favorite', 'is_public', 'current_version', 'create_time', 'update_time'
+)
+VERSION_EXPORT_COLUMNS = (
+    'version_number', 'version_type', 'version_tag', 'title', 'description', 'requirement_report',
+    'thinking_points', 'initial_prompt', 'advice', 'final_prompt', 'language', 'format', 'tags',
+    'system_prompt', 'conversation_history', 'change_log', 'change_summary', 'change_type', 'create_time'
+)
+# 导入时接受的文本字段
+IMPORT_TEXT_FIELDS = (
+    'title', 'description', 'requirement_report', 'initial_prompt', 'final_prompt',
+    'language', 'format', 'system_prompt', 'conversation_history'
+)
+PROMPT_TYPES = ('system', 'user')
+TRUE_VALUES = (1, '1', True, 'true')
+
+IMPORT_CHUNK_SIZE = 200
+MAX_IMPORT_ROWS = 5000
+MAX_IMPORT_LINE_BYTES = 2 * 1024 * 1024  # 2MB
+MAX_REPORTED_ERRORS = 100
+
+# 导入的提示词统一创建 1.0.0 初始版本
+INITIAL_VERSION = {
+    'change_type': 'initial',
+    'change_summary': '导入',
+    'change_log': '批量导入提示词',
+    'version_tag': 'initial'
+}
+
+
+class PromptTransferService:
+    def __init__(self, db):
+        self.db = db
+
+    # ============ 导出 ============
+
+    async def export_lines(self, user_id: int, include_versions: bool = False) -> AsyncIterator[str]:
+        """按批生成 NDJSON 文本，每批对应服务端游标的一次拉取"""
+        sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM prompts WHERE user_id = ? ORDER BY id"
+        batches = self.db.stream_batches(sql, [user_id])
+        try:
+            async for batch in batches:
+                versions = await self._load_versions([row['id'] for row in batch]) if include_versions else {}
+                lines = []
+                for row in batch:
+                    item = self._export_item(row)
+                    if include_versions:
+                        item['versions'] = [self._export_item(version) for version in versions.get(row['id'], [])]
+                    lines.append(json.dumps(item, ensure_ascii=False, default=str))
+                yield '\n'.join(lines) + '\n'
+        finally:
+            await batches.aclose()
+
+    async def _load_versions(self, prompt_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """一条查询取出一批提示词的全部版本"""
+        if not prompt_ids:
+            return {}
+        placeholders = ', '.join(['?'] * len(prompt_ids))
+        rows = await self.db.query(
+            f"SELECT id, prompt_id, {', '.join(VERSION_EXPORT_COLUMNS + STORAGE_COLUMNS)} FROM prompt_versions "
+            f"WHERE prompt_id IN ({placeholders}) AND is_deleted = 0 ORDER BY prompt_id, id",
+            prompt_ids
+        )
+        # 差量版本由关键帧还原
+        await expand_versions(self.db, rows)
+        versions: Dict[int, List[Dict[str, Any]]] = {}
+        for row in rows:
+            row.pop('id')
+            versions.setdefault(row.pop('prompt_id'), []).append(row)
+        return versions
+
+    @staticmethod
+    def _export_item(row: Dict[str, Any]) -> Dict[str, Any]:
+        item = dict(row)
+        for field in ('thinking_points', 'advice'):
+            try:
+                item[field] = json.loads(item[field]) if item.get(field) else []
+            except ValueError:
+                item[field] = []
+        item['tags'] = PromptService._parse_tags(item.get('tags'))
+        for field in ('is_favorite', 'is_public'):
+            if field in item:
+                item[field] = bool(item[field])
+        return item
+
+    # ============ 导入 ============
+
+    async def import_ndjson(self, user_id: int, chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+        """
+        导入 NDJSON 请求体
+
+        Args:
+            chunks: 请求体分块
+        Returns:
+            dict: {imported, failed, truncated, errors: [{line, message}]}
+        """
+        result = {'imported': 0, 'failed': 0, 'truncated': False, 'errors': []}
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+        accepted = 0
+        line_no = 0
+        async for raw in self._iter_lines(chunks):
+            line_no += 1
+            if result['truncated']:
+                # 超过上限后仍读完请求体，但不再处理
+                continue
+            if raw is None:
+                self._record_error(result, line_no, '单行内容超过 2MB')
+                continue
+            if not raw.strip():
+                continue
+            if accepted >= MAX_IMPORT_ROWS:
+                result['truncated'] = True
+                continue
+            accepted += 1
+            try:
+                pending.append((line_no, self.parse_row(raw)))
+            except ValueError as exc:
+                self._record_error(result, line_no, str(exc))
+                continue
+            if len(pending) >= IMPORT_CHUNK_SIZE:
+                await self._flush(user_id, pending, result)
+                pending = []
+        if pending:
+            await self._flush(user_id, pending, result)
+
+        if result['imported']:
+            PromptService.invalidate_list_counts(self.db, user_id)
+            invalidate_library(self.db, user_id)
+        logger.info(
+            f"✅ 批量导入提示词: user_id={user_id}, imported={result['imported']}, failed={result['failed']}"
+        )
+        return result
+
+    @staticmethod
+    async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Optional[bytes]]:
+        """按换行切分请求体；超长的行整行丢弃并以 None 占位"""
+        buffer = b''
+        skipping = False
+        async for chunk in chunks:
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if skipping:
+                    # 超长行的剩余部分
+                    skipping = False
+                    continue
+                yield line if len(line) <= MAX_IMPORT_LINE_BYTES else None
+            if skipping:
+                buffer = b''
+            elif len(buffer) > MAX_IMPORT_LINE_BYTES:
+                yield None
+                skipping = True
+                buffer = b''
+        if buffer and not skipping:
+            yield buffer
+
+    @staticmethod
+    def parse_row(raw: bytes) -> Dict[str, Any]:
+        """解析并校验一行导入数据，返回可直接用于建表字段的数据字典"""
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            raise ValueError('不是有效的 JSON')
+        if not isinstance(data, dict):
+            raise ValueError('每行需为一个 JSON 对象')
+
+        for field in IMPORT_TEXT_FIELDS:
+            if data.get(field) is not None and not isinstance(data[field], str):
+                raise ValueError(f'{field} 需为字符串')
+        if not (data.get('title') or '').strip():
+            raise ValueError('标题不能为空')
+        if not (data.get('final_prompt') or '').strip():
+            raise ValueError('最终提示词不能为空')
+
+        prompt_type = data.get('prompt_type') or 'system'
+        if prompt_type not in PROMPT_TYPES:
+            raise ValueError('prompt_type 需为 system 或 user')
+
+        tags = data.get('tags') or []
+        if isinstance(tags, str):
+            tags = tags.split(',')
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            raise ValueError('tags 需为字符串数组')
+
+        for field in ('thinking_points', 'advice'):
+            if data.get(field) is not None and not isinstance(data[field], list):
+                raise ValueError(f'{field} 需为数组')
+
+        row = {field: data[field] for field in IMPORT_TEXT_FIELDS if data.get(field) is not None}
+        row['prompt_type'] = prompt_type
+        row['tags'] = TagService.normalize_tag_names(tags)
+        row['thinking_points'] = data.get('thinking_points') or []
+        row['advice'] = data.get('advice') or []
+        row['is_public'] = 1 if data.get('is_public') in TRUE_VALUES else 0
+        row['is_favorite'] = 1 if data.get('is_favorite') in TRUE_VALUES else 0
+        return row
+
+    async def _flush(self, user_id: int, rows: List[Tuple[int, Dict[str, Any]]], result: Dict[str, Any]):
+        """写入一批；失败时回滚并逐行重试，定位出错的行"""
+        try:
+            await self._insert_chunk(user_id, [data for _, data in rows])
+            result['imported'] += len(rows)
+        except Exception as exc:
+            if len(rows) == 1:
+                # 数据库异常只返回驱动给出的原因，不附带 SQL
+                self._record_error(result, rows[0][0], f"写入失败: {getattr(exc, 'orig', None) or exc}")
+                return
+            logger.warning(f'⚠️  导入批次写入失败，逐行重试: {exc}')
+            for row in rows:
+                await self._flush(user_id, [row], result)
+
+    async def _insert_chunk(self, user_id: int, rows: List[Dict[str, Any]]):
+        """在一个事务内写入一批提示词及其初始版本、标签关联"""
+        uow, token = self.db.begin_unit_of_work()
+        commit = False
+        try:
+            versions = []
+            prompt_tags = {}
+            for data in rows:
+                fields = await PromptService.build_prompt_fields(user_id, data)
+                fields['is_favorite'] = data['is_favorite']
+                # 需要逐行取得自增ID，提示词本身逐条插入（同一连接与事务内）
+                prompt_id = await self.db.table_insert('prompts', fields)
+                versions.append(VersionService.build_version_fields(
+                    prompt_id, user_id, fields, '1.0.0', INITIAL_VERSION, fields['content_hash']
+                ))
+                if data['tags']:
+                    prompt_tags[prompt_id] = data['tags']
+
+            await store_keyframes(self.db, versions)
+            await self.db.table_insert_many('prompt_versions', versions)
+            await TagService(self.db).add_prompt_tags(user_id, prompt_tags)
+            commit = True
+        finally:
+            await self.db.end_unit_of_work(uow, token, commit)
+
+    @staticmethod
+    def _record_error(result: Dict[str, Any], line_no: int, message: str):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'line': line_no, 'message': message})
@@ -0,0 +1,83 @@
+"""
+提示词批量导入导出路由
+与提示词路由共用 /api/prompts 前缀；导入按批自行管理事务，因此不注册请求级工作单元
+"""
+import datetime
+import json as jsonlib
+
+from sanic import Blueprint
+from sanic.response import json
+from sanic_ext import openapi
+from sanic.log import logger
+
+from apps.utils.auth_middleware import auth_required
+from .models import ImportResponse
+from .services import MAX_IMPORT_ROWS, PromptTransferService
+
+
+prompt_transfer = Blueprint('prompt_transfer', url_prefix='/api/prompts')
+
+
+@prompt_transfer.get('/export')
+@auth_required
+@openapi.summary("导出提示词(NDJSON)")
+@openapi.description("流式导出当前用户的全部提示词,每行一个JSON对象")
+@openapi.secured("BearerAuth")
+@openapi.parameter("versions", bool, "query", description="是否附带版本历史", required=False)
+async def export_prompts(request):
+    """流式导出，响应头发出后的错误以一行 {"error": ...} 结尾"""
+    user_id = request.ctx.user_id
+    include_versions = request.args.get('versions', '').lower() in ('1', 'true', 'yes')
+    service = PromptTransferService(request.app.ctx.db)
+
+    filename = f"prompts-{datetime.date.today().strftime('%Y%m%d')}.ndjson"
+    response = await request.respond(
+        content_type='application/x-ndjson; charset=utf-8',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+    try:
+        async for chunk in service.export_lines(user_id, include_versions):
+            await response.send(chunk)
+    except Exception as e:
+        logger.error(f'❌ 导出提示词失败: {e}')
+        await response.send(jsonlib.dumps({'error': '导出中断'}, ensure_ascii=False) + '\n')
+    await response.eof()
+
+
+@prompt_transfer.post('/import', stream=True)
+@auth_required
+@openapi.summary("导入提示词(NDJSON)")
+@openapi.description(
+    f"请求体为NDJSON,每行一个提示词(字段同导出格式,至少包含title与final_prompt),单次最多{MAX_IMPORT_ROWS}行;"
+    "逐行校验,出错的行单独跳过并返回行号与原因,其余行照常导入并创建初始版本"
+)
+@openapi.secured("BearerAuth")
+@openapi.response(200, {"application/json": ImportResponse}, description="导入完成")
+async def import_prompts(request):
+    """导入提示词"""
+    try:
+        user_id = request.ctx.user_id
+        service = PromptTransferService(request.app.ctx.db)
+        result = await service.import_ndjson(user_id, _read_body(request))
+
+        return json({
+            'code': 200,
+            'message': f"导入完成: 成功 {result['imported']} 条, 失败 {result['failed']} 条",
+            'data': result
+        })
+
+    except Exception as e:
+        logger.error(f'❌ 导入提示词失败: {e}')
+        return json({
+            'code': 500,
+            'message': f'导入失败: {str(e)}'
+        })
+
+
+async def _read_body(request):
+    """逐块读取流式请求体"""
+    while True:
+        chunk = await request.stream.read()
+        if chunk is None:
+            break
+        yield chunk
@@ -54,6 +54,8 @@ class PromptListItem:
     id: int = openapi.Integer(description="提示词ID")
     title: str = openapi.String(description="标题")
     description: str = openapi.String(description="描述")
+    final_prompt: str = openapi.String(description="最终提示词（view=full）")
+    preview: str = openapi.String(description="正文预览，前200字（view=summary）")
     language: str = openapi.String(description="语言")
     format: str = openapi.String(description="格式")
     prompt_type: str = openapi.String(description="提示词类型")
@@ -4,14 +4,45 @@
 """
 import json
 import datetime
-import hashlib
-import re
 from sanic.log import logger
 
+from apps.modules.tags.services import TagService
+from apps.utils.content_hash import (
+    CONTENT_FIELDS, combine_digests, compute_digests, dump_digests, load_digests
+)
+from apps.utils.counter_buffer import counter_buffer
+from apps.utils.fulltext import build_search
+from apps.utils.library_cache import invalidate_library, library_cache, library_scope
+from apps.utils.pagination import (
+    build_cursor_page, build_offset_page, count_total, decode_cursor,
+    invalidate_counts, keyset_condition
+)
+from apps.utils.version_storage import delete_prompt_versions, load_keyframe_refs
+
 
 class PromptService:
     """提示词服务类"""
-    CONTENT_FIELDS = ('final_prompt', 'system_prompt', 'initial_prompt', 'conversation_history')
+    # update_prompt 中按原样写入的文本字段
+    TEXT_UPDATE_FIELDS = (
+        'title', 'description', 'requirement_report', 'initial_prompt', 'final_prompt',
+        'language', 'format', 'prompt_type', 'system_prompt', 'conversation_history', 'content_hash',
+        'content_digests'
+    )
+    # 列表字段：full 含完整正文，summary 只含元数据与正文预览（preview 列在保存时维护）
+    LIST_FULL_FIELDS = (
+        'id', 'title', 'description', 'final_prompt', 'language', 'format',
+        'prompt_type', 'system_prompt', 'conversation_history',
+        'is_favorite', 'is_public', 'view_count', 'use_count', 'tags',
+        'current_version', 'total_versions', 'last_version_time',
+        'create_time', 'update_time'
+    )
+    LIST_SUMMARY_FIELDS = tuple(
+        field for field in LIST_FULL_FIELDS if field not in ('final_prompt', 'system_prompt', 'conversation_history')
+    ) + ('preview',)
+    LIST_VIEWS = ('full', 'summary')
+    PREVIEW_CHARS = 200
+    # 旧数据未回填 preview 时从正文截取
+    PREVIEW_SELECT = f"COALESCE(preview, SUBSTR(final_prompt, 1, {PREVIEW_CHARS})) AS preview"
 
     def __init__(self, db):
         """
@@ -22,38 +53,13 @@ class PromptService:
         """
         self.db = db
 
-    @classmethod
-    def _build_content_snapshot(cls, source):
-        """提取提示词核心内容字段"""
-        snapshot = {}
-        source = source or {}
-        for field in cls.CONTENT_FIELDS:
-            value = source.get(field, '')
-            if value is None:
-                value = ''
-            snapshot[field] = str(value).strip()
-        return snapshot
-
-    @classmethod
-    def _normalize_content(cls, snapshot: dict) -> str:
-        """将核心提示词字段标准化为可哈希字符串"""
-        parts = []
-        for field in cls.CONTENT_FIELDS:
-            value = snapshot.get(field, '')
-            if value:
-                normalized = value.replace('\r\n', '\n').strip()
-                normalized = re.sub(r'\s+', ' ', normalized)
-                if normalized:
-                    parts.append(f"{field}:{normalized}")
-        return '||'.join(parts).strip()
-
-    @classmethod
-    def _calculate_content_hash(cls, snapshot: dict) -> str:
-        """计算提示词核心内容的哈希"""
-        normalized = cls._normalize_content(snapshot)
-        if not normalized:
-            return ''
-        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    async def _load_content_digests(self, prompt_id):
+        """旧数据未保存字段摘要时，从正文计算一次"""
+        row = await self.db.get(
+            "SELECT final_prompt, system_prompt, initial_prompt, conversation_history FROM prompts WHERE id = ?",
+            [prompt_id]
+        )
+        return await compute_digests(row or {})
 
     async def save_prompt(self, user_id, data):
         """
@@ -86,37 +92,38 @@ class PromptService:
 
             # 判断是新建还是更新
             if prompt_id:
-                # 验证提示词存在且有权限
+                # 验证提示词存在且有权限（只读取字段摘要，不读取正文）
                 check_sql = (
-                    "SELECT id, current_version, final_prompt, system_prompt, "
-                    "initial_prompt, conversation_history, content_hash "
-                    f"FROM prompts WHERE id = {prompt_id} AND user_id = {user_id}"
+                    "SELECT id, current_version, content_hash, content_digests "
+                    "FROM prompts WHERE id = ? AND user_id = ?"
                 )
-                existing = await self.db.get(check_sql)
+                existing = await self.db.get(check_sql, [prompt_id, user_id])
 
                 if not existing:
                     raise PermissionError('提示词不存在或无权限修改')
 
-                # 计算提示词内容哈希,用于判断是否创建新版本
-                existing_snapshot = self._build_content_snapshot(existing)
-                stored_hash = existing.get('content_hash')
-                existing_hash = stored_hash or self._calculate_content_hash(existing_snapshot)
-
-                new_snapshot = existing_snapshot.copy()
-                for field in self.CONTENT_FIELDS:
-                    if field in data:
-                        new_snapshot[field] = str(data.get(field) or '').strip()
-                new_hash = self._calculate_content_hash(new_snapshot)
-                content_changed = existing_hash != new_hash
-
                 update_data = dict(data)
-                should_update_hash = bool(new_hash) and stored_hash != new_hash
-                if should_update_hash:
-                    update_data['content_hash'] = new_hash
+                content_changed = False
+                content_fields = [field for field in CONTENT_FIELDS if field in data]
+                if content_fields:
+                    # 只对请求中出现的内容字段计算摘要,用于判断是否创建新版本
+                    stored_digests = load_digests(existing.get('content_digests'))
+                    if stored_digests is None:
+                        stored_digests = await self._load_content_digests(prompt_id)
+                    new_digests = dict(stored_digests)
+                    new_digests.update(await compute_digests(data, content_fields))
+                    content_changed = new_digests != stored_digests
+
+                    new_hash = combine_digests(new_digests)
+                    if content_changed or existing.get('content_hash') != new_hash:
+                        update_data['content_hash'] = new_hash
+                        update_data['content_digests'] = dump_digests(new_digests)
 
                 # 更新提示词
                 logger.info(f'🔄 更新提示词: prompt_id={prompt_id}')
-                await self.update_prompt(user_id, prompt_id, update_data)
+                if await self.update_prompt(user_id, prompt_id, update_data) is False:
+                    # UPDATE 未命中：读取摘要后提示词已被删除（无可更新字段时返回 None，不视为失败）
+                    raise PermissionError('提示词不存在或无权限修改')
 
                 # 如果需要创建版本
                 version_number = None
@@ -197,44 +204,17 @@ class PromptService:
             int: 提示词ID
         """
         try:
-            # 处理数组字段(转为JSON字符串)
-            thinking_points = json.dumps(data.get('thinking_points', []), ensure_ascii=False) if data.get('thinking_points') else None
-            advice = json.dumps(data.get('advice', []), ensure_ascii=False) if data.get('advice') else None
-            tags_list = data.get('tags', [])
-            tags = ','.join(tags_list) if tags_list else None
-
-            # 准备插入数据
-            fields = {
-                'user_id': user_id,
-                'title': data.get('title', '未命名提示词'),
-                'description': data.get('description', ''),
-                'requirement_report': data.get('requirement_report', ''),
-                'thinking_points': thinking_points,
-                'initial_prompt': data.get('initial_prompt', ''),
-                'advice': advice,
-                'final_prompt': data.get('final_prompt', ''),
-                'language': data.get('language', 'zh'),
-                'format': data.get('format', 'markdown'),
-                'prompt_type': data.get('prompt_type', 'system'),
-                'is_favorite': 0,
-                'is_public': data.get('is_public', 0),
-                'tags': tags,
-                'current_version': '1.0.0',
-                'total_versions': 1,
-                'last_version_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                # 用户提示词专用字段
-                'system_prompt': data.get('system_prompt', '') if data.get('prompt_type') == 'user' else None,
-                'conversation_history': data.get('conversation_history', '') if data.get('prompt_type') == 'user' else None
-            }
-            content_snapshot = self._build_content_snapshot(fields)
-            fields['content_hash'] = self._calculate_content_hash(content_snapshot)
+            fields = await self.build_prompt_fields(user_id, data)
 
             # 插入数据库
             prompt_id = await self.db.table_insert('prompts', fields)
+            self.invalidate_list_counts(self.db, user_id)
+            invalidate_library(self.db, user_id)
 
-            # 更新标签统计
+            # 更新标签关联与统计
+            tags_list = data.get('tags', [])
             if tags_list:
-                await self._update_tags(user_id, tags_list)
+                await self._update_tags(user_id, prompt_id, tags_list)
 
             logger.info(f'✅ 提示词创建成功: prompt_id={prompt_id}, user_id={user_id}, title={fields["title"]}')
 
@@ -244,104 +224,233 @@ class PromptService:
             logger.error(f'❌ 创建提示词失败: {e}')
             raise
 
-    async def get_prompts_list(self, user_id, page=1, limit=10, keyword='', tag='', is_favorite='', sort='create_time'):
+    @staticmethod
+    async def build_prompt_fields(user_id, data):
+        """
+        由提示词数据生成 prompts 表的插入字段（含内容哈希与字段摘要）
+
+        Args:
+            user_id: 用户ID
+            data: 提示词数据字典
+
+        Returns:
+            dict: 插入字段
+        """
+        # 处理数组字段(转为JSON字符串)
+        thinking_points = json.dumps(data.get('thinking_points', []), ensure_ascii=False) if data.get('thinking_points') else None
+        advice = json.dumps(data.get('advice', []), ensure_ascii=False) if data.get('advice') else None
+        tags_list = data.get('tags', [])
+        tags = ','.join(tags_list) if tags_list else None
+
+        # 准备插入数据
+        fields = {
+            'user_id': user_id,
+            'title': data.get('title', '未命名提示词'),
+            'description': data.get('description', ''),
+            'requirement_report': data.get('requirement_report', ''),
+            'thinking_points': thinking_points,
+            'initial_prompt': data.get('initial_prompt', ''),
+            'advice': advice,
+            'final_prompt': data.get('final_prompt', ''),
+            'language': data.get('language', 'zh'),
+            'format': data.get('format', 'markdown'),
+            'prompt_type': data.get('prompt_type', 'system'),
+            'is_favorite': 0,
+            'is_public': data.get('is_public', 0),
+            'tags': tags,
+            'current_version': '1.0.0',
+            'total_versions': 1,
+            'last_version_time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            # 用户提示词专用字段
+            'system_prompt': data.get('system_prompt', '') if data.get('prompt_type') == 'user' else None,
+            'conversation_history': data.get('conversation_history', '') if data.get('prompt_type') == 'user' else None
+        }
+        fields['preview'] = PromptService.build_preview(fields['final_prompt'])
+        digests = await compute_digests(fields)
+        fields['content_hash'] = combine_digests(digests)
+        fields['content_digests'] = dump_digests(digests)
+        return fields
+
+    async def get_prompts_list(self, user_id, page=1, limit=10, keyword='', tag='', is_favorite='', sort='create_time',
+                               cursor=None, count_mode='exact', view='full', fields=None):
         """
-        获取提示词列表(分页)
+        获取提示词列表(分页)，结果按用户与查询参数缓存，该用户的写操作使缓存失效
+        """
+        cache_key = ('list', page, limit, (keyword or '').strip(), (tag or '').strip(), str(is_favorite),
+                     sort, cursor, count_mode, view, fields or '')
+        scope = library_scope(user_id)
+        result = library_cache.get(scope, cache_key)
+        if result is None:
+            # 查询前取得代数：查询期间有写操作提交并失效时不回填旧结果
+            generation = library_cache.generation(scope)
+            result = await self._query_prompts_list(
+                user_id, page, limit, keyword, tag, is_favorite, sort, cursor, count_mode, view, fields
+            )
+            library_cache.set(scope, cache_key, result, generation=generation)
+        return result
+
+    async def _query_prompts_list(self, user_id, page, limit, keyword, tag, is_favorite, sort,
+                                  cursor, count_mode, view, fields):
+        """
+        查询提示词列表
+
+        传入 cursor（首页传空字符串）时使用游标分页，返回 next_cursor 而非 total/page；
+        count_mode 为 exact/approx/none，决定 total 的计算方式；
+        keyword 走全文检索（标题/描述/正文），sort=relevance 时按相关度排序（仅页码分页）；
+        view=summary 不返回正文等大字段，改为返回 preview；fields 指定返回字段
         """
         try:
             offset = (page - 1) * limit if page > 0 else 0
 
+            # 排序（id 作为同值时的次序，保证游标位置唯一）
+            sort_column = sort if sort in ('create_time', 'update_time', 'view_count', 'use_count') else 'create_time'
+            order_by = f"{sort_column} DESC, id DESC"
+
             # 构建基础查询
-            base_query = """
-                SELECT id, title, description, final_prompt, language, format, 
-                       prompt_type, system_prompt, conversation_history,
-                       is_favorite, is_public, view_count, use_count, tags, 
-                       current_version, total_versions, last_version_time, 
-                       create_time, update_time
-                FROM prompts
-            """
-
-            # 构建WHERE条件
-            conditions = ["user_id = " + str(user_id)]
-
-            if keyword and keyword.strip():
-                # 安全处理搜索关键词
-                safe_keyword = keyword.replace("'", "").replace("\"", "").replace("\\", "").replace("%", "%%")
-                conditions.append("(title LIKE '%%{}%%' OR description LIKE '%%{}%%')".format(safe_keyword, safe_keyword))
+            base_query = f"SELECT {self._list_columns(view, fields, sort_column)} FROM prompts"
+
+            # 构建WHERE条件（参数化，同一组筛选条件对应同一条语句文本）
+            conditions = ["user_id = ?"]
+            params = [user_id]
 
             if tag and tag.strip():
-                # 安全处理标签
-                safe_tag = tag.replace("'", "").replace("\"", "").replace("\\", "").replace("%", "%%")
-                conditions.append("tags LIKE '%%{}%%'".format(safe_tag))
+                conditions.append(TagService.USER_TAG_FILTER.format(column='id'))
+                params.extend([user_id, tag.strip()])
 
             if is_favorite != '':
-                conditions.append("is_favorite = " + str(int(is_favorite)))
+                conditions.append("is_favorite = ?")
+                params.append(int(is_favorite))
+
+            # 关键词检索（全文索引不可用或关键词过短时为 LIKE 条件）
+            search = build_search(self.db, keyword)
+            filter_conditions, filter_params = list(conditions), list(params)
+            if search:
+                conditions.append(search.condition)
+                params.extend(search.params)
+
+            if cursor is not None:
+                # 游标分页：按 (排序列, id) 定位，多取一行判断是否还有下一页
+                cursor_values = decode_cursor(cursor, sort_column, 2)
+                if cursor_values:
+                    cursor_condition, cursor_params = keyset_condition([sort_column, 'id'], cursor_values)
+                    conditions.append(cursor_condition)
+                    params.extend(cursor_params)
+                list_sql = base_query + " WHERE " + " AND ".join(conditions) + " ORDER BY " + order_by + " LIMIT ?"
+                items = await self.db.query(list_sql, params + [limit + 1])
+                page_result = build_cursor_page(items, limit, sort_column,
+                                                lambda row: [row[sort_column], row['id']])
+                for item in page_result['items']:
+                    self._format_list_item(item)
+                return page_result
 
             where_clause = " WHERE " + " AND ".join(conditions)
 
-            # 排序
-            sort_options = {
-                'create_time': 'create_time DESC',
-                'update_time': 'update_time DESC',
-                'view_count': 'view_count DESC',
-                'use_count': 'use_count DESC'
-            }
-            order_by = sort_options.get(sort, 'create_time DESC')
-
-            # 分页
-            pagination = " LIMIT " + str(limit) + " OFFSET " + str(offset)
-
-            # 完整查询
-            list_sql = base_query + where_clause + " ORDER BY " + order_by + pagination
+            # 完整查询（多取一行用于判断 has_more）
+            list_sql = base_query + where_clause + " ORDER BY " + order_by + " LIMIT ? OFFSET ?"
+            list_params = params + [limit + 1, offset]
+            if sort == 'relevance' and search and search.rankable:
+                # 按相关度排序：JOIN 全文命中集合取得分（计数仍只用筛选条件，不必计算得分）
+                search_condition, search_params = search.ranked_filter()
+                list_conditions = filter_conditions + ([search_condition] if search_condition else [])
+                list_sql = (base_query + search.rank_join + " WHERE " + " AND ".join(list_conditions)
+                            + f" ORDER BY {search.rank_sql} DESC, id DESC LIMIT ? OFFSET ?")
+                list_params = (search.rank_join_params + filter_params + search_params
+                               + search.rank_params + [limit + 1, offset])
 
             # 执行查询
-            items = await self.db.query(list_sql)
+            items = await self.db.query(list_sql, list_params)
 
             # 计数查询
-            count_sql = "SELECT COUNT(*) as total FROM prompts" + where_clause
-            count_result = await self.db.get(count_sql)
-            total = count_result['total'] if count_result else 0
+            total, is_estimate = await count_total(
+                self.db, count_mode, self._count_scope(user_id), "FROM prompts" + where_clause, params
+            )
 
             # 处理标签
-            for item in items:
-                tags_str = item.get('tags', '')
-                if tags_str and tags_str.strip():
-                    # 检测是否是Python list字符串表示（如 "['tag1', 'tag2']"）
-                    if tags_str.startswith('[') and tags_str.endswith(']'):
-                        try:
-                            # 尝试使用json.loads解析
-                            item['tags'] = json.loads(tags_str)
-                        except:
-                            # 如果失败，按逗号分割
-                            item['tags'] = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-                    else:
-                        # 正常的逗号分隔格式
-                        item['tags'] = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-                else:
-                    item['tags'] = []
-                item['create_time'] = str(item['create_time']) if item.get('create_time') else ''
-                item['update_time'] = str(item['update_time']) if item.get('update_time') else ''
-                item['last_version_time'] = str(item['last_version_time']) if item.get('last_version_time') else ''
-
-            return {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'items': items
-            }
+            for item in items[:limit]:
+                self._format_list_item(item)
+
+            return build_offset_page(items, page, limit, count_mode, total, is_estimate)
 
+        except ValueError:
+            # 游标无效（InvalidCursorError）或字段不支持，由路由返回 400
+            raise
         except Exception as e:
             logger.error(f'❌ 查询提示词列表失败: {e}')
             raise
 
+    @staticmethod
+    def _count_scope(user_id):
+        """提示词列表计数缓存的域"""
+        return f'prompts:{user_id}'
+
+    @classmethod
+    def invalidate_list_counts(cls, db, user_id):
+        """提示词增删改后，使该用户列表与社区列表的计数缓存失效"""
+        invalidate_counts(db, cls._count_scope(user_id), 'public_prompts')
+
+    @staticmethod
+    def _parse_tags(tags_str):
+        """解析 prompts.tags：逗号分隔；兼容旧数据中的 JSON / Python 列表字符串（如 "['a', 'b']"）"""
+        if not tags_str or not tags_str.strip():
+            return []
+        if tags_str.startswith('[') and tags_str.endswith(']'):
+            try:
+                return [str(tag).strip() for tag in json.loads(tags_str) if str(tag).strip()]
+            except ValueError:
+                tags_str = tags_str[1:-1]
+        return [tag.strip().strip('\'"').strip() for tag in tags_str.split(',') if tag.strip().strip('\'"').strip()]
+
+    @staticmethod
+    def _format_list_item(item):
+        """列表项：解析标签、格式化时间（只处理查询到的字段）"""
+        if 'tags' in item:
+            item['tags'] = PromptService._parse_tags(item.get('tags'))
+        for field in ('create_time', 'update_time', 'last_version_time'):
+            if field in item:
+                item[field] = str(item[field]) if item[field] else ''
+        return item
+
+    @classmethod
+    def build_preview(cls, text):
+        """正文预览：折叠空白后截取前 PREVIEW_CHARS 个字符"""
+        if not text:
+            return ''
+        # 只处理开头一段，避免对长文本整体做切分
+        return ' '.join(str(text)[:cls.PREVIEW_CHARS * 4].split())[:cls.PREVIEW_CHARS]
+
+    @classmethod
+    def _list_columns(cls, view, fields, sort_column):
+        """
+        列表查询的字段
+
+        Args:
+            view: full / summary
+            fields: 逗号分隔的字段名（优先于 view），id 与排序列总会包含
+        """
+        if fields:
+            requested = [field.strip() for field in fields.split(',') if field.strip()]
+            allowed = cls.LIST_FULL_FIELDS + ('preview',)
+            unknown = [field for field in requested if field not in allowed]
+            if unknown:
+                raise ValueError(f"不支持的字段: {', '.join(unknown)}")
+            selected = list(dict.fromkeys(['id'] + requested + [sort_column]))
+        else:
+            selected = cls.LIST_SUMMARY_FIELDS if view == 'summary' else cls.LIST_FULL_FIELDS
+        return ', '.join(cls.PREVIEW_SELECT if field == 'preview' else field for field in selected)
+
     async def get_prompt_detail(self, user_id, prompt_id):
         """
-        获取提示词详情
+        获取提示词详情（仅缓存查到的结果）
         """
         try:
-            where_condition = "id = " + str(prompt_id) + " AND user_id = " + str(user_id)
-            sql = "SELECT * FROM prompts WHERE " + where_condition
-            prompt = await self.db.get(sql)
+            scope = library_scope(user_id)
+            cached = library_cache.get(scope, ('detail', prompt_id))
+            if cached is not None:
+                return cached
+
+            generation = library_cache.generation(scope)
+            sql = "SELECT * FROM prompts WHERE id = ? AND user_id = ?"
+            prompt = await self.db.get(sql, [prompt_id, user_id])
 
             if prompt:
                 # 解析JSON字段
@@ -361,27 +470,16 @@ class PromptService:
                 else:
                     prompt['advice'] = []
 
-                if prompt.get('tags'):
-                    tags_str = prompt['tags']
-                    # 检测是否是Python list字符串表示（如 "['tag1', 'tag2']"）
-                    if tags_str.startswith('[') and tags_str.endswith(']'):
-                        try:
-                            # 尝试使用json.loads解析
-                            prompt['tags'] = json.loads(tags_str)
-                        except:
-                            # 如果失败，按逗号分割
-                            prompt['tags'] = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-                    else:
-                        # 正常的逗号分隔格式
-                        prompt['tags'] = [tag.strip() for tag in tags_str.split(',') if tag.strip()]
-                else:
-                    prompt['tags'] = []
+                prompt['tags'] = self._parse_tags(prompt.get('tags'))
+                # 字段摘要仅供保存时比对，不返回给前端
+                prompt.pop('content_digests', None)
 
                 # 时间格式化
                 prompt['create_time'] = str(prompt['create_time']) if prompt.get('create_time') else ''
                 prompt['update_time'] = str(prompt['update_time']) if prompt.get('update_time') else ''
                 prompt['last_version_time'] = str(prompt['last_version_time']) if prompt.get('last_version_time') else ''
 
+                library_cache.set(scope, ('detail', prompt_id), prompt, generation=generation)
                 logger.debug(f'✅ 查询提示词详情成功: prompt_id={prompt_id}, user_id={user_id}')
             else:
                 logger.warning(f'⚠️  提示词不存在或无权限: prompt_id={prompt_id}, user_id={user_id}')
@@ -402,92 +500,52 @@ class PromptService:
             data: 更新数据
 
         Returns:
-            bool: 是否成功
+            bool: 是否成功（提示词不存在或无权限时返回 False）；
+            没有需要更新的字段时不执行 UPDATE，返回 None
         """
         try:
-            # 先检查权限
-            check_sql = "SELECT id FROM prompts WHERE id = " + str(prompt_id) + " AND user_id = " + str(user_id)
-            exists = await self.db.get(check_sql)
-
-            if not exists:
-                logger.warning(f'⚠️  无权限更新提示词: prompt_id={prompt_id}, user_id={user_id}')
-                return False
-
-            # 构建更新语句
-            update_fields = []
+            # 构建更新语句（字段名来自白名单，值全部走参数绑定）
+            update_fields = {}
 
-            def escape_sql_string(value):
-                """转义SQL字符串中的特殊字符"""
-                if value is None:
-                    return ''
-                s = str(value)
-                # 转义单引号和反斜杠,同时转义 % 字符避免格式化错误
-                s = s.replace("\\", "\\\\")  # 先转义反斜杠
-                s = s.replace("'", "''")      # 转义单引号
-                s = s.replace("%", "%%")      # 转义百分号
-                return s
+            for field in self.TEXT_UPDATE_FIELDS:
+                if field in data:
+                    value = data.get(field)
+                    update_fields[field] = '' if value is None else str(value)
 
-            if 'title' in data:
-                update_fields.append("title = '" + escape_sql_string(data['title']) + "'")
-
-            if 'description' in data:
-                update_fields.append("description = '" + escape_sql_string(data.get('description', '')) + "'")
-
-            if 'requirement_report' in data:
-                update_fields.append("requirement_report = '" + escape_sql_string(data.get('requirement_report', '')) + "'")
+            if 'final_prompt' in data:
+                update_fields['preview'] = self.build_preview(data['final_prompt'])
 
             if 'thinking_points' in data:
-                thinking_points = escape_sql_string(json.dumps(data['thinking_points'], ensure_ascii=False))
-                update_fields.append("thinking_points = '" + thinking_points + "'")
-
-            if 'initial_prompt' in data:
-                update_fields.append("initial_prompt = '" + escape_sql_string(data.get('initial_prompt', '')) + "'")
+                update_fields['thinking_points'] = json.dumps(data['thinking_points'], ensure_ascii=False)
 
             if 'advice' in data:
-                advice = escape_sql_string(json.dumps(data['advice'], ensure_ascii=False))
-                update_fields.append("advice = '" + advice + "'")
-
-            if 'final_prompt' in data:
-                update_fields.append("final_prompt = '" + escape_sql_string(data.get('final_prompt', '')) + "'")
-
-            if 'language' in data:
-                update_fields.append("language = '" + escape_sql_string(data['language']) + "'")
+                update_fields['advice'] = json.dumps(data['advice'], ensure_ascii=False)
 
             if 'is_public' in data:
-                update_fields.append("is_public = '" + escape_sql_string(data['is_public']) + "'")
-
-            if 'format' in data:
-                update_fields.append("format = '" + escape_sql_string(data['format']) + "'")
-
-            if 'prompt_type' in data:
-                update_fields.append("prompt_type = '" + escape_sql_string(data['prompt_type']) + "'")
-
-            # 用户提示词专用字段
-            if 'system_prompt' in data:
-                update_fields.append("system_prompt = '" + escape_sql_string(data.get('system_prompt', '')) + "'")
-
-            if 'conversation_history' in data:
-                update_fields.append("conversation_history = '" + escape_sql_string(data.get('conversation_history', '')) + "'")
-
-            if 'content_hash' in data:
-                update_fields.append("content_hash = '" + escape_sql_string(data.get('content_hash', '')) + "'")
+                update_fields['is_public'] = 1 if data['is_public'] in (1, '1', True, 'true') else 0
 
             if 'tags' in data:
-                tags = ','.join(data['tags']) if data['tags'] else ''
-                update_fields.append("tags = '" + escape_sql_string(tags) + "'")
-                # 更新标签统计
-                if data['tags']:
-                    await self._update_tags(user_id, data['tags'])
+                update_fields['tags'] = ','.join(data['tags']) if data['tags'] else ''
 
             if not update_fields:
                 logger.warning('⚠️  没有需要更新的字段')
+                return None
+
+            # 权限由 UPDATE 自身的条件保证，影响行数为 0 即不存在或无权限
+            set_clause = ', '.join(f"{field} = ?" for field in update_fields)
+            update_sql = f"UPDATE prompts SET {set_clause} WHERE id = ? AND user_id = ?"
+
+            affected = await self.db.execute(update_sql, list(update_fields.values()) + [prompt_id, user_id])
+            if not affected:
+                logger.warning(f'⚠️  无权限更新提示词: prompt_id={prompt_id}, user_id={user_id}')
                 return False
 
-            update_sql = """
-                UPDATE prompts SET """ + ', '.join(update_fields) + """
-                WHERE id = """ + str(prompt_id) + """ AND user_id = """ + str(user_id)
+            if 'tags' in data:
+                # 更新标签关联与统计（空列表即清空关联）
+                await self._update_tags(user_id, prompt_id, data['tags'] or [])
 
-            await self.db.execute(update_sql)
+            self.invalidate_list_counts(self.db, user_id)
+            invalidate_library(self.db, user_id)
 
             logger.info(f'✅ 更新提示词成功: prompt_id={prompt_id}, user_id={user_id}')
             return True
@@ -508,17 +566,19 @@ class PromptService:
             bool: 是否成功
         """
         try:
-            # 先检查权限
-            check_sql = "SELECT id FROM prompts WHERE id = " + str(prompt_id) + " AND user_id = " + str(user_id)
-            exists = await self.db.get(check_sql)
+            # 关键帧引用的 text_blobs 需在版本删除后释放，先于级联删除读出
+            keyframes = await load_keyframe_refs(self.db, prompt_id, user_id)
 
-            if not exists:
+            # 删除提示词(级联删除关联的分享记录)；影响行数为 0 即不存在或无权限
+            delete_sql = "DELETE FROM prompts WHERE id = ? AND user_id = ?"
+            if not await self.db.execute(delete_sql, [prompt_id, user_id]):
                 logger.warning(f'⚠️  无权限删除提示词: prompt_id={prompt_id}, user_id={user_id}')
                 return False
 
-            # 删除提示词(级联删除关联的分享记录)
-            delete_sql = "DELETE FROM prompts WHERE id = " + str(prompt_id) + " AND user_id = " + str(user_id)
-            await self.db.execute(delete_sql)
+            await delete_prompt_versions(self.db, prompt_id, keyframes)
+            await TagService(self.db).clear_prompt_tags(prompt_id)
+            self.invalidate_list_counts(self.db, user_id)
+            invalidate_library(self.db, user_id)
 
             logger.info(f'✅ 删除提示词成功: prompt_id={prompt_id}, user_id={user_id}')
             return True
@@ -540,21 +600,15 @@ class PromptService:
             bool: 是否成功
         """
         try:
-            # 先检查权限
-            check_sql = "SELECT id FROM prompts WHERE id = " + str(prompt_id) + " AND user_id = " + str(user_id)
-            exists = await self.db.get(check_sql)
+            # 更新收藏状态；影响行数为 0 即不存在或无权限
+            favorite_value = 1 if is_favorite else 0
+            update_sql = "UPDATE prompts SET is_favorite = ? WHERE id = ? AND user_id = ?"
 
-            if not exists:
+            if not await self.db.execute(update_sql, [favorite_value, prompt_id, user_id]):
                 logger.warning(f'⚠️  无权限操作提示词: prompt_id={prompt_id}, user_id={user_id}')
                 return False
-
-            # 更新收藏状态
-            favorite_value = 1 if is_favorite else 0
-            update_sql = """
-                UPDATE prompts SET is_favorite = """ + str(favorite_value) + """
-                WHERE id = """ + str(prompt_id) + """ AND user_id = """ + str(user_id)
-
-            await self.db.execute(update_sql)
+            invalidate_counts(self.db, self._count_scope(user_id))
+            invalidate_library(self.db, user_id)
 
             action = '收藏' if is_favorite else '取消收藏'
             logger.info(f'✅ {action}提示词成功: prompt_id={prompt_id}, user_id={user_id}')
@@ -566,11 +620,10 @@ class PromptService:
 
     async def increase_view_count(self, prompt_id):
         """
-        增加查看次数
+        增加查看次数（合并写入，定时批量写回）
         """
         try:
-            sql = "UPDATE prompts SET view_count = view_count + 1 WHERE id = " + str(prompt_id)
-            await self.db.execute(sql)
+            await counter_buffer.increment(self.db, 'prompts', prompt_id, 'view_count')
             logger.debug(f'✅ 增加查看次数: prompt_id={prompt_id}')
 
         except Exception as e:
@@ -579,18 +632,22 @@ class PromptService:
 
     async def increase_use_count(self, user_id, prompt_id):
         """
-        增加使用次数
+        增加使用次数（合并写入，定时批量写回）
         """
         try:
-            # 先检查权限
-            check_sql = "SELECT id FROM prompts WHERE id = " + str(prompt_id) + " AND user_id = " + str(user_id)
-            exists = await self.db.get(check_sql)
-
-            if not exists:
-                return False
-
-            sql = "UPDATE prompts SET use_count = use_count + 1 WHERE id = " + str(prompt_id)
-            await self.db.execute(sql)
+            if not counter_buffer.enabled:
+                # 直接更新：由 UPDATE 的条件判断权限，影响行数为 0 即不存在或无权限
+                sql = "UPDATE prompts SET use_count = use_count + 1 WHERE id = ? AND user_id = ?"
+                if not await self.db.execute(sql, [prompt_id, user_id]):
+                    return False
+            else:
+                # 合并写入拿不到影响行数：详情已在缓存中即可确认归属，否则查询一次
+                if library_cache.get(library_scope(user_id), ('detail', prompt_id)) is None:
+                    check_sql = "SELECT id FROM prompts WHERE id = ? AND user_id = ?"
+                    if not await self.db.get(check_sql, [prompt_id, user_id]):
+                        return False
+                await counter_buffer.increment(self.db, 'prompts', prompt_id, 'use_count')
+            invalidate_library(self.db, user_id)
             logger.debug(f'✅ 增加使用次数: prompt_id={prompt_id}')
             return True
 
@@ -598,39 +655,22 @@ class PromptService:
             logger.error(f'❌ 增加使用次数失败: {e}')
             raise
 
-    async def _update_tags(self, user_id, tags):
+    async def _update_tags(self, user_id, prompt_id, tags):
         """
-        更新标签统计(内部方法)
+        更新标签关联与统计(内部方法)
+
+        标签关联是按标签筛选的依据，失败时向上抛出，由请求级事务回滚
 
         Args:
             user_id: 用户ID
+            prompt_id: 提示词ID
             tags: 标签列表
         """
         try:
-            for tag in tags:
-                if not tag:
-                    continue
-
-                # 检查标签是否存在
-                safe_tag = tag.replace("'", "''")
-                check_sql = "SELECT id, use_count FROM prompt_tags WHERE user_id = " + str(user_id) + " AND tag_name = '" + safe_tag + "'"
-                existing = await self.db.get(check_sql)
-
-                if existing:
-                    # 更新使用次数
-                    update_sql = "UPDATE prompt_tags SET use_count = use_count + 1 WHERE id = " + str(existing['id'])
-                    await self.db.execute(update_sql)
-                else:
-                    # 创建新标签
-                    fields = {
-                        'tag_name': tag,
-                        'user_id': user_id,
-                        'use_count': 1
-                    }
-                    await self.db.table_insert('prompt_tags', fields)
-
-            logger.debug(f'✅ 更新标签统计成功: user_id={user_id}, tags={tags}')
+            added, removed = await TagService(self.db).sync_prompt_tags(user_id, prompt_id, tags)
+            if added or removed:
+                logger.debug(f'✅ 更新标签关联成功: prompt_id={prompt_id}, added={added}, removed={removed}')
 
         except Exception as e:
-            logger.error(f'❌ 更新标签统计失败: {e}')
-            # 不抛出异常,因为这不是关键操作
+            logger.error(f'❌ 更新标签关联失败: {e}')
+            raise
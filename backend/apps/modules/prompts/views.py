@@ -8,12 +8,16 @@ from sanic_ext import openapi
 from sanic.log import logger
 
 from apps.utils.auth_middleware import auth_required
+from apps.utils.db_utils import error_response, register_unit_of_work
+from apps.utils.pagination import get_cursor_arg, normalize_count_mode
 from .services import PromptService
 from .models import *
 
 
 # 创建提示词蓝图
 prompts = Blueprint('prompts', url_prefix='/api/prompts')
+# 请求级工作单元：同一请求共用一个连接和事务
+register_unit_of_work(prompts)
 
 
 @prompts.post('/')
@@ -47,16 +51,10 @@ async def save_prompt(request):
         
         # 参数验证
         if not data.get('title'):
-            return json({
-                'code': 400,
-                'message': '标题不能为空'
-            })
+            return error_response(request, 400, '标题不能为空')
         
         if not data.get('final_prompt'):
-            return json({
-                'code': 400,
-                'message': '最终提示词不能为空'
-            })
+            return error_response(request, 400, '最终提示词不能为空')
         
         # 统一保存(自动判断新建还是更新)
         prompt_service = PromptService(request.app.ctx.db)
@@ -70,22 +68,13 @@ async def save_prompt(request):
         
     except ValueError as e:
         logger.warning(f'⚠️  参数错误: {e}')
-        return json({
-            'code': 400,
-            'message': str(e)
-        })
+        return error_response(request, 400, str(e))
     except PermissionError as e:
         logger.warning(f'⚠️  权限错误: {e}')
-        return json({
-            'code': 403,
-            'message': str(e)
-        })
+        return error_response(request, 403, str(e))
     except Exception as e:
         logger.error(f'❌ 保存提示词失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'保存失败: {str(e)}'
-        })
+        return error_response(request, 500, f'保存失败: {str(e)}')
 
 
 @prompts.get('/')
@@ -98,7 +87,11 @@ async def save_prompt(request):
 @openapi.parameter("keyword", str, "query", description="搜索关键词", required=False)
 @openapi.parameter("tag", str, "query", description="标签筛选", required=False)
 @openapi.parameter("is_favorite", str, "query", description="是否收藏 1/0", required=False)
-@openapi.parameter("sort", str, "query", description="排序字段 create_time/update_time/view_count/use_count", required=False)
+@openapi.parameter("sort", str, "query", description="排序字段 create_time/update_time/view_count/use_count/relevance（按关键词相关度，未指定排序且带关键词时默认）", required=False)
+@openapi.parameter("cursor", str, "query", description="分页游标（首页传空字符串，后续传上一页的 next_cursor）", required=False)
+@openapi.parameter("count", str, "query", description="总数计算方式 exact（默认，带缓存）/approx（封顶近似）/none（仅返回 has_more）", required=False)
+@openapi.parameter("view", str, "query", description="full（默认，含正文）/summary（不含正文与对话历史，返回前200字的 preview）", required=False)
+@openapi.parameter("fields", str, "query", description="逗号分隔的返回字段（优先于 view），如 id,title,preview,tags", required=False)
 @openapi.response(200, {"application/json": PromptListResponse}, description="查询成功")
 async def get_prompts_list(request):
     """获取提示词列表"""
@@ -111,18 +104,24 @@ async def get_prompts_list(request):
         keyword = request.args.get('keyword', '')
         tag = request.args.get('tag', '')
         is_favorite = request.args.get('is_favorite', '')
-        sort = request.args.get('sort', 'create_time')
+        sort = request.args.get('sort') or ('relevance' if keyword.strip() else 'create_time')
+        cursor = get_cursor_arg(request)
+        count_mode = normalize_count_mode(request.args.get('count'))
+        view = request.args.get('view', 'full')
+        fields = request.args.get('fields', '')
         
         # 参数校验
         if page < 1:
             page = 1
         if limit < 1 or limit > 100:
             limit = 10
+        if view not in PromptService.LIST_VIEWS:
+            view = 'full'
         
         # 查询列表
         prompt_service = PromptService(request.app.ctx.db)
         result = await prompt_service.get_prompts_list(
-            user_id, page, limit, keyword, tag, is_favorite, sort
+            user_id, page, limit, keyword, tag, is_favorite, sort, cursor, count_mode, view, fields
         )
         
         return json({
@@ -130,12 +129,12 @@ async def get_prompts_list(request):
             'data': result
         })
         
+    except ValueError as e:
+        # 游标无效或 fields 含不支持的字段
+        return error_response(request, 400, str(e))
     except Exception as e:
         logger.error(f'❌ 查询提示词列表失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'查询失败: {str(e)}'
-        })
+        return error_response(request, 500, f'查询失败: {str(e)}')
 
 
 @prompts.get('/<prompt_id:int>')
@@ -155,10 +154,7 @@ async def get_prompt_detail(request, prompt_id):
         prompt = await prompt_service.get_prompt_detail(user_id, prompt_id)
         
         if not prompt:
-            return json({
-                'code': 404,
-                'message': '提示词不存在或无权限访问'
-            })
+            return error_response(request, 404, '提示词不存在或无权限访问')
         
         # 增加查看次数
         await prompt_service.increase_view_count(prompt_id)
@@ -170,10 +166,7 @@ async def get_prompt_detail(request, prompt_id):
         
     except Exception as e:
         logger.error(f'❌ 查询提示词详情失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'查询失败: {str(e)}'
-        })
+        return error_response(request, 500, f'查询失败: {str(e)}')
 
 
 @prompts.put('/<prompt_id:int>')
@@ -202,22 +195,13 @@ async def update_prompt(request, prompt_id):
         })
     except ValueError as e:
         logger.warning(f'⚠️  参数错误: {e}')
-        return json({
-            'code': 400,
-            'message': str(e)
-        })
+        return error_response(request, 400, str(e))
     except PermissionError as e:
         logger.warning(f'⚠️  权限错误: {e}')
-        return json({
-            'code': 403,
-            'message': str(e)
-        })
+        return error_response(request, 403, str(e))
     except Exception as e:
         logger.error(f'❌ 更新提示词失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'更新失败: {str(e)}'
-        })
+        return error_response(request, 500, f'更新失败: {str(e)}')
 
 
 @prompts.delete('/<prompt_id:int>')
@@ -237,10 +221,7 @@ async def delete_prompt(request, prompt_id):
         success = await prompt_service.delete_prompt(user_id, prompt_id)
         
         if not success:
-            return json({
-                'code': 403,
-                'message': '无权限删除或提示词不存在'
-            })
+            return error_response(request, 403, '无权限删除或提示词不存在')
         
         return json({
             'code': 200,
@@ -249,10 +230,7 @@ async def delete_prompt(request, prompt_id):
         
     except Exception as e:
         logger.error(f'❌ 删除提示词失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'删除失败: {str(e)}'
-        })
+        return error_response(request, 500, f'删除失败: {str(e)}')
 
 
 @prompts.post('/<prompt_id:int>/favorite')
@@ -274,10 +252,7 @@ async def toggle_favorite(request, prompt_id):
         success = await prompt_service.toggle_favorite(user_id, prompt_id, is_favorite)
         
         if not success:
-            return json({
-                'code': 403,
-                'message': '操作失败或提示词不存在'
-            })
+            return error_response(request, 403, '操作失败或提示词不存在')
         
         return json({
             'code': 200,
@@ -286,10 +261,7 @@ async def toggle_favorite(request, prompt_id):
         
     except Exception as e:
         logger.error(f'❌ 操作收藏状态失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'操作失败: {str(e)}'
-        })
+        return error_response(request, 500, f'操作失败: {str(e)}')
 
 
 @prompts.post('/<prompt_id:int>/use')
@@ -308,10 +280,7 @@ async def record_use(request, prompt_id):
         success = await prompt_service.increase_use_count(user_id, prompt_id)
         
         if not success:
-            return json({
-                'code': 404,
-                'message': '提示词不存在'
-            })
+            return error_response(request, 404, '提示词不存在')
         
         return json({
             'code': 200,
@@ -320,7 +289,4 @@ async def record_use(request, prompt_id):
         
     except Exception as e:
         logger.error(f'❌ 记录使用次数失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'记录失败: {str(e)}'
-        })
+        return error_response(request, 500, f'记录失败: {str(e)}')
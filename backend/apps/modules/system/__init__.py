@@ -0,0 +1,6 @@
+"""
+系统运维模块
+"""
+from .views import system
+
+__all__ = ['system']
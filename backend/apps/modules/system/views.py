@@ -0,0 +1,199 @@
+"""
+系统运维路由
+提供数据库连接池、语句缓存、语句耗时等运行时统计信息（仅管理员可访问）
+"""
+from sanic import Blueprint
+from sanic.response import json
+from sanic_ext import openapi
+from sanic.log import logger
+
+from apps.modules.playground_shares.services import PlaygroundShareService
+from apps.utils.auth_middleware import auth_required
+from apps.utils.column_codec import column_codec
+from apps.utils.counter_buffer import counter_buffer
+from apps.utils.library_cache import library_cache
+from apps.utils.pagination import count_cache
+from apps.utils.text_blobs import blob_stats
+from apps.utils.text_diff import diff_cache
+from apps.utils.version_storage import compact_prompt_versions
+
+
+# 创建系统运维蓝图
+system = Blueprint('system', url_prefix='/api/system')
+
+
+async def _is_admin(request) -> bool:
+    """检查当前用户是否为管理员"""
+    user = await request.app.ctx.db.get('SELECT is_admin FROM users WHERE id = ?', [request.ctx.user_id])
+    return bool(user.get('is_admin')) if user else False
+
+
+@system.get('/db-stats')
+@auth_required
+@openapi.summary("获取数据库运行统计")
+@openapi.description("返回连接池状态（签出/溢出/等待时间）、SQL语句缓存与列表计数缓存与提示词库缓存命中情况、计数合并写入的写回统计、版本对比差异缓存、大文本列压缩（各列压缩率）以及大文本外置存储（text_blobs）的占用")
+@openapi.secured("BearerAuth")
+async def get_db_stats(request):
+    """获取数据库运行统计"""
+    try:
+        if not await _is_admin(request):
+            return json({
+                'code': 403,
+                'message': '权限不足,需要管理员权限'
+            })
+
+        db = request.app.ctx.db
+        return json({
+            'code': 200,
+            'data': {
+                'db_type': request.app.ctx.db_type,
+                'pool': db.get_pool_stats(),
+                'statement_cache': db.get_statement_cache_stats(),
+                'count_cache': count_cache.stats(),
+                'library_cache': library_cache.stats(),
+                'counters': counter_buffer.stats(),
+                'diff_cache': diff_cache.stats(),
+                'column_compression': column_codec.stats(),
+                'text_blobs': await blob_stats(db)
+            }
+        })
+
+    except Exception as e:
+        logger.error(f'❌ 获取数据库统计失败: {e}')
+        return json({
+            'code': 500,
+            'message': f'获取失败: {str(e)}'
+        })
+
+
+@system.get('/query-stats')
+@auth_required
+@openapi.summary("获取SQL语句耗时统计")
+@openapi.description("按语句指纹（去除字面量）汇总耗时直方图、返回行数、连接等待时间与慢查询执行计划")
+@openapi.parameter("limit", int, "query", description="返回条数（默认50）")
+@openapi.parameter("order_by", str, "query", description="排序字段: total_ms/max_ms/count/rows/wait_ms/slow_count")
+@openapi.secured("BearerAuth")
+async def get_query_stats(request):
+    """获取SQL语句耗时统计"""
+    try:
+        if not await _is_admin(request):
+            return json({
+                'code': 403,
+                'message': '权限不足,需要管理员权限'
+            })
+
+        limit = min(int(request.args.get('limit', 50)), 500)
+        order_by = request.args.get('order_by', 'total_ms')
+        return json({
+            'code': 200,
+            'data': request.app.ctx.db.get_query_stats(limit, order_by)
+        })
+
+    except Exception as e:
+        logger.error(f'❌ 获取语句统计失败: {e}')
+        return json({
+            'code': 500,
+            'message': f'获取失败: {str(e)}'
+        })
+
+
+@system.delete('/query-stats')
+@auth_required
+@openapi.summary("重置SQL语句耗时统计")
+@openapi.secured("BearerAuth")
+async def reset_query_stats(request):
+    """重置SQL语句耗时统计（执行计划会在下次慢查询时重新抓取）"""
+    try:
+        if not await _is_admin(request):
+            return json({
+                'code': 403,
+                'message': '权限不足,需要管理员权限'
+            })
+
+        request.app.ctx.db.reset_query_stats()
+        return json({
+            'code': 200,
+            'message': '统计已重置'
+        })
+
+    except Exception as e:
+        logger.error(f'❌ 重置语句统计失败: {e}')
+        return json({
+            'code': 500,
+            'message': f'重置失败: {str(e)}'
+        })
+
+
+@system.post('/compact-versions')
+@auth_required
+@openapi.summary("版本差量存储迁移")
+@openapi.description("按当前关键帧间隔（VERSION_KEYFRAME_INTERVAL）把已有版本改写为关键帧+差量，关键帧大文本外置到 text_blobs；可重复执行，每个提示词一个事务")
+@openapi.secured("BearerAuth")
+async def compact_versions(request):
+    """将已有版本转换为差量存储"""
+    try:
+        if not await _is_admin(request):
+            return json({
+                'code': 403,
+                'message': '权限不足,需要管理员权限'
+            })
+
+        db = request.app.ctx.db
+        rows = await db.query("SELECT DISTINCT prompt_id FROM prompt_versions")
+        summary = {'prompts': 0, 'rows': 0, 'bytes_before': 0, 'bytes_after': 0}
+        for row in rows:
+            uow, token = db.begin_unit_of_work()
+            commit = False
+            try:
+                result = await compact_prompt_versions(db, row['prompt_id'])
+                commit = True
+            finally:
+                await db.end_unit_of_work(uow, token, commit)
+            summary['prompts'] += 1
+            for key in ('rows', 'bytes_before', 'bytes_after'):
+                summary[key] += result[key]
+
+        logger.info(
+            f"✅ 版本差量存储迁移: prompts={summary['prompts']}, rows={summary['rows']}, "
+            f"bytes={summary['bytes_before']}->{summary['bytes_after']}"
+        )
+        return json({
+            'code': 200,
+            'data': summary
+        })
+
+    except Exception as e:
+        logger.error(f'❌ 版本差量存储迁移失败: {e}')
+        return json({
+            'code': 500,
+            'message': f'迁移失败: {str(e)}'
+        })
+
+
+@system.post('/compact-shares')
+@auth_required
+@openapi.summary("操练场分享大文本外置迁移")
+@openapi.description("把已有分享中超过 TEXT_BLOB_MIN_CHARS 的系统提示词与对话快照改存到 text_blobs，可重复执行")
+@openapi.secured("BearerAuth")
+async def compact_shares(request):
+    """将已有分享的大文本外置到 text_blobs"""
+    try:
+        if not await _is_admin(request):
+            return json({
+                'code': 403,
+                'message': '权限不足,需要管理员权限'
+            })
+
+        summary = await PlaygroundShareService(request.app.ctx.db).externalize_existing()
+        logger.info(f"✅ 分享大文本外置迁移: shares={summary['shares']}, rows={summary['rows']}")
+        return json({
+            'code': 200,
+            'data': summary
+        })
+
+    except Exception as e:
+        logger.error(f'❌ 分享大文本外置迁移失败: {e}')
+        return json({
+            'code': 500,
+            'message': f'迁移失败: {str(e)}'
+        })
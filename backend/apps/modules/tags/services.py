@@ -2,11 +2,31 @@
 标签服务类
 处理标签相关的业务逻辑
 """
+from collections import Counter
+
 from sanic.log import logger
 
+from apps.utils.library_cache import invalidate_library
+
 
 class TagService:
-    """标签服务类"""
+    """标签服务类
+
+    提示词与标签的多对多关联保存在 prompt_tag_map(prompt_id, tag_id)，tag_id 指向
+    提示词作者名下的 prompt_tags 记录；prompts.tags 仍保留逗号分隔的冗余副本用于展示。
+    """
+
+    # 按标签筛选提示词的子查询条件（{column} 为提示词ID列）
+    USER_TAG_FILTER = (
+        "{column} IN (SELECT m.prompt_id FROM prompt_tag_map m JOIN prompt_tags t ON t.id = m.tag_id "
+        "WHERE t.user_id = ? AND t.tag_name = ?)"
+    )
+    PUBLIC_TAG_FILTER = (
+        "{column} IN (SELECT m.prompt_id FROM prompt_tag_map m JOIN prompt_tags t ON t.id = m.tag_id "
+        "WHERE t.tag_name = ?)"
+    )
+    # 按名称批量查询标签ID时每条语句的名称数
+    TAG_LOOKUP_CHUNK = 500
     
     def __init__(self, db):
         """
@@ -117,9 +137,11 @@ class TagService:
                 logger.warning(f'⚠️  无权限删除标签: tag_id={tag_id}, user_id={user_id}')
                 return False
             
-            # 删除标签
+            # 删除标签及其与提示词的关联
+            await self.db.execute("DELETE FROM prompt_tag_map WHERE tag_id = ?", [tag_id])
             delete_sql = f"DELETE FROM prompt_tags WHERE id = {tag_id} AND user_id = {user_id}"
             await self.db.execute(delete_sql)
+            invalidate_library(self.db, user_id)
             
             logger.info(f'✅ 删除标签成功: tag_id={tag_id}, user_id={user_id}')
             return True
@@ -128,6 +150,104 @@ class TagService:
             logger.error(f'❌ 删除标签失败: {e}')
             raise
     
+    @staticmethod
+    def normalize_tag_names(tags):
+        """去除空白与重复，保持原有顺序"""
+        return list(dict.fromkeys(tag.strip() for tag in (tags or []) if tag and tag.strip()))
+
+    async def sync_prompt_tags(self, user_id, prompt_id, tag_names):
+        """
+        按标签名列表维护提示词的标签关联与使用次数（use_count 为使用该标签的提示词数）
+
+        只处理有变化的标签：新增的标签通过一条批量 upsert 创建或 use_count + 1，
+        移除的标签 use_count - 1，未变化的标签不产生写操作。
+
+        Returns:
+            tuple: (新增的标签名列表, 移除的标签名列表)
+        """
+        tag_names = self.normalize_tag_names(tag_names)
+        rows = await self.db.query(
+            "SELECT t.id, t.tag_name FROM prompt_tag_map m JOIN prompt_tags t ON t.id = m.tag_id "
+            "WHERE m.prompt_id = ?",
+            [prompt_id]
+        )
+        current = {row['tag_name']: row['id'] for row in rows}
+        target = set(tag_names)
+        added = [tag for tag in tag_names if tag not in current]
+        removed = [tag for tag in current if tag not in target]
+
+        if removed:
+            removed_ids = [current[tag] for tag in removed]
+            placeholders = ', '.join(['?'] * len(removed_ids))
+            await self.db.execute(
+                f"DELETE FROM prompt_tag_map WHERE prompt_id = ? AND tag_id IN ({placeholders})",
+                [prompt_id] + removed_ids
+            )
+            await self._decrement_use_count(removed_ids)
+
+        if added:
+            await self.add_prompt_tags(user_id, {prompt_id: added})
+
+        return added, removed
+
+    async def add_prompt_tags(self, user_id, prompt_tags):
+        """
+        为一批（尚无这些标签关联的）提示词添加标签
+
+        缺失的标签通过一条批量 upsert 创建，已有标签的 use_count 按本批使用次数累加
+
+        Args:
+            prompt_tags: {提示词ID: 标签名列表}
+        """
+        prompt_tags = {
+            prompt_id: self.normalize_tag_names(names) for prompt_id, names in prompt_tags.items()
+        }
+        counts = Counter(tag for names in prompt_tags.values() for tag in names)
+        if not counts:
+            return
+
+        await self.db.table_upsert_many(
+            'prompt_tags',
+            [{'tag_name': tag, 'user_id': user_id, 'use_count': count} for tag, count in counts.items()],
+            ['user_id', 'tag_name'],
+            f"use_count = use_count + {self.db.upsert_value('use_count')}"
+        )
+        tag_names = list(counts)
+        tag_ids = {}
+        for start in range(0, len(tag_names), self.TAG_LOOKUP_CHUNK):
+            chunk = tag_names[start:start + self.TAG_LOOKUP_CHUNK]
+            placeholders = ', '.join(['?'] * len(chunk))
+            rows = await self.db.query(
+                f"SELECT id, tag_name FROM prompt_tags WHERE user_id = ? AND tag_name IN ({placeholders})",
+                [user_id] + chunk
+            )
+            tag_ids.update({row['tag_name']: row['id'] for row in rows})
+
+        # MySQL 默认排序规则不区分大小写，名称仅大小写不同时对应同一条标签
+        folded_ids = {name.casefold(): tag_id for name, tag_id in tag_ids.items()}
+        links = {
+            (prompt_id, tag_ids.get(tag) or folded_ids[tag.casefold()])
+            for prompt_id, names in prompt_tags.items() for tag in names
+        }
+        await self.db.table_insert_many('prompt_tag_map', [
+            {'prompt_id': prompt_id, 'tag_id': tag_id} for prompt_id, tag_id in sorted(links)
+        ])
+
+    async def clear_prompt_tags(self, prompt_id):
+        """删除提示词的全部标签关联并回退 use_count（SQLite 未启用外键级联，需显式删除）"""
+        rows = await self.db.query("SELECT tag_id FROM prompt_tag_map WHERE prompt_id = ?", [prompt_id])
+        if not rows:
+            return
+        await self.db.execute("DELETE FROM prompt_tag_map WHERE prompt_id = ?", [prompt_id])
+        await self._decrement_use_count([row['tag_id'] for row in rows])
+
+    async def _decrement_use_count(self, tag_ids):
+        placeholders = ', '.join(['?'] * len(tag_ids))
+        await self.db.execute(
+            f"UPDATE prompt_tags SET use_count = use_count - 1 WHERE id IN ({placeholders}) AND use_count > 0",
+            list(tag_ids)
+        )
+
     async def get_popular_tags(self, user_id, limit=20):
         """
         获取热门标签
@@ -103,8 +103,8 @@ class VersionDetailResponse:
 class VersionCompareData:
     from_version: dict = openapi.Object({}, description="源版本信息")
     to_version: dict = openapi.Object({}, description="目标版本信息")
-    changes: dict = openapi.Object({}, description="变更标记")
-    diff: dict = openapi.Object({}, description="差异详情")
+    changes: dict = openapi.Object({}, description="变更标记（<字段>_changed 与 changed_fields）")
+    diff: dict = openapi.Object({}, description="差异详情：{format, context, fields: {字段: 差异片段}}")
 
 
 @openapi.component
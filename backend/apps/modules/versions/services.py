@@ -4,15 +4,29 @@
 """
 import json
 import datetime
-import hashlib
-import re
 from sanic.log import logger
 
+from apps.modules.prompts.services import PromptService
+from apps.modules.tags.services import TagService
+from apps.utils.content_hash import combine_digests, compute_digests, dump_digests
+from apps.utils.library_cache import invalidate_library
+from apps.utils.text_diff import DEFAULT_CONTEXT_LINES, diff_field, field_text
+from apps.utils.version_storage import expand_versions, prepare_version_fields
+from apps.utils.pagination import (
+    build_cursor_page, build_offset_page, count_total, decode_cursor, invalidate_counts, keyset_condition
+)
+
+# 版本对比逐字段计算差异的字段
+DIFF_FIELDS = (
+    'title', 'description', 'requirement_report', 'thinking_points', 'initial_prompt', 'advice',
+    'final_prompt', 'system_prompt', 'conversation_history', 'tags', 'language', 'format'
+)
+# 对比结果中保留 <字段>_changed 标记的字段（兼容旧的返回结构）
+CHANGE_FLAG_FIELDS = ('title', 'description', 'final_prompt', 'tags')
+
 
 class VersionService:
     """版本管理服务类"""
-    CONTENT_FIELDS = ('final_prompt', 'system_prompt', 'initial_prompt', 'conversation_history')
-    
     def __init__(self, db):
         """
         初始化版本服务
@@ -22,40 +36,17 @@ class VersionService:
         """
         self.db = db
     
-    @classmethod
-    def _build_content_snapshot(cls, source):
-        """提取提示词核心内容字段"""
-        snapshot = {}
-        source = source or {}
-        for field in cls.CONTENT_FIELDS:
-            value = source.get(field, '')
-            if value is None:
-                value = ''
-            snapshot[field] = str(value).strip()
-        return snapshot
-    
-    @classmethod
-    def _normalize_content(cls, snapshot: dict) -> str:
-        """标准化内容用于哈希"""
-        parts = []
-        for field in cls.CONTENT_FIELDS:
-            value = snapshot.get(field, '')
-            if value:
-                normalized = value.replace('\r\n', '\n').strip()
-                normalized = re.sub(r'\s+', ' ', normalized)
-                if normalized:
-                    parts.append(f"{field}:{normalized}")
-        return '||'.join(parts).strip()
+    # ============ 辅助方法 ============
     
-    @classmethod
-    def _calculate_content_hash(cls, snapshot: dict) -> str:
-        """计算内容哈希"""
-        normalized = cls._normalize_content(snapshot)
-        if not normalized:
-            return ''
-        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+    @staticmethod
+    def _count_scope(prompt_id) -> str:
+        """版本列表计数缓存的域"""
+        return f'versions:{prompt_id}'
     
-    # ============ 辅助方法 ============
+    @staticmethod
+    def _text(value) -> str:
+        """写回文本列时 None 统一存为空串"""
+        return '' if value is None else str(value)
     
     @staticmethod
     def generate_next_version(current_version: str, change_type: str) -> str:
@@ -126,8 +117,8 @@ class VersionService:
         """
         try:
             # 1. 获取当前提示词
-            current_sql = f"SELECT * FROM prompts WHERE id = {prompt_id} AND user_id = {user_id}"
-            current_prompt = await self.db.get(current_sql)
+            current_sql = "SELECT * FROM prompts WHERE id = ? AND user_id = ?"
+            current_prompt = await self.db.get(current_sql, [prompt_id, user_id])
             
             if not current_prompt:
                 raise ValueError('提示词不存在或无权限')
@@ -142,54 +133,28 @@ class VersionService:
             else:
                 new_version = self.generate_next_version(current_version, change_type)
             
-            content_snapshot = self._build_content_snapshot(current_prompt)
-            content_hash = current_prompt.get('content_hash') or self._calculate_content_hash(content_snapshot)
+            content_hash = current_prompt.get('content_hash') or combine_digests(await compute_digests(current_prompt))
             
             # 3. 准备版本数据（完整快照）
-            version_data = {
-                'prompt_id': prompt_id,
-                'version_number': new_version,
-                'version_type': 'manual',
-                'version_tag': data.get('version_tag', None),
-                'content_hash': content_hash,
-                
-                # 内容快照
-                'title': current_prompt['title'],
-                'description': current_prompt.get('description', ''),
-                'requirement_report': current_prompt.get('requirement_report', ''),
-                'thinking_points': current_prompt.get('thinking_points', ''),
-                'initial_prompt': current_prompt.get('initial_prompt', ''),
-                'advice': current_prompt.get('advice', ''),
-                'final_prompt': current_prompt.get('final_prompt', ''),
-                'language': current_prompt.get('language', 'zh'),
-                'format': current_prompt.get('format', 'markdown'),
-                'tags': current_prompt.get('tags', ''),
-                
-                # 用户提示词上下文（保存完整上下文）
-                'system_prompt': current_prompt.get('system_prompt', ''),
-                'conversation_history': current_prompt.get('conversation_history', ''),
-                
-                # 元数据
-                'change_log': data.get('change_log', ''),
-                'change_summary': data.get('change_summary', '版本更新'),
-                'change_type': change_type,
-                'created_by': user_id,
-                'content_size': len(current_prompt.get('final_prompt', ''))
-            }
+            # 按关键帧间隔保存为完整快照或相对关键帧的差量
+            version_data = await prepare_version_fields(
+                self.db, prompt_id,
+                self.build_version_fields(prompt_id, user_id, current_prompt, new_version, data, content_hash)
+            )
             
             # 4. 插入版本表
             version_id = await self.db.table_insert('prompt_versions', version_data)
+            invalidate_counts(self.db, self._count_scope(prompt_id))
             
             # 5. 更新主表版本信息
             current_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             update_sql = (
-                "UPDATE prompts " 
-                "SET current_version = '" + new_version + "', "
-                "total_versions = total_versions + 1, "
-                "last_version_time = '" + current_time + "' "
-                "WHERE id = " + str(prompt_id)
+                "UPDATE prompts "
+                "SET current_version = ?, total_versions = total_versions + 1, last_version_time = ? "
+                "WHERE id = ?"
             )
-            await self.db.execute(update_sql)
+            await self.db.execute(update_sql, [new_version, current_time, prompt_id])
+            invalidate_library(self.db, user_id)
             
             logger.info(f'✅ 版本创建成功: prompt_id={prompt_id}, version={new_version}')
             
@@ -203,8 +168,49 @@ class VersionService:
             logger.error(f'❌ 创建版本失败: {e}')
             raise
     
+    @staticmethod
+    def build_version_fields(prompt_id, user_id, prompt, version_number, data, content_hash):
+        """
+        由提示词当前内容生成 prompt_versions 表的插入字段（完整快照）
+
+        Args:
+            prompt: 提示词行（prompts 表字段）
+            version_number: 版本号
+            data: 版本元数据（change_type/change_summary/change_log/version_tag）
+        """
+        return {
+            'prompt_id': prompt_id,
+            'version_number': version_number,
+            'version_type': 'manual',
+            'version_tag': data.get('version_tag', None),
+            'content_hash': content_hash,
+            
+            # 内容快照
+            'title': prompt['title'],
+            'description': prompt.get('description', ''),
+            'requirement_report': prompt.get('requirement_report', ''),
+            'thinking_points': prompt.get('thinking_points', ''),
+            'initial_prompt': prompt.get('initial_prompt', ''),
+            'advice': prompt.get('advice', ''),
+            'final_prompt': prompt.get('final_prompt', ''),
+            'language': prompt.get('language', 'zh'),
+            'format': prompt.get('format', 'markdown'),
+            'tags': prompt.get('tags', ''),
+            
+            # 用户提示词上下文（保存完整上下文）
+            'system_prompt': prompt.get('system_prompt', ''),
+            'conversation_history': prompt.get('conversation_history', ''),
+            
+            # 元数据
+            'change_log': data.get('change_log', ''),
+            'change_summary': data.get('change_summary', '版本更新'),
+            'change_type': data.get('change_type', 'patch'),
+            'created_by': user_id,
+            'content_size': len(prompt.get('final_prompt', ''))
+        }
+    
     async def get_version_history(self, prompt_id: int, user_id: int, 
-                                  page=1, limit=20, version_tag=None):
+                                  page=1, limit=20, version_tag=None, cursor=None, count_mode='exact'):
         """
         获取版本历史列表
         
@@ -214,40 +220,51 @@ class VersionService:
             page: 页码
             limit: 每页数量
             version_tag: 版本标签筛选（可选）
+            cursor: 分页游标（可选，首页传空字符串），传入时按游标分页
+            count_mode: 总数计算方式 exact/approx/none
         
         Returns:
-            dict: {total, page, limit, items}
+            dict: {total, page, limit, items}，游标分页时为 {limit, items, next_cursor, has_more}
         """
         try:
             # 1. 验证权限
-            check_sql = f"SELECT id FROM prompts WHERE id = {prompt_id} AND user_id = {user_id}"
-            exists = await self.db.get(check_sql)
+            check_sql = "SELECT id FROM prompts WHERE id = ? AND user_id = ?"
+            exists = await self.db.get(check_sql, [prompt_id, user_id])
             
             if not exists:
                 raise ValueError('提示词不存在或无权限')
             
             # 2. 构建WHERE条件
             where_conditions = [
-                f"v.prompt_id = {prompt_id}",
+                "v.prompt_id = ?",
                 "v.is_deleted = 0"
             ]
+            params = [prompt_id]
             
             if version_tag:
-                where_conditions.append(f"v.version_tag = '{version_tag}'")
-            
-            where_clause = " AND ".join(where_conditions)
+                where_conditions.append("v.version_tag = ?")
+                params.append(version_tag)
             
-            # 3. 计算偏移量
+            # 3. 计算偏移量（游标分页时改为按 (create_time, id) 定位，不统计总数）
             offset = (page - 1) * limit if page > 0 else 0
+            total = None
+            
+            if cursor is not None:
+                cursor_values = decode_cursor(cursor, 'create_time', 2)
+                if cursor_values:
+                    cursor_condition, cursor_params = keyset_condition(['v.create_time', 'v.id'], cursor_values)
+                    where_conditions.append(cursor_condition)
+                    params.extend(cursor_params)
+            
+            where_clause = " AND ".join(where_conditions)
             
             # 4. 查询总数
-            count_sql = f"""
-                SELECT COUNT(*) as total 
-                FROM prompt_versions v
-                WHERE {where_clause}
-            """
-            count_result = await self.db.get(count_sql)
-            total = count_result['total'] if count_result else 0
+            is_estimate = False
+            if cursor is None:
+                total, is_estimate = await count_total(
+                    self.db, count_mode, self._count_scope(prompt_id),
+                    f"FROM prompt_versions v WHERE {where_clause}", params
+                )
             
             # 5. 查询版本列表（包含作者信息）
             list_sql = f"""
@@ -260,25 +277,23 @@ class VersionService:
                 FROM prompt_versions v
                 LEFT JOIN users u ON v.created_by = u.id
                 WHERE {where_clause}
-                ORDER BY v.create_time DESC
-                LIMIT {limit} OFFSET {offset}
+                ORDER BY v.create_time DESC, v.id DESC
+                LIMIT ? {'' if cursor is not None else 'OFFSET ?'}
             """
             
-            items = await self.db.query(list_sql)
+            items = await self.db.query(list_sql, params + [limit + 1] + ([] if cursor is not None else [offset]))
             
             # 6. 格式化时间
             for item in items:
                 item['create_time'] = str(item['create_time']) if item.get('create_time') else ''
                 item['author_avatar'] = item.get('author_avatar', '')
             
+            if cursor is not None:
+                return build_cursor_page(items, limit, 'create_time', lambda row: [row['create_time'], row['id']])
+            
             logger.debug(f'✅ 查询版本列表成功: prompt_id={prompt_id}, total={total}')
             
-            return {
-                'total': total,
-                'page': page,
-                'limit': limit,
-                'items': items
-            }
+            return build_offset_page(items, page, limit, count_mode, total, is_estimate)
             
         except Exception as e:
             logger.error(f'❌ 查询版本列表失败: {e}')
@@ -298,47 +313,10 @@ class VersionService:
         """
         try:
             # 1. 验证权限并获取版本
-            sql = f"""
-                SELECT v.*, u.name as author_name, u.avatar as author_avatar
-                FROM prompt_versions v
-                LEFT JOIN users u ON v.created_by = u.id
-                INNER JOIN prompts p ON v.prompt_id = p.id
-                WHERE v.id = {version_id} 
-                  AND v.prompt_id = {prompt_id}
-                  AND p.user_id = {user_id}
-                  AND v.is_deleted = 0
-            """
-            
-            version = await self.db.get(sql)
-            
-            if not version:
-                raise ValueError('版本不存在或无权限')
+            version = (await self.load_versions(prompt_id, user_id, [version_id]))[version_id]
             
             # 2. 解析JSON字段
-            if version.get('thinking_points'):
-                try:
-                    version['thinking_points'] = json.loads(version['thinking_points'])
-                except:
-                    version['thinking_points'] = []
-            else:
-                version['thinking_points'] = []
-            
-            if version.get('advice'):
-                try:
-                    version['advice'] = json.loads(version['advice'])
-                except:
-                    version['advice'] = []
-            else:
-                version['advice'] = []
-            
-            if version.get('tags'):
-                version['tags'] = version['tags'].split(',') if version['tags'] else []
-            else:
-                version['tags'] = []
-            
-            # 3. 格式化时间
-            version['create_time'] = str(version['create_time']) if version.get('create_time') else ''
-            version['author_avatar'] = version.get('author_avatar', '')
+            self._format_version(version)
             
             logger.debug(f'✅ 获取版本详情成功: version_id={version_id}')
             
@@ -348,8 +326,71 @@ class VersionService:
             logger.error(f'❌ 获取版本详情失败: {e}')
             raise
     
+    async def load_versions(self, prompt_id: int, user_id: int, version_ids) -> dict:
+        """
+        一条查询批量获取同一提示词的多个版本（含权限校验），差量版本一并还原
+        
+        Args:
+            version_ids: 版本ID列表
+        
+        Returns:
+            dict: {version_id: 版本行}（JSON 字段保持原始文本）
+        
+        Raises:
+            ValueError: 任一版本不存在、已删除或无权限
+        """
+        version_ids = list(dict.fromkeys(int(version_id) for version_id in version_ids))
+        placeholders = ', '.join(['?'] * len(version_ids))
+        sql = f"""
+            SELECT v.*, u.name as author_name, u.avatar as author_avatar
+            FROM prompt_versions v
+            LEFT JOIN users u ON v.created_by = u.id
+            INNER JOIN prompts p ON v.prompt_id = p.id
+            WHERE v.id IN ({placeholders})
+              AND v.prompt_id = ?
+              AND p.user_id = ?
+              AND v.is_deleted = 0
+        """
+        rows = await self.db.query(sql, version_ids + [prompt_id, user_id])
+        if len(rows) != len(version_ids):
+            raise ValueError('版本不存在或无权限')
+        
+        # 差量版本由关键帧还原（关键帧一次取回）
+        await expand_versions(self.db, rows)
+        return {row['id']: row for row in rows}
+    
+    @staticmethod
+    def _format_version(version: dict) -> dict:
+        """解析版本行的 JSON 字段并格式化时间（原地修改）"""
+        if version.get('thinking_points'):
+            try:
+                version['thinking_points'] = json.loads(version['thinking_points'])
+            except:
+                version['thinking_points'] = []
+        else:
+            version['thinking_points'] = []
+        
+        if version.get('advice'):
+            try:
+                version['advice'] = json.loads(version['advice'])
+            except:
+                version['advice'] = []
+        else:
+            version['advice'] = []
+        
+        if version.get('tags'):
+            version['tags'] = version['tags'].split(',') if version['tags'] else []
+        else:
+            version['tags'] = []
+        
+        # 格式化时间
+        version['create_time'] = str(version['create_time']) if version.get('create_time') else ''
+        version['author_avatar'] = version.get('author_avatar', '')
+        return version
+    
     async def compare_versions(self, prompt_id: int, user_id: int, 
-                              from_version_id: int, to_version_id: int):
+                              from_version_id: int, to_version_id: int,
+                              diff_format: str = 'json', context: int = DEFAULT_CONTEXT_LINES):
         """
         对比两个版本
         
@@ -358,52 +399,39 @@ class VersionService:
             user_id: 用户ID
             from_version_id: 源版本ID
             to_version_id: 目标版本ID
+            diff_format: 差异格式 json/unified
+            context: 每个差异片段前后保留的行数
         
         Returns:
-            dict: 对比结果
+            dict: 对比结果（只含有变化字段的差异片段，不返回完整正文）
         """
         try:
-            # 1. 获取两个版本
-            from_version = await self.get_version_detail(prompt_id, user_id, from_version_id)
-            to_version = await self.get_version_detail(prompt_id, user_id, to_version_id)
-            
-            # 2. 计算变更标记
-            changes = {
-                'title_changed': from_version['title'] != to_version['title'],
-                'description_changed': from_version.get('description', '') != to_version.get('description', ''),
-                'final_prompt_changed': from_version.get('final_prompt', '') != to_version.get('final_prompt', ''),
-                'tags_changed': from_version.get('tags', '') != to_version.get('tags', '')
-            }
-            
-            # 3. 构建对比结果
+            # 1. 一条查询获取两个版本
+            versions = await self.load_versions(prompt_id, user_id, [from_version_id, to_version_id])
+            from_version = self._format_version(dict(versions[from_version_id]))
+            to_version = self._format_version(dict(versions[to_version_id]))
+            
+            # 2. 逐字段计算差异（未变化的字段不返回）
+            diff_fields = {}
+            for field in DIFF_FIELDS:
+                old = field_text(field, from_version.get(field))
+                new = field_text(field, to_version.get(field))
+                if old != new:
+                    diff_fields[field] = await diff_field(field, old, new, diff_format, context)
+            
+            # 3. 计算变更标记
+            changes = {f'{field}_changed': field in diff_fields for field in CHANGE_FLAG_FIELDS}
+            changes['changed_fields'] = list(diff_fields)
+            
+            # 4. 构建对比结果
             result = {
-                'from_version': {
-                    'id': from_version['id'],
-                    'version_number': from_version['version_number'],
-                    'title': from_version['title'],
-                    'description': from_version.get('description', ''),
-                    'final_prompt': from_version.get('final_prompt', ''),
-                    'tags': from_version.get('tags', []),
-                    'create_time': from_version['create_time'],
-                    'author_name': from_version.get('author_name', '')
-                },
-                'to_version': {
-                    'id': to_version['id'],
-                    'version_number': to_version['version_number'],
-                    'title': to_version['title'],
-                    'description': to_version.get('description', ''),
-                    'final_prompt': to_version.get('final_prompt', ''),
-                    'tags': to_version.get('tags', []),
-                    'create_time': to_version['create_time'],
-                    'author_name': to_version.get('author_name', '')
-                },
+                'from_version': self._compare_summary(from_version),
+                'to_version': self._compare_summary(to_version),
                 'changes': changes,
                 'diff': {
-                    # 简化的diff，前端可以使用更复杂的diff算法
-                    'final_prompt': {
-                        'from': from_version.get('final_prompt', ''),
-                        'to': to_version.get('final_prompt', '')
-                    }
+                    'format': diff_format,
+                    'context': context,
+                    'fields': diff_fields
                 }
             }
             
@@ -415,6 +443,17 @@ class VersionService:
             logger.error(f'❌ 版本对比失败: {e}')
             raise
     
+    @staticmethod
+    def _compare_summary(version: dict) -> dict:
+        return {
+            'id': version['id'],
+            'version_number': version['version_number'],
+            'title': version['title'],
+            'tags': version.get('tags', []),
+            'create_time': version['create_time'],
+            'author_name': version.get('author_name', '')
+        }
+    
     async def rollback_to_version(self, prompt_id: int, user_id: int, 
                                   version_id: int, change_summary=None):
         """
@@ -430,91 +469,81 @@ class VersionService:
             dict: {new_version, rollback_to_version}
         """
         try:
-            # 1. 获取目标版本
-            target_version = await self.get_version_detail(prompt_id, user_id, version_id)
+            # 1. 获取目标版本（含权限校验），JSON 字段保持原始文本直接写回
+            target_version = (await self.load_versions(prompt_id, user_id, [version_id]))[version_id]
+            tags_value = self._text(target_version.get("tags", ""))
             
-            # 2. 获取当前提示词信息
-            current_sql = f"SELECT * FROM prompts WHERE id = {prompt_id} AND user_id = {user_id}"
-            current_prompt = await self.db.get(current_sql)
+            # 按目标版本内容重新计算字段摘要，保持与 content_hash 一致
+            target_digests = await compute_digests(target_version)
+            target_hash = combine_digests(target_digests)
             
-            if not current_prompt:
-                raise ValueError('提示词不存在或无权限')
-            
-            # 3. 先保存当前版本（作为回滚前的备份）
-            backup_data = {
-                'change_type': 'patch',
-                'change_summary': change_summary or f'回滚前的备份（将回滚到 {target_version["version_number"]}）',
-                'change_log': '自动创建的回滚前备份',
-                'version_tag': 'pre-rollback'
-            }
-            # 注释掉备份逻辑，直接回滚更简洁
-            # await self.create_version(prompt_id, user_id, backup_data)
-            
-            # 4. 将目标版本内容复制到主表
-            def escape_sql_string(value):
-                """转义SQL字符串中的特殊字符"""
-                if value is None:
-                    return ''
-                s = str(value)
-                s = s.replace("\\", "\\\\")
-                s = s.replace("'", "''")
-                s = s.replace("%", "%%")
-                return s
-            
-            # 处理tags字段（可能是列表，需要转换为逗号分隔的字符串）
-            tags_value = target_version.get("tags", "")
-            if isinstance(tags_value, list):
-                tags_value = ','.join(tags_value)
-            
-            # 处理thinking_points和advice字段（可能是列表，需要转换为JSON字符串）
-            thinking_points_value = target_version.get("thinking_points", "")
-            if isinstance(thinking_points_value, list):
-                thinking_points_value = json.dumps(thinking_points_value, ensure_ascii=False)
-            
-            advice_value = target_version.get("advice", "")
-            if isinstance(advice_value, list):
-                advice_value = json.dumps(advice_value, ensure_ascii=False)
-            
-            target_snapshot = self._build_content_snapshot(target_version)
-            target_hash = target_version.get('content_hash') or self._calculate_content_hash(target_snapshot)
-            
-            update_sql = f"""
+            # 2. 一条 UPDATE 将目标版本内容与版本号写回主表（不创建新版本）；
+            # 版本号取自版本表，版本在读取后被删除或提示词不属于该用户时影响行数为 0
+            target_version_num = target_version['version_number']
+            update_sql = """
                 UPDATE prompts SET
-                    title = '{escape_sql_string(target_version["title"])}',
-                    description = '{escape_sql_string(target_version.get("description", ""))}',
-                    requirement_report = '{escape_sql_string(target_version.get("requirement_report", ""))}',
-                    thinking_points = '{escape_sql_string(thinking_points_value)}',
-                    initial_prompt = '{escape_sql_string(target_version.get("initial_prompt", ""))}',
-                    advice = '{escape_sql_string(advice_value)}',
-                    final_prompt = '{escape_sql_string(target_version.get("final_prompt", ""))}',
-                    language = '{escape_sql_string(target_version.get("language", "zh"))}',
-                    format = '{escape_sql_string(target_version.get("format", "markdown"))}',
-                    tags = '{escape_sql_string(tags_value)}',
-                    system_prompt = '{escape_sql_string(target_version.get("system_prompt", ""))}',
-                    conversation_history = '{escape_sql_string(target_version.get("conversation_history", ""))}',
-                    content_hash = '{escape_sql_string(target_hash)}'
-                WHERE id = {prompt_id}
+                    title = ?,
+                    description = ?,
+                    requirement_report = ?,
+                    thinking_points = ?,
+                    initial_prompt = ?,
+                    advice = ?,
+                    final_prompt = ?,
+                    language = ?,
+                    format = ?,
+                    tags = ?,
+                    system_prompt = ?,
+                    conversation_history = ?,
+                    content_hash = ?,
+                    content_digests = ?,
+                    preview = ?,
+                    current_version = (SELECT v.version_number FROM prompt_versions v WHERE v.id = ?),
+                    last_version_time = ?
+                WHERE id = ?
+                  AND user_id = ?
+                  AND EXISTS (
+                      SELECT 1 FROM prompt_versions v
+                      WHERE v.id = ? AND v.prompt_id = ? AND v.is_deleted = 0
+                  )
             """
-            await self.db.execute(update_sql)
+            updated = await self.db.execute(update_sql, [
+                self._text(target_version["title"]),
+                self._text(target_version.get("description", "")),
+                self._text(target_version.get("requirement_report", "")),
+                self._text(target_version.get("thinking_points", "")),
+                self._text(target_version.get("initial_prompt", "")),
+                self._text(target_version.get("advice", "")),
+                self._text(target_version.get("final_prompt", "")),
+                self._text(target_version.get("language", "zh")),
+                self._text(target_version.get("format", "markdown")),
+                tags_value,
+                self._text(target_version.get("system_prompt", "")),
+                self._text(target_version.get("conversation_history", "")),
+                self._text(target_hash),
+                dump_digests(target_digests),
+                PromptService.build_preview(target_version.get("final_prompt", "")),
+                version_id,
+                datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                prompt_id,
+                user_id,
+                version_id,
+                prompt_id
+            ])
+            if not updated:
+                raise ValueError('版本不存在或无权限')
             
-            # 5. 直接更新主表版本号为目标版本（不创建新版本）
-            target_version_num = target_version['version_number']
-            update_version_sql = f"""
-                UPDATE prompts 
-                SET current_version = '{target_version_num}',
-                    last_version_time = '{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}'
-                WHERE id = {prompt_id}
-            """
-            await self.db.execute(update_version_sql)
+            # 同步标签关联
+            await TagService(self.db).sync_prompt_tags(user_id, prompt_id, tags_value.split(','))
             
-            # 6. 更新被回滚版本的统计
-            update_stats_sql = f"""
+            # 3. 更新被回滚版本的统计
+            update_stats_sql = """
                 UPDATE prompt_versions 
                 SET rollback_count = rollback_count + 1,
                     use_count = use_count + 1
-                WHERE id = {version_id}
+                WHERE id = ?
             """
-            await self.db.execute(update_stats_sql)
+            await self.db.execute(update_stats_sql, [version_id])
+            invalidate_library(self.db, user_id)
             
             logger.info(f'✅ 回滚成功: prompt_id={prompt_id}, to_version={target_version_num}')
             
@@ -543,26 +572,27 @@ class VersionService:
         """
         try:
             # 1. 验证权限
-            check_sql = f"""
+            check_sql = """
                 SELECT v.id 
                 FROM prompt_versions v
                 INNER JOIN prompts p ON v.prompt_id = p.id
-                WHERE v.id = {version_id} 
-                  AND v.prompt_id = {prompt_id}
-                  AND p.user_id = {user_id}
+                WHERE v.id = ?
+                  AND v.prompt_id = ?
+                  AND p.user_id = ?
             """
-            exists = await self.db.get(check_sql)
+            exists = await self.db.get(check_sql, [version_id, prompt_id, user_id])
             
             if not exists:
                 raise ValueError('版本不存在或无权限')
             
             # 2. 更新标签
-            update_sql = f"""
+            update_sql = """
                 UPDATE prompt_versions 
-                SET version_tag = '{version_tag}'
-                WHERE id = {version_id}
+                SET version_tag = ?
+                WHERE id = ?
             """
-            await self.db.execute(update_sql)
+            await self.db.execute(update_sql, [version_tag, version_id])
+            invalidate_counts(self.db, self._count_scope(prompt_id))
             
             logger.info(f'✅ 更新版本标签成功: version_id={version_id}, tag={version_tag}')
             
@@ -586,16 +616,16 @@ class VersionService:
         """
         try:
             # 1. 获取版本信息
-            version_sql = f"""
+            version_sql = """
                 SELECT v.*, p.current_version
                 FROM prompt_versions v
                 INNER JOIN prompts p ON v.prompt_id = p.id
-                WHERE v.id = {version_id} 
-                  AND v.prompt_id = {prompt_id}
-                  AND p.user_id = {user_id}
+                WHERE v.id = ?
+                  AND v.prompt_id = ?
+                  AND p.user_id = ?
                   AND v.is_deleted = 0
             """
-            version = await self.db.get(version_sql)
+            version = await self.db.get(version_sql, [version_id, prompt_id, user_id])
             
             if not version:
                 raise ValueError('版本不存在或无权限')
@@ -610,20 +640,22 @@ class VersionService:
                 raise ValueError('不能删除当前激活的版本')
             
             # 3. 软删除
-            delete_sql = f"""
+            delete_sql = """
                 UPDATE prompt_versions 
                 SET is_deleted = 1
-                WHERE id = {version_id}
+                WHERE id = ?
             """
-            await self.db.execute(delete_sql)
+            await self.db.execute(delete_sql, [version_id])
+            invalidate_counts(self.db, self._count_scope(prompt_id))
             
             # 4. 更新主表版本数
-            update_count_sql = f"""
+            update_count_sql = """
                 UPDATE prompts 
                 SET total_versions = total_versions - 1
-                WHERE id = {prompt_id}
+                WHERE id = ?
             """
-            await self.db.execute(update_count_sql)
+            await self.db.execute(update_count_sql, [prompt_id])
+            invalidate_library(self.db, user_id)
             
             logger.info(f'✅ 删除版本成功: version_id={version_id}')
             
@@ -8,12 +8,17 @@ from sanic_ext import openapi
 from sanic.log import logger
 
 from apps.utils.auth_middleware import auth_required
+from apps.utils.db_utils import error_response, register_unit_of_work
+from apps.utils.pagination import InvalidCursorError, get_cursor_arg, normalize_count_mode
+from apps.utils.text_diff import DEFAULT_CONTEXT_LINES, DIFF_FORMATS, MAX_CONTEXT_LINES
 from .services import VersionService
 from .models import *
 
 
 # 创建版本管理蓝图
 versions = Blueprint('versions', url_prefix='/api/versions')
+# 请求级工作单元：同一请求共用一个连接和事务
+register_unit_of_work(versions)
 
 
 @versions.post('/<prompt_id:int>')
@@ -33,22 +38,13 @@ async def create_version(request, prompt_id):
         
         # 参数验证
         if not data.get('change_type'):
-            return json({
-                'code': 400,
-                'message': '缺少change_type参数'
-            })
+            return error_response(request, 400, '缺少change_type参数')
         
         if data['change_type'] not in ['major', 'minor', 'patch']:
-            return json({
-                'code': 400,
-                'message': 'change_type必须是major、minor或patch'
-            })
+            return error_response(request, 400, 'change_type必须是major、minor或patch')
         
         if not data.get('change_summary'):
-            return json({
-                'code': 400,
-                'message': '缺少change_summary参数'
-            })
+            return error_response(request, 400, '缺少change_summary参数')
         
         # 创建版本
         version_service = VersionService(request.app.ctx.db)
@@ -61,16 +57,10 @@ async def create_version(request, prompt_id):
         })
         
     except ValueError as e:
-        return json({
-            'code': 404,
-            'message': str(e)
-        })
+        return error_response(request, 404, str(e))
     except Exception as e:
         logger.error(f'❌ 创建版本失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'创建失败: {str(e)}'
-        })
+        return error_response(request, 500, f'创建失败: {str(e)}')
 
 
 @versions.get('/<prompt_id:int>/versions')
@@ -81,6 +71,8 @@ async def create_version(request, prompt_id):
 @openapi.parameter("page", int, "query", description="页码", required=False)
 @openapi.parameter("limit", int, "query", description="每页数量", required=False)
 @openapi.parameter("tag", str, "query", description="版本标签筛选", required=False)
+@openapi.parameter("cursor", str, "query", description="分页游标（首页传空字符串，后续传上一页的 next_cursor）", required=False)
+@openapi.parameter("count", str, "query", description="总数计算方式 exact（默认，带缓存）/approx（封顶近似）/none（仅返回 has_more）", required=False)
 @openapi.response(200, {"application/json": VersionListResponse}, description="查询成功")
 async def get_version_list(request, prompt_id):
     """获取版本列表"""
@@ -91,6 +83,8 @@ async def get_version_list(request, prompt_id):
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 20))
         version_tag = request.args.get('tag', None)
+        cursor = get_cursor_arg(request)
+        count_mode = normalize_count_mode(request.args.get('count'))
         
         # 参数校验
         if page < 1:
@@ -101,7 +95,7 @@ async def get_version_list(request, prompt_id):
         # 查询列表
         version_service = VersionService(request.app.ctx.db)
         result = await version_service.get_version_history(
-            prompt_id, user_id, page, limit, version_tag
+            prompt_id, user_id, page, limit, version_tag, cursor, count_mode
         )
         
         return json({
@@ -109,17 +103,13 @@ async def get_version_list(request, prompt_id):
             'data': result
         })
         
+    except InvalidCursorError as e:
+        return error_response(request, 400, str(e))
     except ValueError as e:
-        return json({
-            'code': 404,
-            'message': str(e)
-        })
+        return error_response(request, 404, str(e))
     except Exception as e:
         logger.error(f'❌ 获取版本列表失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'查询失败: {str(e)}'
-        })
+        return error_response(request, 500, f'查询失败: {str(e)}')
 
 
 @versions.get('/<prompt_id:int>/versions/<version_id:int>')
@@ -144,25 +134,21 @@ async def get_version_detail(request, prompt_id, version_id):
         })
         
     except ValueError as e:
-        return json({
-            'code': 404,
-            'message': str(e)
-        })
+        return error_response(request, 404, str(e))
     except Exception as e:
         logger.error(f'❌ 获取版本详情失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'查询失败: {str(e)}'
-        })
+        return error_response(request, 500, f'查询失败: {str(e)}')
 
 
 @versions.get('/<prompt_id:int>/versions/compare')
 @auth_required
 @openapi.summary("版本对比")
-@openapi.description("对比两个版本的差异")
+@openapi.description("对比两个版本的差异：服务端逐字段计算行级（替换行再细分到词/字）差异，只返回有变化的片段及上下文")
 @openapi.secured("BearerAuth")
 @openapi.parameter("from", int, "query", description="源版本ID", required=True)
 @openapi.parameter("to", int, "query", description="目标版本ID", required=True)
+@openapi.parameter("format", str, "query", description="差异格式: json(默认，含词级差异)/unified")
+@openapi.parameter("context", int, "query", description="每个差异片段前后保留的行数（默认3，最大20）")
 @openapi.response(200, {"application/json": VersionCompareResponse}, description="对比成功")
 async def compare_versions(request, prompt_id):
     """版本对比"""
@@ -174,18 +160,24 @@ async def compare_versions(request, prompt_id):
         to_version_id = request.args.get('to')
         
         if not from_version_id or not to_version_id:
-            return json({
-                'code': 400,
-                'message': '缺少from或to参数'
-            })
+            return error_response(request, 400, '缺少from或to参数')
         
         from_version_id = int(from_version_id)
         to_version_id = int(to_version_id)
         
+        diff_format = request.args.get('format', 'json')
+        if diff_format not in DIFF_FORMATS:
+            return error_response(request, 400, 'format 需为 json 或 unified')
+        try:
+            context = int(request.args.get('context', DEFAULT_CONTEXT_LINES))
+        except ValueError:
+            return error_response(request, 400, 'context 需为整数')
+        context = max(0, min(context, MAX_CONTEXT_LINES))
+        
         # 对比版本
         version_service = VersionService(request.app.ctx.db)
         result = await version_service.compare_versions(
-            prompt_id, user_id, from_version_id, to_version_id
+            prompt_id, user_id, from_version_id, to_version_id, diff_format, context
         )
         
         return json({
@@ -194,16 +186,10 @@ async def compare_versions(request, prompt_id):
         })
         
     except ValueError as e:
-        return json({
-            'code': 404,
-            'message': str(e)
-        })
+        return error_response(request, 404, str(e))
     except Exception as e:
         logger.error(f'❌ 版本对比失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'对比失败: {str(e)}'
-        })
+        return error_response(request, 500, f'对比失败: {str(e)}')
 
 
 @versions.post('/<prompt_id:int>/versions/<version_id:int>/rollback')
@@ -233,16 +219,10 @@ async def rollback_version(request, prompt_id, version_id):
         })
         
     except ValueError as e:
-        return json({
-            'code': 404,
-            'message': str(e)
-        })
+        return error_response(request, 404, str(e))
     except Exception as e:
         logger.error(f'❌ 回滚失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'回滚失败: {str(e)}'
-        })
+        return error_response(request, 500, f'回滚失败: {str(e)}')
 
 
 @versions.put('/<prompt_id:int>/versions/<version_id:int>/tag')
@@ -260,10 +240,7 @@ async def update_version_tag(request, prompt_id, version_id):
         
         # 参数验证
         if not data.get('version_tag'):
-            return json({
-                'code': 400,
-                'message': '缺少version_tag参数'
-            })
+            return error_response(request, 400, '缺少version_tag参数')
         
         # 更新标签
         version_service = VersionService(request.app.ctx.db)
@@ -277,16 +254,10 @@ async def update_version_tag(request, prompt_id, version_id):
         })
         
     except ValueError as e:
-        return json({
-            'code': 404,
-            'message': str(e)
-        })
+        return error_response(request, 404, str(e))
     except Exception as e:
         logger.error(f'❌ 更新标签失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'更新失败: {str(e)}'
-        })
+        return error_response(request, 500, f'更新失败: {str(e)}')
 
 
 @versions.delete('/<prompt_id:int>/versions/<version_id:int>')
@@ -310,14 +281,8 @@ async def delete_version(request, prompt_id, version_id):
         })
         
     except ValueError as e:
-        return json({
-            'code': 400,
-            'message': str(e)
-        })
+        return error_response(request, 400, str(e))
     except Exception as e:
         logger.error(f'❌ 删除版本失败: {e}')
-        return json({
-            'code': 500,
-            'message': f'删除失败: {str(e)}'
-        })
+        return error_response(request, 500, f'删除失败: {str(e)}')
 
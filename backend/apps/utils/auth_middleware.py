@@ -6,6 +6,7 @@ from functools import wraps
 from sanic.response import json
 from sanic.log import logger
 from apps.utils.jwt_utils import JWTUtil
+from apps.utils.db_adapter import set_read_consistency_key
 
 
 def auth_required(func):
@@ -56,6 +57,8 @@ def auth_required(func):
         # 4. 将用户信息添加到request上下文
         request.ctx.user_id = payload['user_id']
         request.ctx.open_id = payload['open_id']
+        # 该用户写入后的读请求在粘滞窗口内走主库
+        set_read_consistency_key(payload['user_id'])
         
         logger.debug(f'✅ 认证成功: user_id={payload["user_id"]}, path={request.path}')
         
@@ -88,6 +91,7 @@ def optional_auth(func):
         # 初始化用户信息为None
         request.ctx.user_id = None
         request.ctx.open_id = None
+        set_read_consistency_key(None)
         
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
@@ -96,6 +100,7 @@ def optional_auth(func):
             if payload:
                 request.ctx.user_id = payload['user_id']
                 request.ctx.open_id = payload['open_id']
+                set_read_consistency_key(payload['user_id'])
                 logger.debug(f'✅ 可选认证: 已登录用户访问 user_id={payload["user_id"]}')
             else:
                 logger.debug(f'⚠️  可选认证: Token无效,按未登录处理')
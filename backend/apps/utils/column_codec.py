@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""大文本列透明压缩
+
+对 COLUMN_COMPRESSION_COLUMNS 中配置的 表.列，写入时 UTF-8 长度不小于
+COLUMN_COMPRESSION_MIN_BYTES 的文本压缩后以 ``标记前缀 + base64`` 保存，读取时按前缀还原：
+
+- 写入：适配器的 table_insert / table_insert_many / table_upsert_many / table_update
+  按表名编码（手写的 INSERT/UPDATE 语句不经过编码，照常保存原文）
+- 读取：get / query / stream_batches 返回的行中，配置过的列名带有标记前缀时自动解码；
+  未压缩的旧数据原样返回，无需迁移
+- 压缩算法优先 zstd（需安装 zstandard），否则使用 zlib；解压按数据头自动识别
+- 单批待处理文本超过 COLUMN_COMPRESSION_OFFLOAD_BYTES 时放到线程池执行
+- 压缩后（含 base64 膨胀）不比原文短时保存原文
+
+压缩后的列无法再被 SQL 直接检索，参与全文检索的 prompts 列（见 fulltext.FULLTEXT_COLUMNS）
+即使配置了也会被忽略。
+"""
+
+import asyncio
+import base64
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sanic.log import logger
+
+from apps.utils.fulltext import FULLTEXT_COLUMNS
+
+try:
+    import zstandard
+except ImportError:  # 未安装时退回 zlib
+    zstandard = None
+
+CODEC_MARKER = '\x1ez'
+PREFIXES = {'zstd': CODEC_MARKER + 'std:', 'zlib': CODEC_MARKER + 'lib:'}
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+_DECODE_ERRORS = (ValueError, zlib.error, RuntimeError) + ((zstandard.ZstdError,) if zstandard else ())
+
+DEFAULT_COLUMNS = (
+    'prompt_versions.delta_data',
+    'prompt_versions.conversation_history',
+    'playground_shares.messages_json',
+    'playground_shares.artifact_content',
+)
+DEFAULT_MIN_BYTES = 1024
+DEFAULT_OFFLOAD_BYTES = 256 * 1024
+
+
+def compress_bytes(raw: bytes, algorithm: str = 'zstd') -> bytes:
+    """压缩字节串（zstd 不可用时使用 zlib）"""
+    if algorithm == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress_bytes(body: bytes) -> bytes:
+    """按数据头识别 zstd / zlib 并解压"""
+    if body[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError('数据使用 zstd 压缩，需要安装 zstandard')
+        return zstandard.ZstdDecompressor().decompress(body)
+    return zlib.decompress(body)
+
+
+class ColumnCodec:
+    """按 表.列 配置的透明压缩编解码器"""
+
+    def __init__(self):
+        self.algorithm = 'zstd' if zstandard is not None else 'zlib'
+        self.min_bytes = DEFAULT_MIN_BYTES
+        self.offload_bytes = DEFAULT_OFFLOAD_BYTES
+        # {table: (column, ...)}
+        self._tables: Dict[str, Tuple[str, ...]] = {}
+        # 读取时检查的列名
+        self._column_names: Tuple[str, ...] = ()
+        self._metrics: Dict[str, Dict[str, int]] = {}
+        self._decoded: Counter = Counter()
+        self.configure(columns=DEFAULT_COLUMNS)
+
+    def configure(self, columns: Optional[Iterable[str]] = None, min_bytes: Optional[int] = None,
+                  algorithm: Optional[str] = None, offload_bytes: Optional[int] = None):
+        if min_bytes is not None:
+            self.min_bytes = max(1, int(min_bytes))
+        if offload_bytes is not None:
+            self.offload_bytes = max(0, int(offload_bytes))
+        if algorithm is not None:
+            if algorithm == 'zstd' and zstandard is None:
+                logger.warning('⚠️  未安装 zstandard，列压缩使用 zlib')
+                algorithm = 'zlib'
+            if algorithm not in PREFIXES:
+                raise ValueError(f'不支持的压缩算法: {algorithm}')
+            self.algorithm = algorithm
+        if columns is not None:
+            tables: Dict[str, List[str]] = {}
+            for name in columns:
+                table, _, column = name.strip().partition('.')
+                if not table or not column:
+                    continue
+                if table == 'prompts' and column in FULLTEXT_COLUMNS:
+                    logger.warning(f'⚠️  {name} 参与全文检索，不做压缩')
+                    continue
+                tables.setdefault(table, [])
+                if column not in tables[table]:
+                    tables[table].append(column)
+            self._tables = {table: tuple(names) for table, names in tables.items()}
+            self._column_names = tuple(sorted({column for names in tables.values() for column in names}))
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._tables)
+
+    # ============ 编码 ============
+
+    async def encode_row(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """返回编码后的行（需要压缩时为副本，调用方的字典不变）"""
+        return (await self.encode_rows(table, [data]))[0]
+
+    async def encode_rows(self, table: str, rows: Sequence[Dict[str, Any]]) -> Sequence[Dict[str, Any]]:
+        columns = self._tables.get(table)
+        if not columns:
+            return rows
+        # (行下标, 列, 原文)
+        pending = [
+            (index, column, row[column])
+            for index, row in enumerate(rows)
+            for column in columns
+            if isinstance(row.get(column), str) and self._wants(row[column])
+        ]
+        if not pending:
+            return rows
+
+        encoded = await self._run(
+            self._encode_all, [value for _, _, value in pending], sum(len(value) for _, _, value in pending)
+        )
+        rows = list(rows)
+        copied = set()
+        for (index, column, value), (stored, raw_size) in zip(pending, encoded):
+            metrics = self._column_metrics(table, column)
+            if stored is value:
+                metrics['skipped'] += 1
+                continue
+            if index not in copied:
+                rows[index] = dict(rows[index])
+                copied.add(index)
+            rows[index][column] = stored
+            metrics['encoded'] += 1
+            metrics['raw_bytes'] += raw_size
+            metrics['stored_bytes'] += len(stored)
+        return rows
+
+    def _wants(self, value: str) -> bool:
+        # 字符数 * 4 是 UTF-8 长度的上界，先粗筛；以标记开头的原文必须编码，否则读取时会被误当作压缩数据
+        return len(value) * 4 >= self.min_bytes or value.startswith(CODEC_MARKER)
+
+    def _encode_all(self, values: List[str]) -> List[Tuple[Any, int]]:
+        return [self._encode(value) for value in values]
+
+    def _encode(self, value: str) -> Tuple[Any, int]:
+        raw = value.encode('utf-8')
+        escaped = value.startswith(CODEC_MARKER)
+        if len(raw) < self.min_bytes and not escaped:
+            return value, len(raw)
+        stored = PREFIXES[self.algorithm] + base64.b64encode(compress_bytes(raw, self.algorithm)).decode('ascii')
+        if len(stored) >= len(raw) and not escaped:
+            return value, len(raw)
+        return stored, len(raw)
+
+    # ============ 解码 ============
+
+    async def decode_rows(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """原地解码查询结果中带标记前缀的列"""
+        if not self._column_names or not rows:
+            return rows
+        pending = [
+            (row, column)
+            for row in rows
+            for column in self._column_names
+            if isinstance(row.get(column), str) and row[column].startswith(CODEC_MARKER)
+        ]
+        if not pending:
+            return rows
+        values = await self._run(
+            self._decode_all, [row[column] for row, column in pending], sum(len(row[column]) for row, column in pending)
+        )
+        for (row, column), value in zip(pending, values):
+            row[column] = value
+        self._decoded.update(column for _, column in pending)
+        return rows
+
+    @staticmethod
+    def _decode_all(values: List[str]) -> List[str]:
+        return [ColumnCodec._decode(value) for value in values]
+
+    @staticmethod
+    def _decode(value: str) -> str:
+        for prefix in PREFIXES.values():
+            if value.startswith(prefix):
+                try:
+                    return decompress_bytes(base64.b64decode(value[len(prefix):])).decode('utf-8')
+                except _DECODE_ERRORS as e:
+                    # 同名列在未配置压缩的表中可能恰好以标记开头，按原文返回
+                    logger.warning(f'⚠️  列解压失败，按原文返回: {e}')
+                    return value
+        return value
+
+    async def _run(self, func, payload, size: int):
+        if self.offload_bytes and size > self.offload_bytes:
+            return await asyncio.get_running_loop().run_in_executor(None, func, payload)
+        return func(payload)
+
+    # ============ 统计 ============
+
+    def _column_metrics(self, table: str, column: str) -> Dict[str, int]:
+        key = f'{table}.{column}'
+        if key not in self._metrics:
+            self._metrics[key] = {'encoded': 0, 'skipped': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+        return self._metrics[key]
+
+    def stats(self) -> Dict[str, Any]:
+        columns = {}
+        for table, names in self._tables.items():
+            for column in names:
+                metrics = dict(self._column_metrics(table, column))
+                metrics['ratio'] = (
+                    round(metrics['stored_bytes'] / metrics['raw_bytes'], 4) if metrics['raw_bytes'] else None
+                )
+                metrics['decoded'] = self._decoded.get(column, 0)
+                columns[f'{table}.{column}'] = metrics
+        return {
+            'enabled': self.enabled,
+            'algorithm': self.algorithm,
+            'min_bytes': self.min_bytes,
+            'offload_bytes': self.offload_bytes,
+            'columns': columns,
+        }
+
+
+# 进程内全局实例，由 db_utils 在启动时配置，数据库适配器在读写时调用
+column_codec = ColumnCodec()
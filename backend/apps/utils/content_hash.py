@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""提示词内容哈希
+
+核心内容字段（CONTENT_FIELDS）各自标准化后计算 SHA-256 摘要，以 JSON 存入
+prompts.content_digests；content_hash 由各字段摘要合成。保存时只需对请求中出现的
+字段重新计算摘要，其余字段沿用已存摘要，无需读取和重新标准化整段对话历史。
+
+待哈希文本超过 CONTENT_HASH_OFFLOAD_BYTES 时放到线程池计算，避免阻塞事件循环。
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+CONTENT_FIELDS = ('final_prompt', 'system_prompt', 'initial_prompt', 'conversation_history')
+DEFAULT_OFFLOAD_BYTES = 256 * 1024
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_settings = {'offload_bytes': DEFAULT_OFFLOAD_BYTES}
+
+
+def configure_content_hashing(offload_bytes: Optional[int] = None):
+    """应用启动时按配置调整线程池计算阈值（0 表示始终在事件循环内计算）"""
+    if offload_bytes is not None:
+        _settings['offload_bytes'] = max(0, int(offload_bytes))
+
+
+def normalize_field(value: Any) -> str:
+    """统一换行并将连续空白折叠为单个空格"""
+    if value is None:
+        return ''
+    return _WHITESPACE_RE.sub(' ', str(value).replace('\r\n', '\n').strip())
+
+
+def field_digest(value: Any) -> str:
+    """单个字段的摘要，空内容为空字符串"""
+    normalized = normalize_field(value)
+    if not normalized:
+        return ''
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def combine_digests(digests: Mapping[str, str]) -> str:
+    """由各字段摘要合成 content_hash，全部为空时返回空字符串"""
+    parts = [f"{field}:{digests[field]}" for field in CONTENT_FIELDS if digests.get(field)]
+    if not parts:
+        return ''
+    return hashlib.sha256('||'.join(parts).encode('utf-8')).hexdigest()
+
+
+def _digest_fields(values: Mapping[str, Any], fields: Iterable[str]) -> Dict[str, str]:
+    return {field: field_digest(values.get(field)) for field in fields}
+
+
+async def compute_digests(values: Mapping[str, Any], fields: Iterable[str] = CONTENT_FIELDS) -> Dict[str, str]:
+    """计算 values 中指定字段的摘要，大文本放到线程池执行"""
+    fields = [field for field in fields if field in CONTENT_FIELDS]
+    size = sum(len(str(values.get(field) or '')) for field in fields)
+    threshold = _settings['offload_bytes']
+    if threshold and size > threshold:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, _digest_fields, values, fields)
+    return _digest_fields(values, fields)
+
+
+def load_digests(raw: Any) -> Optional[Dict[str, str]]:
+    """解析 content_digests 列，缺失或不完整（旧数据）时返回 None"""
+    if not raw:
+        return None
+    try:
+        digests = json.loads(raw) if isinstance(raw, str) else dict(raw)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(digests, dict) or any(field not in digests for field in CONTENT_FIELDS):
+        return None
+    return {field: digests[field] or '' for field in CONTENT_FIELDS}
+
+
+def dump_digests(digests: Mapping[str, str]) -> str:
+    return json.dumps({field: digests.get(field, '') for field in CONTENT_FIELDS}, separators=(',', ':'))
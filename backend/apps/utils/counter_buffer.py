@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""计数器合并写入（write-behind）
+
+浏览/使用次数等计数按 (表, 行ID, 列) 在内存中累加，每隔 COUNTER_FLUSH_INTERVAL_MS
+或累计 COUNTER_FLUSH_MAX_EVENTS 次增量后，每张表用一条
+``UPDATE t SET col = col + CASE id WHEN ? THEN ? ... ELSE 0 END WHERE id IN (...)``
+批量写回，避免热门行上每次访问一次提交造成的行锁争用。
+
+- 写回在独立的工作单元（事务）中执行，不占用请求的事务；失败时增量放回缓冲区等待下次写回
+- 服务停止时（after_server_stop）写回剩余增量；进程异常退出会丢失未写回的增量
+- 多 worker 部署时各进程各自缓冲，写回均为增量累加，结果与逐次更新一致
+- COUNTER_FLUSH_INTERVAL_MS 为 0 时关闭缓冲，每次增量直接执行 UPDATE
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sanic.log import logger
+
+DEFAULT_FLUSH_INTERVAL_MS = 1000
+DEFAULT_FLUSH_MAX_EVENTS = 1000
+# 单条 UPDATE 最多包含的行数
+FLUSH_CHUNK_SIZE = 500
+
+
+class CounterBuffer:
+    """按 (表, 行ID, 列) 合并计数增量，定时批量写回"""
+
+    def __init__(self, flush_interval_ms: float = DEFAULT_FLUSH_INTERVAL_MS,
+                 max_events: int = DEFAULT_FLUSH_MAX_EVENTS):
+        self.flush_interval_ms = float(flush_interval_ms)
+        self.max_events = max(1, int(max_events))
+        self.db = None
+        # {table: {row_id: {column: delta}}}
+        self._deltas: Dict[str, Dict[Any, Dict[str, int]]] = {}
+        # 随计数一起写入的覆盖值（如最后访问时间），同一行取最后一次的值：{table: {row_id: {column: value}}}
+        self._touches: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self._pending_events = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._metrics = {
+            'flushes': 0,
+            'flushed_events': 0,
+            'flushed_rows': 0,
+            'statements': 0,
+            'failures': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+        }
+
+    def configure(self, flush_interval_ms: Optional[float] = None, max_events: Optional[int] = None):
+        if flush_interval_ms is not None:
+            self.flush_interval_ms = max(0.0, float(flush_interval_ms))
+        if max_events is not None:
+            self.max_events = max(1, int(max_events))
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_interval_ms > 0
+
+    def start(self, db):
+        """绑定数据库并启动定时写回任务（before_server_start 中调用）"""
+        self.db = db
+        self._lock = asyncio.Lock()
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止定时任务并写回剩余增量（after_server_stop 中、关闭连接前调用）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        if self.db is not None:
+            await self.flush()
+
+    async def increment(self, db, table: str, row_id: Any, column: str, delta: int = 1,
+                        touch: Optional[Dict[str, Any]] = None):
+        """
+        累加一次计数
+
+        Args:
+            table/column: 由调用方写死的表名与列名（不做转义）
+            touch: 同时写入的覆盖值，如 {'last_access_time': now}
+        """
+        if not self.enabled or self.db is None:
+            assignments = [f"{column} = {column} + ?"] + [f"{name} = ?" for name in (touch or {})]
+            await db.execute(
+                f"UPDATE {table} SET {', '.join(assignments)} WHERE id = ?",
+                [delta] + list((touch or {}).values()) + [row_id]
+            )
+            return
+
+        columns = self._deltas.setdefault(table, {}).setdefault(row_id, {})
+        columns[column] = columns.get(column, 0) + delta
+        if touch:
+            self._touches.setdefault(table, {}).setdefault(row_id, {}).update(touch)
+        self._pending_events += 1
+        if self._pending_events >= self.max_events and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    def pending(self, table: str, row_id: Any, column: str) -> int:
+        """尚未写回的增量，读取时可叠加到查询结果上"""
+        return self._deltas.get(table, {}).get(row_id, {}).get(column, 0)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            try:
+                await self.flush()
+            except Exception as e:
+                # flush 内部已处理写回失败，这里兜底保证定时任务不退出
+                logger.error(f'❌ 计数写回任务异常: {e}')
+
+    async def flush(self) -> int:
+        """写回当前缓冲的全部增量，返回写回的行数"""
+        async with self._lock:
+            if not self._deltas:
+                return 0
+            deltas, self._deltas = self._deltas, {}
+            touches, self._touches = self._touches, {}
+            events, self._pending_events = self._pending_events, 0
+
+            started = time.perf_counter()
+            statements = 0
+            try:
+                uow, token = self.db.begin_unit_of_work()
+                commit = False
+                try:
+                    for table, rows in deltas.items():
+                        items = list(rows.items())
+                        for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+                            sql, params = self._build_update(table, items[start:start + FLUSH_CHUNK_SIZE],
+                                                             touches.get(table, {}))
+                            await self.db.execute(sql, params)
+                            statements += 1
+                    commit = True
+                finally:
+                    await self.db.end_unit_of_work(uow, token, commit)
+            except Exception as e:
+                self._metrics['failures'] += 1
+                self._restore(deltas, touches, events)
+                logger.error(f'❌ 计数写回失败，{events} 次增量将在下次写回时重试: {e}')
+                return 0
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            row_count = sum(len(rows) for rows in deltas.values())
+            metrics = self._metrics
+            metrics['flushes'] += 1
+            metrics['flushed_events'] += events
+            metrics['flushed_rows'] += row_count
+            metrics['statements'] += statements
+            metrics['last_flush_ms'] = round(elapsed_ms, 2)
+            metrics['max_flush_ms'] = max(metrics['max_flush_ms'], round(elapsed_ms, 2))
+            logger.debug(f'✅ 计数写回: events={events}, rows={row_count}, statements={statements}')
+            return row_count
+
+    @staticmethod
+    def _build_update(table: str, items: List[Tuple[Any, Dict[str, int]]],
+                      touches: Dict[Any, Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """一张表一批行的合并 UPDATE：每列一个 CASE 表达式，未涉及该列的行保持原值"""
+        row_ids = [row_id for row_id, _ in items]
+        assignments, params = [], []
+        for column in sorted({column for _, columns in items for column in columns}):
+            cases = [(row_id, columns[column]) for row_id, columns in items if column in columns]
+            assignments.append(f"{column} = {column} + CASE id {' '.join(['WHEN ? THEN ?'] * len(cases))} ELSE 0 END")
+            params.extend(value for case in cases for value in case)
+        touched = [(row_id, touches[row_id]) for row_id in row_ids if row_id in touches]
+        for column in sorted({column for _, values in touched for column in values}):
+            cases = [(row_id, values[column]) for row_id, values in touched if column in values]
+            assignments.append(
+                f"{column} = CASE id {' '.join(['WHEN ? THEN ?'] * len(cases))} ELSE {column} END"
+            )
+            params.extend(value for case in cases for value in case)
+        sql = f"UPDATE {table} SET {', '.join(assignments)} WHERE id IN ({', '.join(['?'] * len(row_ids))})"
+        return sql, params + row_ids
+
+    def _restore(self, deltas, touches, events: int):
+        """写回失败时把增量合并回缓冲区（期间新增的增量保留）"""
+        for table, rows in deltas.items():
+            for row_id, columns in rows.items():
+                current = self._deltas.setdefault(table, {}).setdefault(row_id, {})
+                for column, delta in columns.items():
+                    current[column] = current.get(column, 0) + delta
+        for table, rows in touches.items():
+            for row_id, values in rows.items():
+                # 期间的新值更晚，优先保留
+                current = self._touches.setdefault(table, {}).setdefault(row_id, {})
+                for column, value in values.items():
+                    current.setdefault(column, value)
+        self._pending_events += events
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'flush_interval_ms': self.flush_interval_ms,
+            'max_events': self.max_events,
+            'pending_events': self._pending_events,
+            'pending_rows': sum(len(rows) for rows in self._deltas.values()),
+            **self._metrics,
+        }
+
+
+# 进程内全局实例，由 db_utils 在启动时配置并启动
+counter_buffer = CounterBuffer()
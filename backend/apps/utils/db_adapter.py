@@ -1,22 +1,311 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """数据库适配器
-使用 async SQLAlchemy 统一支持 SQLite 与 MySQL，提供原生 SQL 能力"""
+使用 async SQLAlchemy 统一支持 SQLite 与 MySQL，提供原生 SQL 能力；
+配置的大文本列在 table_* 写入时透明压缩、读取时解压（见 column_codec）"""
 
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
+import re
+import sqlite3
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from urllib.parse import quote_plus
 
 from sanic.log import logger
-from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy import event, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from apps.utils.column_codec import column_codec
+from apps.utils.fulltext import sqlite_fulltext_supported
 
 
 SqlParams = Union[Sequence[Any], Dict[str, Any], None]
 
+DEFAULT_STATEMENT_CACHE_SIZE = 256
+DEFAULT_BULK_CHUNK_SIZE = 500
+DEFAULT_STREAM_BATCH_SIZE = 500
+DEFAULT_SLOW_QUERY_MS = 200
+DEFAULT_MAX_FINGERPRINTS = 500
+
+# 语句耗时直方图分桶上界（毫秒），最后一个桶收纳超出部分
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# 慢查询独立日志（对应 BASE_LOGGING 中的 yprompt.slow_query）
+slow_query_logger = logging.getLogger('yprompt.slow_query')
+
+# 连接池配置项（对应 create_async_engine 的同名参数）
+POOL_OPTION_KEYS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')
+
+
+class CompiledStatement(NamedTuple):
+    """预编译后的SQL语句"""
+    sql: str
+    clause: TextClause
+    param_keys: Tuple[str, ...]
+
+    @property
+    def param_count(self) -> int:
+        return len(self.param_keys)
+
+
+class StatementCache:
+    """以原始SQL为键的有界LRU缓存，保存改写后的SQL与TextClause"""
+
+    def __init__(self, maxsize: int = DEFAULT_STATEMENT_CACHE_SIZE):
+        self.maxsize = max(0, int(maxsize))
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, bool], CompiledStatement]" = OrderedDict()
+
+    def get(self, sql: str, positional: bool) -> CompiledStatement:
+        key = (sql, positional)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = self._compile(sql, positional)
+        if self.maxsize:
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0,
+        }
+
+    @staticmethod
+    def _compile(sql: str, positional: bool) -> CompiledStatement:
+        """将 ? 占位符改写为 :pN 并构建 TextClause"""
+        if not positional:
+            return CompiledStatement(sql, text(sql), ())
+        pieces = sql.split('?')
+        keys = tuple(f"p{idx}" for idx in range(len(pieces) - 1))
+        builder: List[str] = [pieces[0]]
+        for key, piece in zip(keys, pieces[1:]):
+            builder.append(f":{key}")
+            builder.append(piece)
+        rewritten = ''.join(builder)
+        return CompiledStatement(rewritten, text(rewritten), keys)
+
+
+class PoolWaitStats:
+    """连接获取等待时间统计"""
+
+    def __init__(self):
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, elapsed: float):
+        self.acquired += 1
+        self.total_wait += elapsed
+        if elapsed > self.max_wait:
+            self.max_wait = elapsed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'acquired': self.acquired,
+            'avg_wait_ms': round(self.total_wait / self.acquired * 1000, 3) if self.acquired else 0.0,
+            'max_wait_ms': round(self.max_wait * 1000, 3),
+        }
+
+
+_FINGERPRINT_PATTERNS = (
+    # 字符串字面量（含 '' 转义与反斜杠转义）
+    (re.compile(r"'(?:[^'\\]|\\.|'')*'"), '?'),
+    # 数字字面量（不匹配标识符中的数字，如 p0、t1）
+    (re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b'), '?'),
+    # 命名绑定参数统一为 ?
+    (re.compile(r'(?<![:\w]):\w+'), '?'),
+    # IN (...) / VALUES (...) 中任意个数的占位符折叠为一个
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?+)'),
+    (re.compile(r'\(\?\+\)(?:\s*,\s*\(\?\+\))+'), '(?+)+'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint_sql(sql: str) -> str:
+    """语句指纹：去掉字面量与占位符个数差异，同一形状的SQL归为一类"""
+    normalized = sql
+    for pattern, replacement in _FINGERPRINT_PATTERNS:
+        normalized = pattern.sub(replacement, normalized)
+    return normalized.strip()
+
+
+class QueryStats:
+    """按语句指纹统计耗时直方图、返回行数与连接等待时间"""
+
+    def __init__(self, max_fingerprints: int = DEFAULT_MAX_FINGERPRINTS):
+        self.max_fingerprints = max(1, int(max_fingerprints or DEFAULT_MAX_FINGERPRINTS))
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.evictions = 0
+
+    def record(self, fingerprint: str, elapsed_ms: float, wait_ms: float, rows: int, slow: bool = False):
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            entry = {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'wait_ms': 0.0,
+                'slow_count': 0, 'buckets': [0] * (len(LATENCY_BUCKETS_MS) + 1), 'explain': None,
+            }
+            self._entries[fingerprint] = entry
+            if len(self._entries) > self.max_fingerprints:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._entries.move_to_end(fingerprint)
+        entry['count'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['rows'] += rows
+        entry['wait_ms'] += wait_ms
+        if elapsed_ms > entry['max_ms']:
+            entry['max_ms'] = elapsed_ms
+        if slow:
+            entry['slow_count'] += 1
+        index = len(LATENCY_BUCKETS_MS)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        entry['buckets'][index] += 1
+
+    def set_explain(self, fingerprint: str, plan: str):
+        entry = self._entries.get(fingerprint)
+        if entry is not None:
+            entry['explain'] = plan
+
+    def clear(self):
+        self._entries.clear()
+        self.evictions = 0
+
+    @staticmethod
+    def _percentile(buckets: List[int], count: int, ratio: float) -> Optional[float]:
+        """由直方图估算分位数（返回所在桶的上界）"""
+        if not count:
+            return None
+        target = count * ratio
+        seen = 0
+        for i, bucket_count in enumerate(buckets):
+            seen += bucket_count
+            if seen >= target:
+                return float(LATENCY_BUCKETS_MS[i]) if i < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def stats(self, limit: int = 50, order_by: str = 'total_ms') -> Dict[str, Any]:
+        if order_by not in ('total_ms', 'max_ms', 'count', 'rows', 'wait_ms', 'slow_count'):
+            order_by = 'total_ms'
+        ordered = sorted(self._entries.items(), key=lambda item: item[1][order_by], reverse=True)
+        statements = []
+        for fingerprint, entry in ordered[:max(1, limit)]:
+            count = entry['count']
+            statements.append({
+                'fingerprint': fingerprint,
+                'count': count,
+                'total_ms': round(entry['total_ms'], 3),
+                'avg_ms': round(entry['total_ms'] / count, 3) if count else 0.0,
+                'max_ms': round(entry['max_ms'], 3),
+                'p50_ms': self._percentile(entry['buckets'], count, 0.5),
+                'p95_ms': self._percentile(entry['buckets'], count, 0.95),
+                'p99_ms': self._percentile(entry['buckets'], count, 0.99),
+                'rows': entry['rows'],
+                'avg_rows': round(entry['rows'] / count, 2) if count else 0.0,
+                'avg_wait_ms': round(entry['wait_ms'] / count, 3) if count else 0.0,
+                'slow_count': entry['slow_count'],
+                'histogram': dict(zip([f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] + ['>5000ms'], entry['buckets'])),
+                'explain': entry['explain'],
+            })
+        return {
+            'fingerprints': len(self._entries),
+            'max_fingerprints': self.max_fingerprints,
+            'evictions': self.evictions,
+            'statements': statements,
+        }
+
+
+class UnitOfWorkRollback(Exception):
+    """用于触发工作单元回滚的内部异常"""
+
+
+class UnitOfWork:
+    """请求级工作单元
+
+    同一请求内的所有SQL共用一个连接和一个事务，首次使用时才打开连接，
+    由 finish() 在响应阶段统一提交或回滚。
+    """
+
+    def __init__(self, adapter: 'SQLAlchemyAdapter'):
+        self.adapter = adapter
+        self.conn: Optional[AsyncConnection] = None
+        self._context = None
+        # 工作单元结束（提交或回滚）后执行的回调，如缓存失效
+        self.on_finish: List[Callable[[], Any]] = []
+
+    @property
+    def is_open(self) -> bool:
+        return self.conn is not None
+
+    @asynccontextmanager
+    async def connection(self):
+        if self.conn is None:
+            self._context = self.adapter._open_write()
+            self.conn = await self._context.__aenter__()
+        yield self.conn
+
+    async def finish(self, commit: bool = True):
+        """结束工作单元：提交或回滚并归还连接"""
+        context, self._context, self.conn = self._context, None, None
+        callbacks, self.on_finish = self.on_finish, []
+        try:
+            if context is not None:
+                if commit:
+                    await context.__aexit__(None, None, None)
+                else:
+                    exc = UnitOfWorkRollback()
+                    await context.__aexit__(type(exc), exc, None)
+        finally:
+            for callback in callbacks:
+                callback()
+
+
+_unit_of_work_var: ContextVar[Optional[UnitOfWork]] = ContextVar('unit_of_work', default=None)
+
+# 读写一致性键（通常为当前用户ID），用于写后读粘滞到主库
+_consistency_key_var: ContextVar[Optional[Any]] = ContextVar('read_consistency_key', default=None)
+
+# 强制读主库（初始化、一致性要求高的读）
+_force_primary_var: ContextVar[bool] = ContextVar('force_primary', default=False)
+
+DEFAULT_REPLICA_STICKY_SECONDS = 5.0
+
+
+def set_read_consistency_key(key: Any):
+    """绑定当前请求的读写一致性键，该键写入后的一段时间内读操作走主库"""
+    _consistency_key_var.set(key)
+
 
 class DatabaseAdapter(ABC):
     """数据库适配器基类"""
@@ -37,6 +326,19 @@ class DatabaseAdapter(ABC):
     async def query(self, sql: str, params: SqlParams = None) -> List[Dict[str, Any]]:
         """查询多条记录"""
 
+    @abstractmethod
+    def stream(self, sql: str, params: SqlParams = None,
+               batch_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """流式查询，逐行产出记录，内存占用与 batch_size 成正比
+
+        中途 break 时请配合 contextlib.aclosing 使用，确保连接立即归还
+        """
+
+    @abstractmethod
+    def stream_batches(self, sql: str, params: SqlParams = None,
+                       batch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """流式查询，按批产出记录列表"""
+
     @abstractmethod
     async def execute(self, sql: str, params: SqlParams = None) -> int:
         """执行SQL，返回影响行数"""
@@ -45,6 +347,22 @@ class DatabaseAdapter(ABC):
     async def table_insert(self, table: str, data: Dict[str, Any]) -> int:
         """插入数据并返回自增ID"""
 
+    @abstractmethod
+    async def execute_many(self, sql: str, param_rows: Sequence[SqlParams],
+                           chunk_size: Optional[int] = None) -> int:
+        """批量执行同一条SQL（executemany），每批一次提交，返回影响行数"""
+
+    @abstractmethod
+    async def table_insert_many(self, table: str, rows: Sequence[Dict[str, Any]],
+                                chunk_size: Optional[int] = None) -> int:
+        """多行插入（multi-VALUES），每批一次提交，返回插入行数"""
+
+    @abstractmethod
+    async def table_upsert_many(self, table: str, rows: Sequence[Dict[str, Any]],
+                                conflict_columns: Sequence[str], update_sql: str,
+                                chunk_size: Optional[int] = None) -> int:
+        """多行插入，命中唯一键（conflict_columns）时改为执行 update_sql，如 use_count = use_count + 1"""
+
     @abstractmethod
     async def table_update(self, table: str, data: Dict[str, Any], where: str):
         """更新数据"""
@@ -57,122 +375,584 @@ class DatabaseAdapter(ABC):
 class SQLAlchemyAdapter(DatabaseAdapter):
     """基于 SQLAlchemy AsyncEngine 的通用适配器"""
 
-    def __init__(self, db_url: str, *, connect_args: Optional[Dict[str, Any]] = None):
+    # 单条语句允许的最大绑定参数个数
+    MAX_BIND_PARAMS = 65535
+    # 工作单元是否在首次读操作时就打开连接（否则等到首次写操作）
+    UOW_OPEN_ON_READ = True
+    # 慢查询执行计划前缀
+    EXPLAIN_PREFIX = 'EXPLAIN'
+
+    def __init__(self, db_url: str, *, connect_args: Optional[Dict[str, Any]] = None,
+                 statement_cache_size: int = DEFAULT_STATEMENT_CACHE_SIZE,
+                 pool_options: Optional[Dict[str, Any]] = None,
+                 bulk_chunk_size: int = DEFAULT_BULK_CHUNK_SIZE,
+                 stream_batch_size: int = DEFAULT_STREAM_BATCH_SIZE,
+                 replica_urls: Optional[Sequence[str]] = None,
+                 replica_sticky_seconds: float = DEFAULT_REPLICA_STICKY_SECONDS,
+                 query_stats_enabled: bool = True,
+                 slow_query_ms: float = DEFAULT_SLOW_QUERY_MS,
+                 max_fingerprints: int = DEFAULT_MAX_FINGERPRINTS):
         self.db_url = db_url
+        self.bulk_chunk_size = max(1, int(bulk_chunk_size or DEFAULT_BULK_CHUNK_SIZE))
+        self.stream_batch_size = max(1, int(stream_batch_size or DEFAULT_STREAM_BATCH_SIZE))
+        self.statement_cache = StatementCache(statement_cache_size)
+        self.pool_wait = PoolWaitStats()
+        # 语句级耗时统计与慢查询日志（slow_query_ms <= 0 时不记录慢查询）
+        self.query_stats_enabled = bool(query_stats_enabled)
+        self.slow_query_ms = float(slow_query_ms or 0)
+        self.query_stats = QueryStats(max_fingerprints)
+        self._explained: set = set()
+        self._explain_tasks: set = set()
+        engine_options: Dict[str, Any] = {'pool_pre_ping': True}
+        engine_options.update(self._build_pool_options(pool_options))
         self.engine: AsyncEngine = create_async_engine(
             db_url,
             echo=False,
-            pool_pre_ping=True,
             future=True,
             connect_args=connect_args or {},
+            **engine_options,
         )
 
+        # 只读副本：get/query 轮询分发，写操作始终走主库
+        self.replica_engines: List[AsyncEngine] = [
+            create_async_engine(url, echo=False, future=True, **engine_options)
+            for url in (replica_urls or []) if url
+        ]
+        self.replica_sticky_seconds = float(replica_sticky_seconds or 0)
+        self._replica_cursor = 0
+        self._sticky_until: Dict[Any, float] = {}
+
+    def _build_pool_options(self, pool_options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """过滤出有效的连接池参数"""
+        return {
+            key: value for key, value in (pool_options or {}).items()
+            if key in POOL_OPTION_KEYS and value is not None
+        }
+
+    @asynccontextmanager
+    async def _connect(self, engine: Optional[AsyncEngine] = None):
+        """获取连接并记录等待时间"""
+        started = time.perf_counter()
+        async with (engine or self.engine).connect() as conn:
+            self.pool_wait.record(time.perf_counter() - started)
+            yield conn
+
+    def _primary_read_engine(self) -> AsyncEngine:
+        """主库上用于读操作的引擎"""
+        return self.engine
+
+    def _select_read_engine(self) -> AsyncEngine:
+        """选择读引擎：有副本且未处于写后粘滞窗口时轮询副本"""
+        if not self.replica_engines or _force_primary_var.get() or self._is_sticky():
+            return self._primary_read_engine()
+        engine = self.replica_engines[self._replica_cursor % len(self.replica_engines)]
+        self._replica_cursor = (self._replica_cursor + 1) % len(self.replica_engines)
+        return engine
+
+    def _is_sticky(self) -> bool:
+        key = _consistency_key_var.get()
+        if key is None:
+            return False
+        until = self._sticky_until.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._sticky_until.pop(key, None)
+            return False
+        return True
+
+    @asynccontextmanager
+    async def use_primary(self):
+        """上下文内的读操作全部走主库"""
+        token = _force_primary_var.set(True)
+        try:
+            yield self
+        finally:
+            _force_primary_var.reset(token)
+
+    def _mark_write(self):
+        """记录写操作，开启当前一致性键的粘滞窗口"""
+        if not self.replica_engines or self.replica_sticky_seconds <= 0:
+            return
+        key = _consistency_key_var.get()
+        if key is None:
+            return
+        now = time.monotonic()
+        if len(self._sticky_until) > 10000:
+            self._sticky_until = {k: v for k, v in self._sticky_until.items() if v > now}
+        self._sticky_until[key] = now + self.replica_sticky_seconds
+
+    def _open_read(self):
+        """只读查询使用的连接"""
+        return self._connect(self._select_read_engine())
+
+    @asynccontextmanager
+    async def _open_write(self):
+        """获取连接并开启事务，退出时提交，异常时回滚"""
+        async with self._connect() as conn:
+            async with conn.begin():
+                yield conn
+
+    def _current_unit_of_work(self) -> Optional[UnitOfWork]:
+        uow = _unit_of_work_var.get()
+        return uow if uow is not None and uow.adapter is self else None
+
+    def _read_connect(self):
+        uow = self._current_unit_of_work()
+        # 配置了只读副本时，工作单元在首次写之前的读操作仍交给副本
+        open_on_read = self.UOW_OPEN_ON_READ and not self.replica_engines
+        if uow is not None and (uow.is_open or open_on_read):
+            return uow.connection()
+        return self._open_read()
+
+    def _begin(self):
+        self._mark_write()
+        uow = self._current_unit_of_work()
+        if uow is not None:
+            return uow.connection()
+        return self._open_write()
+
+    def after_unit_of_work(self, callback: Callable[[], Any]):
+        """当前工作单元结束后执行回调；不在工作单元内（语句已自动提交）时立即执行"""
+        uow = self._current_unit_of_work()
+        if uow is not None:
+            uow.on_finish.append(callback)
+        else:
+            callback()
+
+    def begin_unit_of_work(self) -> Tuple[UnitOfWork, Any]:
+        """在当前上下文开启工作单元，返回 (工作单元, 重置令牌)"""
+        uow = UnitOfWork(self)
+        return uow, _unit_of_work_var.set(uow)
+
+    @staticmethod
+    async def end_unit_of_work(uow: UnitOfWork, token: Any, commit: bool = True):
+        """结束工作单元并恢复上下文"""
+        try:
+            await uow.finish(commit)
+        finally:
+            try:
+                _unit_of_work_var.reset(token)
+            except ValueError:
+                # 令牌来自其他上下文时直接清空
+                _unit_of_work_var.set(None)
+
     async def connect(self):
-        async with self.engine.connect() as conn:
+        async with self._connect() as conn:
             await conn.execute(text('SELECT 1'))
+        for engine in self.replica_engines:
+            async with self._connect(engine) as conn:
+                await conn.execute(text('SELECT 1'))
+        if self.replica_engines:
+            logger.info(f"📚 已启用 {len(self.replica_engines)} 个只读副本")
 
     async def close(self):
+        for task in list(self._explain_tasks):
+            task.cancel()
+        for engine in self.replica_engines:
+            await engine.dispose()
         await self.engine.dispose()
 
     async def get(self, sql: str, params: SqlParams = None) -> Optional[Dict[str, Any]]:
-        sql_text, bind_params = self._prepare_sql(sql, params)
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text(sql_text), bind_params)
+        statement, bind_params = self._prepare_sql(sql, params)
+        started = time.perf_counter()
+        async with self._read_connect() as conn:
+            acquired = time.perf_counter()
+            result = await conn.execute(statement, bind_params)
             row = result.mappings().first()
-            return dict(row) if row else None
+        self._observe(sql, params, started, acquired, 1 if row else 0)
+        if not row:
+            return None
+        return (await column_codec.decode_rows([dict(row)]))[0]
 
     async def query(self, sql: str, params: SqlParams = None) -> List[Dict[str, Any]]:
-        sql_text, bind_params = self._prepare_sql(sql, params)
-        async with self.engine.connect() as conn:
-            result = await conn.execute(text(sql_text), bind_params)
-            return [dict(row) for row in result.mappings().all()]
+        statement, bind_params = self._prepare_sql(sql, params)
+        started = time.perf_counter()
+        async with self._read_connect() as conn:
+            acquired = time.perf_counter()
+            result = await conn.execute(statement, bind_params)
+            rows = [dict(row) for row in result.mappings().all()]
+        self._observe(sql, params, started, acquired, len(rows))
+        return await column_codec.decode_rows(rows)
+
+    async def stream(self, sql: str, params: SqlParams = None,
+                     batch_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        # 提前退出时显式关闭内层生成器，及时归还连接
+        batches = self.stream_batches(sql, params, batch_size)
+        try:
+            async for batch in batches:
+                for row in batch:
+                    yield row
+        finally:
+            await batches.aclose()
+
+    async def stream_batches(self, sql: str, params: SqlParams = None,
+                             batch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        # 服务端游标会独占连接，因此不复用工作单元的连接
+        statement, bind_params = self._prepare_sql(sql, params)
+        batch_size = max(1, int(batch_size or self.stream_batch_size))
+        started = time.perf_counter()
+        async with self._open_read() as conn:
+            acquired = time.perf_counter()
+            result = await conn.stream(
+                statement.execution_options(max_row_buffer=batch_size, yield_per=batch_size),
+                bind_params,
+            )
+            # 流式查询只统计到首批结果就绪为止，不含调用方的处理时间
+            opened = time.perf_counter()
+            rows = 0
+            try:
+                async for partition in result.mappings().partitions(batch_size):
+                    rows += len(partition)
+                    yield await column_codec.decode_rows([dict(row) for row in partition])
+            finally:
+                await result.close()
+                self._observe(sql, params, started, acquired, rows, finished=opened)
 
     async def execute(self, sql: str, params: SqlParams = None) -> int:
-        sql_text, bind_params = self._prepare_sql(sql, params)
-        async with self.engine.begin() as conn:
-            result = await conn.execute(text(sql_text), bind_params)
-            return result.rowcount if result.rowcount is not None else 0
+        statement, bind_params = self._prepare_sql(sql, params)
+        started = time.perf_counter()
+        async with self._begin() as conn:
+            acquired = time.perf_counter()
+            result = await conn.execute(statement, bind_params)
+            affected = result.rowcount if result.rowcount is not None else 0
+        self._observe(sql, params, started, acquired, affected)
+        return affected
 
     async def table_insert(self, table: str, data: Dict[str, Any]) -> int:
         if not data:
             raise ValueError('table_insert 需要有效的数据字典')
+        data = await column_codec.encode_row(table, data)
         columns = ', '.join(data.keys())
         placeholders = ', '.join(['?'] * len(data))
         sql = f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"
-        sql_text, bind_params = self._prepare_sql(sql, list(data.values()))
-        async with self.engine.begin() as conn:
-            result = await conn.execute(text(sql_text), bind_params)
+        statement, bind_params = self._prepare_sql(sql, list(data.values()))
+        started = time.perf_counter()
+        async with self._begin() as conn:
+            acquired = time.perf_counter()
+            result = await conn.execute(statement, bind_params)
             last_id = result.lastrowid
-            return int(last_id) if last_id is not None else 0
+        self._observe(sql, None, started, acquired, 1)
+        return int(last_id) if last_id is not None else 0
+
+    async def execute_many(self, sql: str, param_rows: Sequence[SqlParams],
+                           chunk_size: Optional[int] = None) -> int:
+        rows = list(param_rows or [])
+        if not rows:
+            return 0
+        chunk_size = max(1, int(chunk_size or self.bulk_chunk_size))
+        affected = 0
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            bind_rows = []
+            statement = None
+            for params in chunk:
+                statement, bind_params = self._prepare_sql(sql, params)
+                bind_rows.append(bind_params)
+            started = time.perf_counter()
+            async with self._begin() as conn:
+                acquired = time.perf_counter()
+                result = await conn.execute(statement, bind_rows)
+                chunk_affected = result.rowcount if result.rowcount is not None and result.rowcount > 0 else 0
+            affected += chunk_affected
+            self._observe(sql, None, started, acquired, chunk_affected)
+        return affected
+
+    async def table_insert_many(self, table: str, rows: Sequence[Dict[str, Any]],
+                                chunk_size: Optional[int] = None) -> int:
+        return await self._insert_rows(table, rows, chunk_size)
+
+    async def table_upsert_many(self, table: str, rows: Sequence[Dict[str, Any]],
+                                conflict_columns: Sequence[str], update_sql: str,
+                                chunk_size: Optional[int] = None) -> int:
+        return await self._insert_rows(table, rows, chunk_size, self._upsert_clause(conflict_columns, update_sql))
+
+    def _upsert_clause(self, conflict_columns: Sequence[str], update_sql: str) -> str:
+        return f" ON DUPLICATE KEY UPDATE {update_sql}"
+
+    def upsert_value(self, column: str) -> str:
+        """在 table_upsert_many 的 update_sql 中引用待插入行的列值"""
+        return f"VALUES({column})"
+
+    async def _insert_rows(self, table: str, rows: Sequence[Dict[str, Any]],
+                           chunk_size: Optional[int] = None, suffix: str = '') -> int:
+        rows = list(rows or [])
+        if not rows:
+            return 0
+        rows = await column_codec.encode_rows(table, rows)
+        columns = list(rows[0].keys())
+        if not columns:
+            raise ValueError('table_insert_many 需要有效的数据字典')
+        chunk_size = max(1, int(chunk_size or self.bulk_chunk_size))
+        # 受单条语句绑定参数上限约束
+        chunk_size = max(1, min(chunk_size, self.MAX_BIND_PARAMS // len(columns)))
+        column_sql = ', '.join(columns)
+        row_placeholder = '(' + ', '.join(['?'] * len(columns)) + ')'
+        inserted = 0
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            sql = f"INSERT INTO {table} ({column_sql}) VALUES " + ', '.join([row_placeholder] * len(chunk)) + suffix
+            values: List[Any] = []
+            for row in chunk:
+                if set(row.keys()) != set(columns):
+                    raise ValueError('table_insert_many 要求所有行的字段一致')
+                values.extend(row[column] for column in columns)
+            statement, bind_params = self._prepare_sql(sql, values)
+            started = time.perf_counter()
+            async with self._begin() as conn:
+                acquired = time.perf_counter()
+                await conn.execute(statement, bind_params)
+            self._observe(sql, None, started, acquired, len(chunk))
+            inserted += len(chunk)
+        return inserted
 
     async def table_update(self, table: str, data: Dict[str, Any], where: str):
         if not data:
             return
+        data = await column_codec.encode_row(table, data)
         set_clause = ', '.join([f"{column} = ?" for column in data.keys()])
         sql = f"UPDATE {table} SET {set_clause} WHERE {where}"
         params = list(data.values())
         await self.execute(sql, params)
 
     def transaction(self):
-        return self.engine.begin()
+        return self._begin()
+
+    def _observe(self, sql: str, params: SqlParams, started: float, acquired: float,
+                 rows: int, finished: Optional[float] = None):
+        """记录单条语句的耗时、等待时间与行数，超过阈值写入慢查询日志"""
+        if not self.query_stats_enabled:
+            return
+        finished = finished if finished is not None else time.perf_counter()
+        elapsed_ms = (finished - acquired) * 1000
+        wait_ms = (acquired - started) * 1000
+        fingerprint = fingerprint_sql(sql)
+        slow = 0 < self.slow_query_ms <= elapsed_ms
+        self.query_stats.record(fingerprint, elapsed_ms, wait_ms, rows, slow)
+        if not slow:
+            return
+        slow_query_logger.warning(
+            f"🐢 慢查询 {elapsed_ms:.1f}ms (等待连接 {wait_ms:.1f}ms, 行数 {rows}): {fingerprint}"
+        )
+        if fingerprint not in self._explained:
+            self._explained.add(fingerprint)
+            task = asyncio.get_running_loop().create_task(self._capture_explain(fingerprint, sql, params))
+            self._explain_tasks.add(task)
+            task.add_done_callback(self._explain_tasks.discard)
+
+    async def _capture_explain(self, fingerprint: str, sql: str, params: SqlParams):
+        """每个指纹只抓取一次执行计划，在独立连接上执行，失败不影响业务"""
+        if not re.match(r'\s*(SELECT|WITH|UPDATE|DELETE)\b', sql, re.IGNORECASE):
+            return
+        try:
+            statement, bind_params = self._prepare_sql(sql, params)
+            async with self._connect(self._primary_read_engine()) as conn:
+                result = await conn.execute(text(f"{self.EXPLAIN_PREFIX} {statement.text}"), bind_params)
+                plan_rows = [dict(row) for row in result.mappings().all()]
+        except Exception as e:
+            slow_query_logger.warning(f"⚠️ 获取执行计划失败: {fingerprint}: {e}")
+            return
+        plan = '\n'.join(
+            ' | '.join(f"{key}={value}" for key, value in row.items() if value is not None)
+            for row in plan_rows
+        )
+        self.query_stats.set_explain(fingerprint, plan)
+        slow_query_logger.warning(f"📋 执行计划: {fingerprint}\n{plan}")
+
+    def get_query_stats(self, limit: int = 50, order_by: str = 'total_ms') -> Dict[str, Any]:
+        """按语句指纹汇总的耗时统计"""
+        stats = self.query_stats.stats(limit, order_by)
+        stats['enabled'] = self.query_stats_enabled
+        stats['slow_query_ms'] = self.slow_query_ms
+        return stats
+
+    def reset_query_stats(self):
+        self.query_stats.clear()
+        self._explained.clear()
+
+    def get_statement_cache_stats(self) -> Dict[str, Any]:
+        """语句缓存命中统计"""
+        return self.statement_cache.stats()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """连接池状态：已签出/空闲/溢出连接数与获取等待时间"""
+        stats: Dict[str, Any] = {'pool_class': type(self.engine.pool).__name__}
+        stats.update(self._describe_pool(self.engine))
+        stats.update(self.pool_wait.stats())
+        if self.replica_engines:
+            stats['replicas'] = [self._describe_pool(engine) for engine in self.replica_engines]
+        return stats
 
     @staticmethod
-    def _prepare_sql(sql: str, params: SqlParams) -> Tuple[str, Dict[str, Any]]:
+    def _describe_pool(engine: AsyncEngine) -> Dict[str, Any]:
+        pool = engine.pool
+        described: Dict[str, Any] = {}
+        for key in ('size', 'checkedin', 'checkedout', 'overflow'):
+            method = getattr(pool, key, None)
+            described[key] = method() if callable(method) else None
+        return described
+
+    def _prepare_sql(self, sql: str, params: SqlParams) -> Tuple[TextClause, Dict[str, Any]]:
         if params is None:
-            return sql, {}
+            return self.statement_cache.get(sql, False).clause, {}
         if isinstance(params, dict):
-            return sql, params
+            return self.statement_cache.get(sql, False).clause, params
         values = list(params)
         if not values:
-            return sql, {}
-        builder: List[str] = []
-        bind: Dict[str, Any] = {}
-        idx = 0
-        for ch in sql:
-            if ch == '?':
-                key = f"p{idx}"
-                if idx >= len(values):
-                    raise ValueError('SQL参数个数不足')
-                builder.append(f":{key}")
-                bind[key] = values[idx]
-                idx += 1
-            else:
-                builder.append(ch)
-        if idx != len(values):
+            return self.statement_cache.get(sql, False).clause, {}
+        compiled = self.statement_cache.get(sql, True)
+        if compiled.param_count > len(values):
+            raise ValueError('SQL参数个数不足')
+        if compiled.param_count != len(values):
             raise ValueError('SQL参数个数过多')
-        return ''.join(builder), bind
+        return compiled.clause, dict(zip(compiled.param_keys, values))
 
 
 class SQLiteAdapter(SQLAlchemyAdapter):
-    def __init__(self, db_path: str):
+    """SQLite 适配器
+
+    生产模式下启用 WAL 及相关 PRAGMA，写操作经单连接写引擎串行执行，
+    读操作分散到独立的只读连接池，避免并发写入导致 "database is locked"。
+    """
+
+    MAX_BIND_PARAMS = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+    # 读事务会阻塞其他连接提交，工作单元等到首次写操作才占用连接
+    UOW_OPEN_ON_READ = False
+    EXPLAIN_PREFIX = 'EXPLAIN QUERY PLAN'
+
+    def __init__(self, db_path: str, *, sqlite_options: Optional[Dict[str, Any]] = None, **kwargs):
         self.db_path = os.path.abspath(db_path)
         db_dir = os.path.dirname(self.db_path)
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir, exist_ok=True)
-        super().__init__(f"sqlite+aiosqlite:///{self.db_path}")
+
+        sqlite_options = sqlite_options or {}
+        self.production_mode = bool(sqlite_options.get('production_mode'))
+        pool_options = dict(kwargs.pop('pool_options', None) or {})
+        if self.production_mode:
+            # 写引擎固定单连接，配合写锁实现单写者
+            pool_options.update({'pool_size': 1, 'max_overflow': 0})
+
+        db_url = f"sqlite+aiosqlite:///{self.db_path}"
+        super().__init__(db_url, pool_options=pool_options, **kwargs)
+
+        self.reader_engine: Optional[AsyncEngine] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self.write_wait = PoolWaitStats()
+        if self.production_mode:
+            self.pragmas = self._build_pragmas(sqlite_options)
+            self.reader_engine = create_async_engine(
+                db_url,
+                echo=False,
+                future=True,
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=max(1, int(sqlite_options.get('reader_pool_size') or 4)),
+                max_overflow=0,
+                pool_timeout=pool_options.get('pool_timeout') or 30,
+                pool_pre_ping=bool(pool_options.get('pool_pre_ping', True)),
+            )
+            self._write_lock = asyncio.Lock()
+            for engine in (self.engine, self.reader_engine):
+                self._install_pragmas(engine)
+            logger.info(f"🚀 SQLite生产模式已启用: {'; '.join(self.pragmas)}")
+
+    def _build_pool_options(self, pool_options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        # aiosqlite 文件库默认使用 NullPool，配置了 pool_size 时改用队列连接池复用连接
+        options = super()._build_pool_options(pool_options)
+        if options.get('pool_size'):
+            options['poolclass'] = AsyncAdaptedQueuePool
+            return options
+        return {key: value for key, value in options.items() if key == 'pool_pre_ping'}
+
+    @staticmethod
+    def _build_pragmas(sqlite_options: Dict[str, Any]) -> List[str]:
+        pragmas = ['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL']
+        for key in ('busy_timeout', 'mmap_size', 'cache_size'):
+            value = sqlite_options.get(key)
+            if value is not None:
+                pragmas.append(f"PRAGMA {key}={int(value)}")
+        return pragmas
+
+    def _install_pragmas(self, engine: AsyncEngine):
+        """在每个新建连接上执行 PRAGMA"""
+        pragmas = self.pragmas
+
+        @event.listens_for(engine.sync_engine, 'connect')
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
+    def _primary_read_engine(self) -> AsyncEngine:
+        return self.reader_engine or self.engine
+
+    def _upsert_clause(self, conflict_columns: Sequence[str], update_sql: str) -> str:
+        return f" ON CONFLICT({', '.join(conflict_columns)}) DO UPDATE SET {update_sql}"
+
+    def upsert_value(self, column: str) -> str:
+        return f"excluded.{column}"
+
+    @asynccontextmanager
+    async def _open_write(self):
+        if self._write_lock is None:
+            async with super()._open_write() as conn:
+                yield conn
+            return
+        started = time.perf_counter()
+        async with self._write_lock:
+            self.write_wait.record(time.perf_counter() - started)
+            async with super()._open_write() as conn:
+                yield conn
+
+    async def close(self):
+        if self.reader_engine is not None:
+            await self.reader_engine.dispose()
+        await super().close()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        stats = super().get_pool_stats()
+        if self.reader_engine is not None:
+            stats['readers'] = self._describe_pool(self.reader_engine)
+            stats['write_lock'] = self.write_wait.stats()
+        return stats
 
 
 class MySQLAdapter(SQLAlchemyAdapter):
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], **kwargs):
         self.db_name = config.get('database')
         user = quote_plus(config.get('user', ''))
         password = quote_plus(config.get('password', '') or '')
         host = config.get('host', 'localhost')
         port = config.get('port', 3306)
         db_url = f"mysql+aiomysql://{user}:{password}@{host}:{port}/{self.db_name}"
-        super().__init__(db_url)
+        super().__init__(db_url, **kwargs)
 
 
 async def create_database_adapter(db_type: str, config: Dict[str, Any], app_config: Dict[str, Any] = None) -> DatabaseAdapter:
+    adapter_options = {
+        'statement_cache_size': config.get('statement_cache_size', DEFAULT_STATEMENT_CACHE_SIZE),
+        'pool_options': {key: config.get(key) for key in POOL_OPTION_KEYS},
+        'bulk_chunk_size': config.get('bulk_chunk_size', DEFAULT_BULK_CHUNK_SIZE),
+        'stream_batch_size': config.get('stream_batch_size', DEFAULT_STREAM_BATCH_SIZE),
+        'query_stats_enabled': config.get('query_stats_enabled', True),
+        'slow_query_ms': config.get('slow_query_ms', DEFAULT_SLOW_QUERY_MS),
+        'replica_urls': config.get('replica_urls') or [],
+        'replica_sticky_seconds': config.get('replica_sticky_seconds', DEFAULT_REPLICA_STICKY_SECONDS),
+    }
     if db_type == 'sqlite':
-        adapter = SQLiteAdapter(config['path'])
+        adapter = SQLiteAdapter(config['path'], sqlite_options=config.get('sqlite_options'), **adapter_options)
         await adapter.connect()
-        await _initialize_sqlite_if_needed(adapter, app_config)
+        async with adapter.use_primary():
+            await _initialize_sqlite_if_needed(adapter, app_config)
         return adapter
     if db_type == 'mysql':
-        adapter = MySQLAdapter(config)
+        adapter = MySQLAdapter(config, **adapter_options)
         await adapter.connect()
-        await _initialize_mysql_if_needed(adapter, config, app_config)
+        async with adapter.use_primary():
+            await _initialize_mysql_if_needed(adapter, config, app_config)
         return adapter
     raise ValueError(f"不支持的数据库类型: {db_type}")
 
@@ -197,6 +977,7 @@ async def _initialize_sqlite_if_needed(adapter: SQLiteAdapter, config: Dict[str,
                     with open(script_path, 'r', encoding='utf-8') as f:
                         await db.executescript(f.read())
                         await db.commit()
+                    await _create_sqlite_fulltext(db)
                 logger.info('✅ SQLite表结构初始化完成')
                 await _create_default_admin(adapter, config)
             else:
@@ -209,6 +990,24 @@ async def _initialize_sqlite_if_needed(adapter: SQLiteAdapter, config: Dict[str,
         raise
 
 
+async def _create_sqlite_fulltext(db):
+    """新库建立全文索引；SQLite 版本过旧或未编译 FTS5 时跳过，关键词搜索退回 LIKE，不影响启动"""
+    if not sqlite_fulltext_supported():
+        logger.warning(f'⚠️  SQLite {sqlite3.sqlite_version} 不支持 FTS5 trigram 分词（需 3.34+ 且编译 FTS5），跳过全文索引')
+        return
+
+    script_path = os.path.join(
+        os.path.dirname(__file__),
+        '../../migrations/add_fulltext_search_sqlite.sql'
+    )
+    try:
+        with open(script_path, 'r', encoding='utf-8') as f:
+            await db.executescript(f.read())
+        await db.commit()
+    except Exception as exc:
+        logger.warning(f'⚠️  创建全文索引失败，关键词搜索使用 LIKE: {exc}')
+
+
 async def _initialize_mysql_if_needed(adapter: MySQLAdapter, db_config: Dict[str, Any] = None, app_config: Dict[str, Any] = None):
     try:
         db_name = (db_config or {}).get('database') or (app_config or {}).get('DB_NAME')
@@ -250,12 +1049,14 @@ async def _execute_mysql_init_script(adapter: DatabaseAdapter):
 
     statements = _split_sql_statements(sql_script)
 
-    for statement in statements:
-        try:
-            await adapter.execute(statement)
-        except Exception as exc:
-            logger.error(f'❌ 执行MySQL初始化语句失败: {exc} | SQL: {statement}')
-            raise
+    # 复用同一连接执行全部初始化语句
+    async with adapter.transaction() as conn:
+        for statement in statements:
+            try:
+                await conn.execute(text(statement))
+            except Exception as exc:
+                logger.error(f'❌ 执行MySQL初始化语句失败: {exc} | SQL: {statement}')
+                raise
 
     logger.info('✅ MySQL表结构初始化完成')
 
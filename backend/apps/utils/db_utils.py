@@ -1,5 +1,90 @@
+from functools import wraps
+from inspect import isawaitable
+
 from sanic.log import logger
+from sanic.response import json
+from apps.utils.column_codec import column_codec
 from apps.utils.db_adapter import create_database_adapter
+from apps.utils.content_hash import configure_content_hashing
+from apps.utils.fulltext import detect_fulltext
+from apps.utils.counter_buffer import counter_buffer
+from apps.utils.library_cache import configure_library_cache
+from apps.utils.pagination import configure_counting
+from apps.utils.text_diff import configure_text_diff
+from apps.utils.text_blobs import configure_text_blobs
+from apps.utils.version_storage import configure_version_storage
+
+
+def error_response(request, code: int, message: str):
+    """
+    返回业务失败响应（HTTP 200，错误码放在响应体的 code 字段中）
+
+    同时标记请求级工作单元在处理函数返回后回滚；启用工作单元的蓝图返回失败时都应使用本函数
+    """
+    request.ctx.rollback_unit_of_work = True
+    return json({
+        'code': code,
+        'message': message
+    })
+
+
+def _should_commit(request, response) -> bool:
+    """处理函数正常返回时是否提交：HTTP状态码表示失败或处理函数标记了回滚时回滚"""
+    if response is None or response.status >= 400:
+        return False
+    return not getattr(request.ctx, 'rollback_unit_of_work', False)
+
+
+def _with_unit_of_work(handler):
+    """包装路由处理函数：处理函数内的数据库操作运行在工作单元中，任何退出路径都会结束工作单元"""
+    if getattr(handler, '__unit_of_work__', False):
+        return handler
+
+    @wraps(handler)
+    async def handler_with_unit_of_work(request, *args, **kwargs):
+        db = request.app.ctx.db
+        uow, token = db.begin_unit_of_work()
+        try:
+            response = handler(request, *args, **kwargs)
+            if isawaitable(response):
+                response = await response
+        except BaseException:
+            # 包括客户端断开时 Sanic 取消处理任务抛出的 CancelledError：回滚并归还连接（及 SQLite 写锁）
+            try:
+                await db.end_unit_of_work(uow, token, commit=False)
+            except Exception as e:
+                logger.error(f'❌ 回滚请求事务失败: {e}')
+            raise
+
+        try:
+            await db.end_unit_of_work(uow, token, commit=_should_commit(request, response))
+        except Exception as e:
+            logger.error(f'❌ 提交请求事务失败: {e}')
+            return json({
+                'code': 500,
+                'message': f'数据库事务提交失败: {str(e)}'
+            })
+        return response
+
+    handler_with_unit_of_work.__unit_of_work__ = True
+    return handler_with_unit_of_work
+
+
+def register_unit_of_work(blueprint):
+    """
+    为蓝图注册请求级工作单元
+
+    请求内的所有数据库操作共用一个连接和事务（首次使用时才打开），处理函数正常返回时提交；
+    HTTP状态码表示失败、处理函数通过 error_response 返回业务失败、抛出异常或被取消时回滚
+
+    工作单元由包装后的路由处理函数开启和结束，而不是响应中间件：客户端断开时 Sanic 会取消
+    处理任务，响应中间件不再执行，事务和连接会一直挂起。启动时统一包装蓝图已注册的路由，
+    因此在调用本函数之后声明的路由同样生效。
+    """
+    @blueprint.listener('before_server_start')
+    async def wrap_route_handlers(app, loop):
+        for route in blueprint.routes:
+            route.handler = _with_unit_of_work(route.handler)
 
 
 class DB:
@@ -19,13 +104,28 @@ class DB:
             根据配置自动选择SQLite或MySQL
             """
             db_type = app.config.get('DB_TYPE', 'sqlite')
+            pool_config = {
+                'pool_size': app.config.get('DB_POOL_SIZE', 5),
+                'max_overflow': app.config.get('DB_MAX_OVERFLOW', 10),
+                'pool_timeout': app.config.get('DB_POOL_TIMEOUT', 30),
+                'pool_recycle': app.config.get('DB_POOL_RECYCLE', 3600),
+                'pool_pre_ping': app.config.get('DB_POOL_PRE_PING', True)
+            }
             
             logger.info(f"📦 初始化数据库: {db_type}")
             
             if db_type == 'sqlite':
                 # SQLite配置
                 config = {
-                    'path': app.config.get('SQLITE_DB_PATH', 'data/yprompt.db')
+                    'path': app.config.get('SQLITE_DB_PATH', 'data/yprompt.db'),
+                    'statement_cache_size': app.config.get('DB_STATEMENT_CACHE_SIZE', 256),
+                    'sqlite_options': {
+                        'production_mode': app.config.get('SQLITE_PRODUCTION_MODE', False),
+                        'busy_timeout': app.config.get('SQLITE_BUSY_TIMEOUT', 5000),
+                        'mmap_size': app.config.get('SQLITE_MMAP_SIZE', 268435456),
+                        'cache_size': app.config.get('SQLITE_CACHE_SIZE', -65536),
+                        'reader_pool_size': app.config.get('SQLITE_READER_POOL_SIZE', 4)
+                    }
                 }
                 logger.info(f"📁 SQLite数据库路径: {config['path']}")
                 
@@ -37,14 +137,25 @@ class DB:
                     'user': app.config.get('DB_USER'),
                     'password': app.config.get('DB_PASS'),
                     'port': app.config.get('DB_PORT', 3306),
-                    'minsize': 3,
-                    'maxsize': 10,
-                    'pool_recycle': 3600
+                    'statement_cache_size': app.config.get('DB_STATEMENT_CACHE_SIZE', 256)
                 }
                 logger.info(f"🔗 MySQL数据库: {config['host']}/{config['database']}")
                 
             else:
                 raise ValueError(f"不支持的数据库类型: {db_type}")
+
+            config.update(pool_config)
+            config['bulk_chunk_size'] = app.config.get('DB_BULK_CHUNK_SIZE', 500)
+            config['stream_batch_size'] = app.config.get('DB_STREAM_BATCH_SIZE', 500)
+            config['query_stats_enabled'] = app.config.get('DB_QUERY_STATS_ENABLED', True)
+            config['slow_query_ms'] = app.config.get('DB_SLOW_QUERY_MS', 200)
+            config['replica_urls'] = app.config.get('DB_REPLICA_URLS') or []
+            config['replica_sticky_seconds'] = app.config.get('DB_REPLICA_STICKY_SECONDS', 5)
+            logger.info(
+                f"🔧 连接池配置: pool_size={pool_config['pool_size']}, "
+                f"max_overflow={pool_config['max_overflow']}, pool_timeout={pool_config['pool_timeout']}, "
+                f"pool_recycle={pool_config['pool_recycle']}, pre_ping={pool_config['pool_pre_ping']}"
+            )
             
             # 创建数据库适配器（传递应用配置）
             adapter = await create_database_adapter(db_type, config, dict(app.config))
@@ -52,6 +163,35 @@ class DB:
             # 保存到应用上下文
             app.ctx.db = adapter
             app.ctx.db_type = db_type
+            await detect_fulltext(adapter)
+            
+            configure_counting(
+                cache_ttl=app.config.get('COUNT_CACHE_TTL', 60),
+                cache_size=app.config.get('COUNT_CACHE_SIZE', 4096),
+                approx_cap=app.config.get('COUNT_APPROX_CAP', 1000)
+            )
+            configure_content_hashing(app.config.get('CONTENT_HASH_OFFLOAD_BYTES', 262144))
+            configure_library_cache(
+                cache_ttl=app.config.get('PROMPT_CACHE_TTL', 30),
+                cache_size=app.config.get('PROMPT_CACHE_SIZE', 2048)
+            )
+            counter_buffer.configure(
+                flush_interval_ms=app.config.get('COUNTER_FLUSH_INTERVAL_MS', 1000),
+                max_events=app.config.get('COUNTER_FLUSH_MAX_EVENTS', 1000)
+            )
+            counter_buffer.start(adapter)
+            configure_version_storage(app.config.get('VERSION_KEYFRAME_INTERVAL', 10))
+            configure_text_blobs(app.config.get('TEXT_BLOB_MIN_CHARS', 2048))
+            configure_text_diff(
+                cache_ttl=app.config.get('DIFF_CACHE_TTL', 600),
+                cache_size=app.config.get('DIFF_CACHE_SIZE', 512)
+            )
+            column_codec.configure(
+                columns=app.config.get('COLUMN_COMPRESSION_COLUMNS', []),
+                min_bytes=app.config.get('COLUMN_COMPRESSION_MIN_BYTES', 1024),
+                algorithm=app.config.get('COLUMN_COMPRESSION_ALGORITHM', 'zstd'),
+                offload_bytes=app.config.get('COLUMN_COMPRESSION_OFFLOAD_BYTES', 262144)
+            )
             
             logger.info(f"✅ 数据库初始化成功: {db_type}")
         
@@ -61,5 +201,24 @@ class DB:
             服务停止后关闭数据库连接
             """
             if hasattr(app.ctx, 'db'):
+                # 先写回缓冲中的计数，再关闭连接
+                await counter_buffer.stop()
+                counter_stats = counter_buffer.stats()
+                logger.info(
+                    f"📊 计数合并写入: flushes={counter_stats['flushes']}, "
+                    f"events={counter_stats['flushed_events']}, rows={counter_stats['flushed_rows']}, "
+                    f"failures={counter_stats['failures']}, pending={counter_stats['pending_events']}"
+                )
+                stats = app.ctx.db.get_statement_cache_stats()
+                logger.info(
+                    f"📊 SQL语句缓存: hits={stats['hits']}, misses={stats['misses']}, "
+                    f"hit_rate={stats['hit_rate']}, size={stats['size']}/{stats['maxsize']}"
+                )
+                pool_stats = app.ctx.db.get_pool_stats()
+                logger.info(
+                    f"📊 连接池: checked_out={pool_stats['checkedout']}, overflow={pool_stats['overflow']}, "
+                    f"acquired={pool_stats['acquired']}, avg_wait_ms={pool_stats['avg_wait_ms']}, "
+                    f"max_wait_ms={pool_stats['max_wait_ms']}"
+                )
                 await app.ctx.db.close()
                 logger.info("✅ 数据库连接已关闭")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""提示词全文检索
+
+- SQLite: FTS5 外部内容表 prompts_fts（trigram 分词，中英文均按子串匹配），
+  由 prompts 表上的触发器同步，按 bm25 排序（标题 > 描述 > 正文）
+- MySQL: ngram 解析器的 FULLTEXT 索引 ft_prompts_search，由 InnoDB 自动维护，
+  按 MATCH ... AGAINST 的相关度排序
+
+全文索引尚未建立（旧库未执行升级脚本）或关键词过短（trigram 需至少 3 个字符，
+ngram 需至少 ngram_token_size 个字符）时退回 LIKE 子串匹配。
+"""
+
+import sqlite3
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from sanic.log import logger
+
+FULLTEXT_COLUMNS = ('title', 'description', 'final_prompt')
+SQLITE_FTS_TABLE = 'prompts_fts'
+MYSQL_FULLTEXT_INDEX = 'ft_prompts_search'
+# bm25 各列权重，顺序同 FULLTEXT_COLUMNS
+SQLITE_RANK_WEIGHTS = (10.0, 5.0, 1.0)
+MIN_TERM_CHARS = {'sqlite': 3, 'mysql': 2}
+
+
+class SearchClause(NamedTuple):
+    """关键词检索片段
+
+    condition 为筛选条件（拼进 WHERE，计数与普通排序使用）；按相关度排序时改用
+    rank_join（拼在 FROM 之后，为空表示无需 JOIN）+ rank_sql（越大越相关），
+    rank_join 本身已完成筛选，此时不再需要 condition。LIKE 检索不支持相关度，rank_sql 为 None。
+    """
+    condition: str
+    params: List[Any]
+    rank_join: str
+    rank_join_params: List[Any]
+    rank_sql: Optional[str]
+    rank_params: List[Any]
+
+    @property
+    def rankable(self) -> bool:
+        return self.rank_sql is not None
+
+    def ranked_filter(self) -> Tuple[str, List[Any]]:
+        """按相关度排序时 WHERE 中仍需保留的关键词条件"""
+        return ('', []) if self.rank_join else (self.condition, self.params)
+
+
+def sqlite_fulltext_supported() -> bool:
+    """当前 SQLite 库是否支持 FTS5 trigram 分词（需 3.34+ 且编译了 FTS5）"""
+    if sqlite3.sqlite_version_info < (3, 34, 0):
+        return False
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute(f"CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5(title, tokenize='trigram')")
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+def _dialect(db) -> str:
+    return db.engine.dialect.name
+
+
+async def detect_fulltext(db) -> bool:
+    """启动时检查全文索引是否存在，结果记录在适配器的 fulltext_enabled 上"""
+    dialect = _dialect(db)
+    try:
+        if dialect == 'sqlite':
+            row = await db.get(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", [SQLITE_FTS_TABLE]
+            )
+            script = 'add_fulltext_search_sqlite.sql'
+        elif dialect == 'mysql':
+            row = await db.get(
+                "SELECT index_name FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = 'prompts' AND index_name = ? LIMIT 1",
+                [MYSQL_FULLTEXT_INDEX]
+            )
+            script = 'add_fulltext_search_mysql.sql'
+        else:
+            row, script = None, None
+    except Exception as exc:
+        logger.warning(f'⚠️  检查全文索引失败，关键词搜索使用 LIKE: {exc}')
+        row, script = None, None
+
+    db.fulltext_enabled = bool(row)
+    if db.fulltext_enabled:
+        logger.info(f'🔎 全文检索已启用: {dialect}')
+    elif dialect == 'sqlite' and not sqlite_fulltext_supported():
+        logger.warning('⚠️  当前 SQLite 不支持 FTS5 trigram 分词，关键词搜索使用 LIKE')
+    elif script:
+        logger.warning(f'⚠️  未找到全文索引，关键词搜索使用 LIKE，请执行 migrations/{script}')
+    return db.fulltext_enabled
+
+
+def build_search(db, keyword: str, table: str = 'prompts') -> Optional[SearchClause]:
+    """根据关键词生成检索片段，空关键词返回 None
+
+    Args:
+        table: 语句中 prompts 表的名称或别名
+    """
+    keyword = (keyword or '').strip()
+    if not keyword:
+        return None
+
+    dialect = _dialect(db)
+    terms = keyword.split()
+    min_chars = MIN_TERM_CHARS.get(dialect)
+    if (not getattr(db, 'fulltext_enabled', False) or min_chars is None
+            or any(len(term) < min_chars for term in terms)):
+        return _like_search(keyword, table)
+
+    if dialect == 'sqlite':
+        # 每个词按短语匹配，多个词之间为 AND
+        match = ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+        condition = f"{table}.id IN (SELECT rowid FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH ?)"
+        weights = ', '.join(str(weight) for weight in SQLITE_RANK_WEIGHTS)
+        # 只有排序需要 bm25 得分；LIMIT -1 阻止子查询被展平，保证先物化命中集合再按主键回表，
+        # 否则优化器可能把全文表放在内层，对外层每一行各执行一次 MATCH
+        rank_join = (
+            f" JOIN (SELECT rowid AS fts_id, bm25({SQLITE_FTS_TABLE}, {weights}) AS fts_rank "
+            f"FROM {SQLITE_FTS_TABLE} WHERE {SQLITE_FTS_TABLE} MATCH ? LIMIT -1) fts ON fts.fts_id = {table}.id"
+        )
+        return SearchClause(condition, [match], rank_join, [match], '-fts.fts_rank', [])
+
+    columns = ', '.join(f'{table}.{column}' for column in FULLTEXT_COLUMNS)
+    match_sql = f'MATCH({columns}) AGAINST (? IN BOOLEAN MODE)'
+    match = ' '.join('+"' + term.replace('"', ' ') + '"' for term in terms)
+    return SearchClause(match_sql, [match], '', [], match_sql, [match])
+
+
+def _like_search(keyword: str, table: str) -> SearchClause:
+    pattern = f'%{keyword}%'
+    condition = '(' + ' OR '.join(f'{table}.{column} LIKE ?' for column in FULLTEXT_COLUMNS) + ')'
+    return SearchClause(condition, [pattern] * len(FULLTEXT_COLUMNS), '', [], None, [])
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""个人提示词库缓存
+
+缓存 PromptService.get_prompts_list / get_prompt_detail 的结果，按用户分域
+（library:<user_id>），键为标准化后的查询参数。该用户的任何写操作（保存、更新、删除、
+收藏、使用、版本与标签变更、导入）调用 invalidate_library 使整域失效。
+
+写操作通常位于请求级工作单元内：写入后立即失效一次，工作单元结束（提交或回滚）后
+再失效一次。读取方在查询前取得域的代数并随结果回填（见 ScopedCache.set），
+查询期间发生过失效的旧结果不会写入缓存。
+
+查看次数、社区点赞/评论数等计数不触发失效，这些字段最多滞后 PROMPT_CACHE_TTL 秒。
+缓存结果由多个请求共享，调用方不应修改返回的对象。
+"""
+
+from typing import Optional
+
+from apps.utils.scoped_cache import ScopedCache
+
+library_cache = ScopedCache(maxsize=2048, ttl=30)
+
+
+def configure_library_cache(cache_ttl: Optional[float] = None, cache_size: Optional[int] = None):
+    """应用启动时按配置调整缓存容量与 TTL（TTL 为 0 表示关闭缓存）"""
+    library_cache.configure(maxsize=cache_size, ttl=cache_ttl)
+
+
+def library_scope(user_id) -> str:
+    return f'library:{user_id}'
+
+
+def invalidate_library(db, user_id):
+    """使该用户的提示词库缓存失效"""
+    scope = library_scope(user_id)
+    library_cache.invalidate(scope)
+    db.after_unit_of_work(lambda: library_cache.invalidate(scope))
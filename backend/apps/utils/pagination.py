@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""分页工具
+
+游标（keyset）分页：游标是不透明的 base64url 字符串，编码排序方式与上一页最后一行的
+排序键（末位为 id），下一页按 (排序键, id) 定位继续读取，翻到任意深度都只扫描一页的行。
+
+计数策略（count 参数）：
+- exact: 精确 COUNT(*)，按 (域, 筛选条件) 缓存，相关写操作使缓存失效
+- approx: 最多数到 COUNT_APPROX_CAP 行即停止，超过时 total_is_estimate=True
+- none: 不计数，仅通过多取一行给出 has_more
+"""
+
+import base64
+import datetime
+import decimal
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from apps.utils.scoped_cache import ScopedCache
+
+COUNT_MODES = ('exact', 'approx', 'none')
+DEFAULT_COUNT_APPROX_CAP = 1000
+
+# 精确计数缓存（进程内），域如 prompts:<user_id>、comments:<prompt_id>
+count_cache = ScopedCache(maxsize=4096, ttl=60)
+_count_settings = {'approx_cap': DEFAULT_COUNT_APPROX_CAP}
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无法解析或与当前排序方式不匹配"""
+
+
+def _to_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, (datetime.date, decimal.Decimal)):
+        return str(value)
+    return value
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    """编码游标：排序方式 + 排序键取值"""
+    payload = json.dumps({'s': sort, 'k': [_to_cursor_value(value) for value in values]},
+                         ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: Optional[str], sort: str, size: int) -> Optional[List[Any]]:
+    """解码游标，空游标表示第一页（返回 None）"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        values = payload['k']
+        cursor_sort = payload['s']
+    except Exception as exc:
+        raise InvalidCursorError('分页游标无效') from exc
+    if cursor_sort != sort or not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError('分页游标与当前排序方式不匹配')
+    return values
+
+
+def get_cursor_arg(request) -> Optional[str]:
+    """读取 cursor 查询参数（保留空值：request.args 会丢弃 cursor=，而它表示游标分页的第一页）"""
+    return request.get_args(keep_blank_values=True).get('cursor')
+
+
+def keyset_condition(columns: Sequence[str], values: Sequence[Any],
+                     descending: bool = True) -> Tuple[str, List[Any]]:
+    """生成 (c1, c2, ..., id) 越过游标位置的条件
+
+    展开为 c1 <= ? AND (c1 < ? OR (c1 = ? AND (...)))，而非行值比较，
+    使 MySQL 与 SQLite 都能在复合索引上走范围扫描。
+    """
+    op = '<' if descending else '>'
+    condition = f"{columns[-1]} {op} ?"
+    params: List[Any] = [values[-1]]
+    for column, value in zip(reversed(columns[:-1]), reversed(values[:-1])):
+        condition = f"({column} {op} ? OR ({column} = ? AND {condition}))"
+        params = [value, value] + params
+    if len(columns) > 1:
+        condition = f"{columns[0]} {op}= ? AND {condition}"
+        params = [values[0]] + params
+    return condition, params
+
+
+def build_cursor_page(rows: List[Dict[str, Any]], limit: int, sort: str,
+                      key_func: Callable[[Dict[str, Any]], Sequence[Any]]) -> Dict[str, Any]:
+    """根据多取一行的查询结果生成游标分页响应"""
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    next_cursor = encode_cursor(sort, key_func(items[-1])) if has_more and items else None
+    return {
+        'limit': limit,
+        'items': items,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }
+
+
+def configure_counting(cache_ttl: Optional[float] = None, cache_size: Optional[int] = None,
+                       approx_cap: Optional[int] = None):
+    """应用启动时按配置调整计数缓存与近似计数上限"""
+    count_cache.configure(maxsize=cache_size, ttl=cache_ttl)
+    if approx_cap:
+        _count_settings['approx_cap'] = max(1, int(approx_cap))
+
+
+def normalize_count_mode(mode: Optional[str]) -> str:
+    """未知的计数模式按 exact 处理，保持旧接口行为"""
+    mode = (mode or 'exact').lower()
+    return mode if mode in COUNT_MODES else 'exact'
+
+
+def invalidate_counts(db, *scopes: Any):
+    """写操作后使相关域的计数缓存失效
+
+    写操作位于工作单元内时，工作单元结束（提交或回滚）后再失效一次，
+    避免事务未提交期间并发请求统计到旧总数并重新写入缓存。
+    """
+    count_cache.invalidate(*scopes)
+    db.after_unit_of_work(lambda: count_cache.invalidate(*scopes))
+
+
+async def count_total(db, mode: str, scope: Any, from_where_sql: str,
+                      params: Sequence[Any]) -> Tuple[Optional[int], bool]:
+    """按计数策略统计总数
+
+    Args:
+        from_where_sql: 形如 "FROM prompts WHERE user_id = ?" 的查询片段
+    Returns:
+        (total, is_estimate)，none 模式返回 (None, False)
+    """
+    if mode == 'none':
+        return None, False
+    if mode == 'approx':
+        cap = _count_settings['approx_cap']
+        row = await db.get(
+            f"SELECT COUNT(*) AS total FROM (SELECT 1 {from_where_sql} LIMIT ?) capped",
+            list(params) + [cap]
+        )
+        total = row['total'] if row else 0
+        return total, total >= cap
+    cache_key = (from_where_sql, tuple(params))
+    total = count_cache.get(scope, cache_key)
+    if total is None:
+        # 查询前取得代数：统计期间有写操作失效该域时不回填旧总数
+        generation = count_cache.generation(scope)
+        row = await db.get(f"SELECT COUNT(*) AS total {from_where_sql}", list(params))
+        total = row['total'] if row else 0
+        count_cache.set(scope, cache_key, total, generation=generation)
+    return total, False
+
+
+def build_offset_page(rows: List[Dict[str, Any]], page: int, limit: int, mode: str,
+                      total: Optional[int], is_estimate: bool = False) -> Dict[str, Any]:
+    """根据多取一行的查询结果生成页码分页响应"""
+    result = {
+        'total': total,
+        'page': page,
+        'limit': limit,
+        'items': rows[:limit],
+        'has_more': len(rows) > limit,
+    }
+    if mode != 'exact':
+        result['count_mode'] = mode
+        result['total_is_estimate'] = is_estimate
+    return result
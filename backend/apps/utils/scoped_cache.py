@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""进程内分域缓存
+
+条目按 (scope, key) 存放，带 LRU 容量上限与 TTL；写操作调用 invalidate(scope)
+递增该域的代数（generation），旧代数下写入的条目随即失效，无需逐条删除。
+
+查询结果回填缓存时，应在查询开始前用 generation(scope) 取得代数，回填时传给 set()：
+查询期间该域被失效过（并发写已提交）则放弃回填，避免旧结果以新代数缓存下来。
+多 worker 部署时各进程独立缓存，跨进程的一致性由 TTL 兜底。
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class ScopedCache:
+    """LRU + TTL + 分域代数失效的缓存"""
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 60.0):
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = float(ttl)
+        self._entries: 'OrderedDict[Tuple[Hashable, Hashable], Tuple[float, int, Any]]' = OrderedDict()
+        self._generations: Dict[Hashable, int] = {}
+        # 代数全局递增且 clear() 后不回退，未失效过的域取 _floor，保证旧令牌不会与新代数相等
+        self._counter = 0
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+
+    def configure(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        if maxsize is not None:
+            self.maxsize = max(1, int(maxsize))
+        if ttl is not None:
+            self.ttl = float(ttl)
+        self.clear()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, scope: Hashable, key: Hashable, default: Any = None) -> Any:
+        if not self.enabled:
+            return default
+        entry = self._entries.get((scope, key), _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, generation, value = entry
+        if expires_at < time.monotonic() or generation != self.generation(scope):
+            del self._entries[(scope, key)]
+            self.misses += 1
+            return default
+        self._entries.move_to_end((scope, key))
+        self.hits += 1
+        return value
+
+    def generation(self, scope: Hashable) -> int:
+        """域的当前代数，查询前取得，回填时传给 set()"""
+        return self._generations.get(scope, self._floor)
+
+    def set(self, scope: Hashable, key: Hashable, value: Any, generation: Optional[int] = None):
+        """写入条目；传入 generation 且该域此后已失效时放弃写入"""
+        if not self.enabled:
+            return
+        current = self.generation(scope)
+        if generation is not None and generation != current:
+            self.stale_sets += 1
+            return
+        self._entries[(scope, key)] = (time.monotonic() + self.ttl, current, value)
+        self._entries.move_to_end((scope, key))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *scopes: Hashable):
+        """使若干个域下的全部条目失效"""
+        for scope in scopes:
+            self._counter += 1
+            self._generations[scope] = self._counter
+            self.invalidations += 1
+        # 代数表只增不减，过大时整体清空（同时清空条目，保证不会误命中）
+        if len(self._generations) > self.maxsize * 4:
+            self.clear()
+
+    def clear(self):
+        self._entries.clear()
+        self._generations.clear()
+        self._counter += 1
+        self._floor = self._counter
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'invalidations': self.invalidations,
+            'stale_sets': self.stale_sets,
+        }
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""内容寻址的大文本存储
+
+长度不小于 TEXT_BLOB_MIN_CHARS 的文本以 SHA-256 为键压缩（与列压缩相同的 zstd/zlib 编码）后存入 text_blobs 表，
+原列只保存引用（BLOB_REF_PREFIX + 哈希）。相同内容只存一份，refcount 记录引用它的行数：
+
+- externalize_rows: 写入前把大文本替换为引用，同一批内的引用计数合并为一条 upsert
+- resolve_rows: 读取后把引用还原为原文，同一批的全部引用一条 IN 查询取回
+- release_rows: 删除行时回退引用计数，归零的文本随即删除
+
+目前用于版本关键帧的大文本字段与操练场分享的系统提示词/对话快照；prompts 主表的正文
+参与全文检索与列表查询，仍直接保存原文。
+"""
+
+import asyncio
+import hashlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from apps.utils.column_codec import column_codec, compress_bytes, decompress_bytes
+
+BLOB_REF_PREFIX = '\x1eblob:'
+DEFAULT_MIN_CHARS = 2048
+# 待压缩/解压的文本超过该长度（字符数）时放到线程池执行
+OFFLOAD_CHARS = 256 * 1024
+# IN 查询每批的哈希数
+LOOKUP_CHUNK_SIZE = 500
+
+_settings = {'min_chars': DEFAULT_MIN_CHARS}
+
+
+def configure_text_blobs(min_chars: Optional[int] = None):
+    """应用启动时按配置调整外置阈值（0 表示不再外置新写入的文本，已有引用照常读取）"""
+    if min_chars is not None:
+        _settings['min_chars'] = max(0, int(min_chars))
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX)
+
+
+def _hash_of(ref: str) -> str:
+    return ref[len(BLOB_REF_PREFIX):]
+
+
+def _should_externalize(value: Any) -> bool:
+    min_chars = _settings['min_chars']
+    return bool(min_chars) and isinstance(value, str) and len(value) >= min_chars and not is_ref(value)
+
+
+def blob_ref(value: Any) -> Any:
+    """值外置后将保存的内容：达到阈值的文本返回其引用，否则原样返回（不访问数据库）"""
+    if not _should_externalize(value):
+        return value
+    return BLOB_REF_PREFIX + hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def _compress_all(texts: Dict[str, str]) -> Dict[str, bytes]:
+    algorithm = column_codec.algorithm
+    return {digest: compress_bytes(text.encode('utf-8'), algorithm) for digest, text in texts.items()}
+
+
+def _decompress_all(bodies: Dict[str, bytes]) -> Dict[str, str]:
+    # 按数据头识别算法，切换算法前写入的文本照常读取
+    return {digest: decompress_bytes(body).decode('utf-8') for digest, body in bodies.items()}
+
+
+async def _run(func, payload: Dict[str, Any], size: int):
+    if size > OFFLOAD_CHARS:
+        return await asyncio.get_running_loop().run_in_executor(None, func, payload)
+    return func(payload)
+
+
+def _refs_in(rows: Iterable[Dict[str, Any]], fields: Sequence[str]) -> List[str]:
+    return [row[field] for row in rows for field in fields if is_ref(row.get(field))]
+
+
+async def externalize_rows(db, rows: List[Dict[str, Any]], fields: Sequence[str]):
+    """将 rows 中指定字段的大文本存入 text_blobs 并原地替换为引用"""
+    texts: Dict[str, str] = {}
+    refcounts: Counter = Counter()
+    for row in rows:
+        for field in fields:
+            value = row.get(field)
+            ref = blob_ref(value)
+            if ref is value:
+                continue
+            digest = _hash_of(ref)
+            texts[digest] = value
+            refcounts[digest] += 1
+            row[field] = ref
+    if not texts:
+        return
+
+    bodies = await _run(_compress_all, texts, sum(len(text) for text in texts.values()))
+    await db.table_upsert_many(
+        'text_blobs',
+        [
+            {'hash': digest, 'compressed_body': bodies[digest], 'size': len(texts[digest]),
+             'refcount': refcounts[digest]}
+            for digest in sorted(texts)
+        ],
+        ['hash'],
+        f"refcount = refcount + {db.upsert_value('refcount')}"
+    )
+
+
+async def resolve_rows(db, rows: List[Dict[str, Any]], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """将 rows 中指定字段的引用原地还原为原文（批量读取）"""
+    digests = sorted({_hash_of(ref) for ref in _refs_in(rows, fields)})
+    if not digests:
+        return rows
+    bodies: Dict[str, bytes] = {}
+    for start in range(0, len(digests), LOOKUP_CHUNK_SIZE):
+        chunk = digests[start:start + LOOKUP_CHUNK_SIZE]
+        found = await db.query(
+            f"SELECT hash, compressed_body FROM text_blobs WHERE hash IN ({', '.join(['?'] * len(chunk))})",
+            chunk
+        )
+        bodies.update({row['hash']: bytes(row['compressed_body']) for row in found})
+    missing = set(digests) - set(bodies)
+    if missing:
+        raise LookupError(f'text_blobs 缺少内容: {", ".join(sorted(missing)[:3])}')
+
+    texts = await _run(_decompress_all, bodies, sum(len(body) for body in bodies.values()) * 4)
+    for row in rows:
+        for field in fields:
+            if is_ref(row.get(field)):
+                row[field] = texts[_hash_of(row[field])]
+    return rows
+
+
+async def release_rows(db, rows: Iterable[Dict[str, Any]], fields: Sequence[str]):
+    """删除行后回退其引用计数，并删除不再被引用的文本"""
+    refcounts = Counter(_hash_of(ref) for ref in _refs_in(rows, fields))
+    if not refcounts:
+        return
+    await _adjust_refcounts(db, refcounts, -1)
+    digests = sorted(refcounts)
+    for start in range(0, len(digests), LOOKUP_CHUNK_SIZE):
+        chunk = digests[start:start + LOOKUP_CHUNK_SIZE]
+        await db.execute(
+            f"DELETE FROM text_blobs WHERE hash IN ({', '.join(['?'] * len(chunk))}) AND refcount <= 0",
+            chunk
+        )
+
+
+async def _adjust_refcounts(db, refcounts: Counter, sign: int):
+    """按增量分组更新引用计数（同一增量的哈希一条 UPDATE）"""
+    by_delta: Dict[int, List[str]] = {}
+    for digest, count in refcounts.items():
+        by_delta.setdefault(sign * count, []).append(digest)
+    for delta, digests in sorted(by_delta.items()):
+        digests.sort()
+        for start in range(0, len(digests), LOOKUP_CHUNK_SIZE):
+            chunk = digests[start:start + LOOKUP_CHUNK_SIZE]
+            await db.execute(
+                f"UPDATE text_blobs SET refcount = refcount + ? WHERE hash IN ({', '.join(['?'] * len(chunk))})",
+                [delta] + chunk
+            )
+
+
+async def blob_stats(db) -> Dict[str, Any]:
+    row = await db.get(
+        "SELECT COUNT(*) AS blobs, COALESCE(SUM(size), 0) AS text_chars, "
+        "COALESCE(SUM(LENGTH(compressed_body)), 0) AS stored_bytes, COALESCE(SUM(refcount), 0) AS refs "
+        "FROM text_blobs"
+    )
+    return dict(row or {})
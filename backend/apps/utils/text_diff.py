@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""版本对比的文本差异计算
+
+逐行比较两段文本，只返回有变化的片段（hunk）及其前后 context 行；成对替换的行再做
+词级比较，中日韩文字按单字切分，英文按单词切分，便于前端直接高亮：
+
+- json 格式：``{hunks: [{from_start, from_lines, to_start, to_lines, lines: [{op, text, words?}]}],
+  added, removed}``，op 为 equal/delete/insert，words 为 ``[[op, 片段], ...]``
+- unified 格式：标准 unified diff 文本
+
+结果按 (字段原文哈希对, 格式, context) 缓存，内容相同即命中，无需失效；较大的文本在线程池中计算。
+"""
+
+import asyncio
+import difflib
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from apps.utils.scoped_cache import ScopedCache
+
+DIFF_FORMATS = ('json', 'unified')
+DEFAULT_CONTEXT_LINES = 3
+MAX_CONTEXT_LINES = 20
+# 两段文本合计超过该长度（字符数）时放到线程池计算
+OFFLOAD_CHARS = 256 * 1024
+# 成对替换的两行合计超过该长度时不再做词级比较
+WORD_DIFF_MAX_CHARS = 20000
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+# 假名、中日韩统一表意文字、谚文逐字切分，其余按单词/连续空白/单个标点切分
+_TOKEN_RE = re.compile(rf'[{_CJK}]|[^\W{_CJK}]+|\s+|[^\w\s]', re.UNICODE)
+
+diff_cache = ScopedCache(maxsize=512, ttl=600)
+_CACHE_SCOPE = 'diff'
+
+
+def configure_text_diff(cache_ttl: Optional[float] = None, cache_size: Optional[int] = None):
+    """应用启动时按配置调整缓存容量与 TTL（TTL 为 0 表示关闭缓存）"""
+    diff_cache.configure(maxsize=cache_size, ttl=cache_ttl)
+
+
+def field_text(field: str, value: Any) -> str:
+    """将版本字段转为逐行比较的文本：列表每项一行，对话历史 JSON 展开为多行"""
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return '\n'.join(item if isinstance(item, str) else json.dumps(item, ensure_ascii=False) for item in value)
+    if field == 'conversation_history' and value:
+        try:
+            return json.dumps(json.loads(value), ensure_ascii=False, indent=2)
+        except (TypeError, ValueError):
+            pass
+    return str(value)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text)
+
+
+def word_diff(old: str, new: str) -> Tuple[List[List[str]], List[List[str]]]:
+    """一对替换行的词级差异，分别返回旧行与新行的 [[op, 片段], ...]"""
+    old_tokens, new_tokens = tokenize(old), tokenize(new)
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    old_words: List[List[str]] = []
+    new_words: List[List[str]] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            _append(old_words, 'equal', old_tokens[i1:i2])
+            _append(new_words, 'equal', new_tokens[j1:j2])
+            continue
+        _append(old_words, 'delete', old_tokens[i1:i2])
+        _append(new_words, 'insert', new_tokens[j1:j2])
+    return old_words, new_words
+
+
+def _append(words: List[List[str]], op: str, tokens: Sequence[str]):
+    if not tokens:
+        return
+    if words and words[-1][0] == op:
+        words[-1][1] += ''.join(tokens)
+    else:
+        words.append([op, ''.join(tokens)])
+
+
+def diff_json(old: str, new: str, context: int) -> Dict[str, Any]:
+    old_lines, new_lines = old.splitlines(), new.splitlines()
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    hunks = []
+    added = removed = 0
+    for group in matcher.get_grouped_opcodes(context):
+        lines: List[Dict[str, Any]] = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                lines.extend({'op': 'equal', 'text': line} for line in old_lines[i1:i2])
+                continue
+            deleted = [{'op': 'delete', 'text': line} for line in old_lines[i1:i2]]
+            inserted = [{'op': 'insert', 'text': line} for line in new_lines[j1:j2]]
+            if tag == 'replace':
+                for old_line, new_line in zip(deleted, inserted):
+                    if len(old_line['text']) + len(new_line['text']) <= WORD_DIFF_MAX_CHARS:
+                        old_line['words'], new_line['words'] = word_diff(old_line['text'], new_line['text'])
+            lines.extend(deleted)
+            lines.extend(inserted)
+            removed += len(deleted)
+            added += len(inserted)
+        first, last = group[0], group[-1]
+        hunks.append({
+            'from_start': first[1] + 1,
+            'from_lines': last[2] - first[1],
+            'to_start': first[3] + 1,
+            'to_lines': last[4] - first[3],
+            'lines': lines,
+        })
+    return {'hunks': hunks, 'added': added, 'removed': removed}
+
+
+def diff_unified(field: str, old: str, new: str, context: int) -> str:
+    return '\n'.join(difflib.unified_diff(
+        old.splitlines(), new.splitlines(), f'a/{field}', f'b/{field}', n=context, lineterm=''
+    ))
+
+
+def _compute(field: str, old: str, new: str, fmt: str, context: int):
+    return diff_unified(field, old, new, context) if fmt == 'unified' else diff_json(old, new, context)
+
+
+async def diff_field(field: str, old: str, new: str, fmt: str = 'json',
+                     context: int = DEFAULT_CONTEXT_LINES) -> Any:
+    """计算一个字段的差异（带缓存）；unified 格式的文件头使用字段名，字段名计入缓存键"""
+    key = (
+        field if fmt == 'unified' else '',
+        hashlib.sha256(old.encode('utf-8')).hexdigest(),
+        hashlib.sha256(new.encode('utf-8')).hexdigest(),
+        fmt,
+        context,
+    )
+    cached = diff_cache.get(_CACHE_SCOPE, key)
+    if cached is not None:
+        return cached
+    if len(old) + len(new) > OFFLOAD_CHARS:
+        result = await asyncio.get_running_loop().run_in_executor(None, _compute, field, old, new, fmt, context)
+    else:
+        result = _compute(field, old, new, fmt, context)
+    diff_cache.set(_CACHE_SCOPE, key, result)
+    return result
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""提示词版本的差量存储
+
+prompt_versions 每 VERSION_KEYFRAME_INTERVAL 个版本保存一个完整快照（关键帧，
+storage_type='full'），其间的版本只保存相对最近关键帧的差量（storage_type='delta'）：
+大文本字段（DELTA_FIELDS）置空，差量以 JSON 存入 delta_data，base_version_id 指向关键帧。
+差量始终相对关键帧而非上一版本，还原任意版本只需读取该行与一个关键帧。
+
+差量格式：{"v": 1, "fields": {字段: [操作, ...]}}，未变化的字段不出现；操作为
+正整数（从关键帧复制 n 个字符）、负整数（跳过关键帧 n 个字符）或字符串（插入文本）。
+先去掉公共前后缀，中间部分按行比较，对话历史追加、正文局部修改都只记录变化的部分。
+
+差量超过完整内容的 MAX_DELTA_RATIO 时直接保存为新的关键帧。关键帧被差量引用，
+版本删除只做软删除，不能物理删除关键帧。
+
+关键帧的大文本字段再经 text_blobs 外置：相邻关键帧间未变化的对话历史、系统提示词只存一份。
+"""
+
+import asyncio
+import json
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from apps.utils.text_blobs import blob_ref, externalize_rows, release_rows, resolve_rows
+
+# 差量存储的大文本字段（标题、语言、格式、标签等短字段每个版本完整保存）
+DELTA_FIELDS = (
+    'description', 'requirement_report', 'thinking_points', 'initial_prompt', 'advice',
+    'final_prompt', 'system_prompt', 'conversation_history'
+)
+# 差量相关列，返回给前端前移除
+STORAGE_COLUMNS = ('storage_type', 'base_version_id', 'delta_data')
+DEFAULT_KEYFRAME_INTERVAL = 10
+MAX_DELTA_RATIO = 0.5
+DELTA_FORMAT_VERSION = 1
+# 按行比较的规模上限（行数乘积），超过时整段替换，避免 SequenceMatcher 的平方级开销
+MAX_MATCH_COST = 4_000_000
+# 待比较文本超过该长度（字符数）时放到线程池计算
+OFFLOAD_CHARS = 256 * 1024
+
+_LINE_RE = re.compile(r'[^\n]*\n|[^\n]+')
+_settings = {'keyframe_interval': DEFAULT_KEYFRAME_INTERVAL}
+
+
+def configure_version_storage(keyframe_interval: Optional[int] = None):
+    """应用启动时按配置调整关键帧间隔（1 或 0 表示每个版本都保存完整快照）"""
+    if keyframe_interval is not None:
+        _settings['keyframe_interval'] = max(1, int(keyframe_interval))
+
+
+def _text(value: Any) -> str:
+    return '' if value is None else str(value)
+
+
+def _common_length(base: str, target: str, limit: int, from_end: bool = False) -> int:
+    """公共前缀（或后缀）长度：二分比较切片，避免逐字符的 Python 循环"""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if from_end:
+            same = base[len(base) - middle:] == target[len(target) - middle:]
+        else:
+            same = base[:middle] == target[:middle]
+        if same:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def diff_text(base: str, target: str) -> List[Any]:
+    """计算把 base 变为 target 的操作序列"""
+    limit = min(len(base), len(target))
+    prefix = _common_length(base, target, limit)
+    suffix = _common_length(base, target, limit - prefix, from_end=True)
+
+    ops: List[Any] = []
+
+    def emit(op):
+        if not op:
+            return
+        # 合并相邻的同类操作
+        if ops and type(ops[-1]) is type(op) and (isinstance(op, str) or (ops[-1] > 0) == (op > 0)):
+            ops[-1] += op
+        else:
+            ops.append(op)
+
+    emit(prefix)
+    base_mid = base[prefix:len(base) - suffix]
+    target_mid = target[prefix:len(target) - suffix]
+    base_lines = _LINE_RE.findall(base_mid)
+    target_lines = _LINE_RE.findall(target_mid)
+    if base_lines and target_lines and len(base_lines) * len(target_lines) <= MAX_MATCH_COST:
+        matcher = SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                emit(sum(len(line) for line in base_lines[i1:i2]))
+                continue
+            if tag in ('delete', 'replace'):
+                emit(-sum(len(line) for line in base_lines[i1:i2]))
+            if tag in ('insert', 'replace'):
+                emit(''.join(target_lines[j1:j2]))
+    else:
+        emit(-len(base_mid))
+        emit(target_mid)
+    emit(suffix)
+    return ops
+
+
+def patch_text(base: str, ops: Iterable[Any]) -> str:
+    """按操作序列由 base 还原目标文本"""
+    parts, position = [], 0
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.append(base[position:position + op])
+            position += op
+        else:
+            position -= op
+    return ''.join(parts)
+
+
+def encode_delta(base: Mapping[str, Any], target: Mapping[str, Any]) -> str:
+    fields = {}
+    for field in DELTA_FIELDS:
+        base_value, target_value = _text(base.get(field)), _text(target.get(field))
+        if base_value != target_value:
+            fields[field] = diff_text(base_value, target_value)
+    return json.dumps({'v': DELTA_FORMAT_VERSION, 'fields': fields}, ensure_ascii=False, separators=(',', ':'))
+
+
+def apply_delta(base: Mapping[str, Any], delta: str) -> Dict[str, str]:
+    """返回还原后的 DELTA_FIELDS 字段值"""
+    changes = json.loads(delta)['fields']
+    return {
+        field: patch_text(_text(base.get(field)), changes[field]) if field in changes else _text(base.get(field))
+        for field in DELTA_FIELDS
+    }
+
+
+async def _run(func, *args):
+    size = sum(len(_text(value.get(field))) for value in args if isinstance(value, Mapping) for field in DELTA_FIELDS)
+    if size > OFFLOAD_CHARS:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+    return func(*args)
+
+
+def _layout(keyframe: Optional[Mapping[str, Any]], since_keyframe: int,
+            fields: Mapping[str, Any]) -> Tuple[bool, Optional[str]]:
+    """决定保存为关键帧还是差量，返回 (是否差量, 差量)"""
+    if keyframe is None or since_keyframe + 1 >= _settings['keyframe_interval']:
+        return False, None
+    delta = encode_delta(keyframe, fields)
+    full_size = sum(len(_text(fields.get(field))) for field in DELTA_FIELDS)
+    if len(delta) > full_size * MAX_DELTA_RATIO:
+        return False, None
+    return True, delta
+
+
+def _as_delta_row(fields: Dict[str, Any], keyframe_id: int, delta: str) -> Dict[str, Any]:
+    row = dict(fields)
+    for field in DELTA_FIELDS:
+        row[field] = ''
+    row.update({'storage_type': 'delta', 'base_version_id': keyframe_id, 'delta_data': delta})
+    return row
+
+
+async def prepare_version_fields(db, prompt_id: int, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将 build_version_fields 生成的完整快照转换为实际写入的行（关键帧或差量）
+
+    一条查询同时取得最近的关键帧及其后已有的版本数
+    """
+    if _settings['keyframe_interval'] <= 1:
+        return fields
+    keyframe = await db.get(
+        f"SELECT k.id, {', '.join('k.' + field for field in DELTA_FIELDS)}, "
+        "(SELECT COUNT(*) FROM prompt_versions d WHERE d.prompt_id = k.prompt_id AND d.id > k.id) AS since_keyframe "
+        "FROM prompt_versions k WHERE k.prompt_id = ? AND k.storage_type = 'full' ORDER BY k.id DESC LIMIT 1",
+        [prompt_id]
+    )
+    if keyframe:
+        await resolve_rows(db, [keyframe], DELTA_FIELDS)
+    is_delta, delta = await _run(_layout, keyframe, keyframe['since_keyframe'] if keyframe else 0, fields)
+    if is_delta:
+        return _as_delta_row(fields, keyframe['id'], delta)
+    await store_keyframes(db, [fields])
+    return fields
+
+
+async def store_keyframes(db, rows: List[Dict[str, Any]]):
+    """关键帧写入前将大文本字段外置到 text_blobs（原地替换为引用）"""
+    await externalize_rows(db, rows, DELTA_FIELDS)
+
+
+async def delete_prompt_versions(db, prompt_id: int, keyframes: List[Dict[str, Any]]):
+    """
+    删除提示词的全部版本并释放关键帧引用的文本
+
+    Args:
+        keyframes: 删除提示词前由 load_keyframe_refs 读取的关键帧（MySQL 删除提示词时会级联删除版本）
+    """
+    await db.execute("DELETE FROM prompt_versions WHERE prompt_id = ?", [prompt_id])
+    await release_rows(db, keyframes, DELTA_FIELDS)
+
+
+async def load_keyframe_refs(db, prompt_id: int, user_id: int) -> List[Dict[str, Any]]:
+    """读取提示词各关键帧的大文本字段（其中的 text_blobs 引用在删除后需要释放）"""
+    return await db.query(
+        f"SELECT {', '.join('v.' + field for field in DELTA_FIELDS)} FROM prompt_versions v "
+        "INNER JOIN prompts p ON v.prompt_id = p.id "
+        "WHERE v.prompt_id = ? AND p.user_id = ? AND v.storage_type = 'full'",
+        [prompt_id, user_id]
+    )
+
+
+async def expand_versions(db, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """还原差量版本的大文本字段（批量读取所需的关键帧），并移除存储相关列"""
+    base_ids = sorted({row['base_version_id'] for row in rows if row.get('storage_type') == 'delta'})
+    if base_ids:
+        keyframes = await db.query(
+            f"SELECT id, {', '.join(DELTA_FIELDS)} FROM prompt_versions "
+            f"WHERE id IN ({', '.join(['?'] * len(base_ids))})",
+            base_ids
+        )
+        keyframes = {keyframe['id']: keyframe for keyframe in keyframes}
+    else:
+        keyframes = {}
+    # 关键帧与本批完整版本中的 text_blobs 引用一次取回
+    await resolve_rows(
+        db, list(keyframes.values()) + [row for row in rows if row.get('storage_type') != 'delta'], DELTA_FIELDS
+    )
+    if keyframes:
+        for row in rows:
+            if row.get('storage_type') == 'delta':
+                row.update(await _run(apply_delta, keyframes[row['base_version_id']], row['delta_data']))
+    for row in rows:
+        for column in STORAGE_COLUMNS:
+            row.pop(column, None)
+    return rows
+
+
+async def compact_prompt_versions(db, prompt_id: int) -> Dict[str, int]:
+    """
+    按当前关键帧间隔重排一个提示词的全部版本（升级旧数据时使用，可重复执行）
+
+    Returns:
+        dict: {rows: 改写的行数, bytes_before, bytes_after}（大文本字段与差量的字符数）
+    """
+    columns = ', '.join(('id',) + DELTA_FIELDS + STORAGE_COLUMNS)
+    rows = await db.query(f"SELECT {columns} FROM prompt_versions WHERE prompt_id = ? ORDER BY id", [prompt_id])
+    stored = [dict(row) for row in rows]
+    bytes_before = sum(_stored_size(row) for row in stored)
+    await expand_versions(db, rows)
+
+    result = {'rows': 0, 'bytes_before': bytes_before, 'bytes_after': 0}
+    keyframe, since_keyframe = None, 0
+    for row, old in zip(rows, stored):
+        is_delta, delta = await _run(_layout, keyframe, since_keyframe, row)
+        if is_delta:
+            since_keyframe += 1
+            new = _as_delta_row({field: row[field] for field in DELTA_FIELDS}, keyframe['id'], delta)
+        else:
+            keyframe, since_keyframe = row, 0
+            new = dict({field: row[field] for field in DELTA_FIELDS}, storage_type='full',
+                       base_version_id=None, delta_data=None)
+        stored_new = dict(new, **{field: blob_ref(new[field]) for field in DELTA_FIELDS})
+        result['bytes_after'] += _stored_size(stored_new)
+        if any(stored_new[column] != old.get(column) for column in DELTA_FIELDS + STORAGE_COLUMNS):
+            # 先为新内容增加引用，再释放旧引用（未变化的文本计数不变）
+            await store_keyframes(db, [new])
+            await db.table_update('prompt_versions', new, f"id = {int(row['id'])}")
+            await release_rows(db, [old], DELTA_FIELDS)
+            result['rows'] += 1
+    return result
+
+
+def _stored_size(row: Mapping[str, Any]) -> int:
+    return sum(len(_text(row.get(field))) for field in DELTA_FIELDS + ('delta_data',))
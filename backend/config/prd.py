@@ -60,6 +60,7 @@ class Config:
     # 日志文件路径（可选，不配置则使用默认路径）
     # LOGGING_INFO_FILE = '../data/logs/backend/info.log'
     # LOGGING_ERROR_FILE = '../data/logs/backend/error.log'
+    # LOGGING_SLOW_QUERY_FILE = '../data/logs/backend/slow_query.log'
 
     # ==========================================
     # 服务器配置
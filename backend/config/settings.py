@@ -7,6 +7,17 @@ class Config(BaseConfig):
     # 数据库配置（优先使用环境变量）
     DB_TYPE = os.getenv('DB_TYPE') or (cf.DB_TYPE if hasattr(cf, 'DB_TYPE') else 'mysql')
     SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH') or (cf.SQLITE_DB_PATH if hasattr(cf, 'SQLITE_DB_PATH') else '../data/yprompt.db')
+
+    # SQLite生产模式（优先使用环境变量）
+    _sqlite_production_env = os.getenv('SQLITE_PRODUCTION_MODE')
+    if _sqlite_production_env is not None:
+        SQLITE_PRODUCTION_MODE = _sqlite_production_env.lower() in ('1', 'true', 'yes', 'on')
+    else:
+        SQLITE_PRODUCTION_MODE = cf.SQLITE_PRODUCTION_MODE if hasattr(cf, 'SQLITE_PRODUCTION_MODE') else False
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT') or (cf.SQLITE_BUSY_TIMEOUT if hasattr(cf, 'SQLITE_BUSY_TIMEOUT') else 5000))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE') or (cf.SQLITE_MMAP_SIZE if hasattr(cf, 'SQLITE_MMAP_SIZE') else 268435456))
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE') or (cf.SQLITE_CACHE_SIZE if hasattr(cf, 'SQLITE_CACHE_SIZE') else -65536))
+    SQLITE_READER_POOL_SIZE = int(os.getenv('SQLITE_READER_POOL_SIZE') or (cf.SQLITE_READER_POOL_SIZE if hasattr(cf, 'SQLITE_READER_POOL_SIZE') else 4))
     
     # MYSQL（优先使用环境变量）
     DB_HOST = os.getenv('DB_HOST') or cf.DB_HOST
@@ -15,6 +26,76 @@ class Config(BaseConfig):
     DB_NAME = os.getenv('DB_NAME') or cf.DB_NAME
     DB_PORT = int(os.getenv('DB_PORT', '3306')) if os.getenv('DB_PORT') else cf.DB_PORT
 
+    # 只读副本（环境变量以逗号分隔多个URL）
+    _replica_urls_env = os.getenv('DB_REPLICA_URLS')
+    if _replica_urls_env is not None:
+        DB_REPLICA_URLS = [url.strip() for url in _replica_urls_env.split(',') if url.strip()]
+    else:
+        DB_REPLICA_URLS = list(cf.DB_REPLICA_URLS) if hasattr(cf, 'DB_REPLICA_URLS') else []
+    DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS') or (cf.DB_REPLICA_STICKY_SECONDS if hasattr(cf, 'DB_REPLICA_STICKY_SECONDS') else 5))
+
+    # SQL语句缓存容量
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE') or (cf.DB_STATEMENT_CACHE_SIZE if hasattr(cf, 'DB_STATEMENT_CACHE_SIZE') else 256))
+
+    # 批量写入每批行数
+    DB_BULK_CHUNK_SIZE = int(os.getenv('DB_BULK_CHUNK_SIZE') or (cf.DB_BULK_CHUNK_SIZE if hasattr(cf, 'DB_BULK_CHUNK_SIZE') else 500))
+    DB_STREAM_BATCH_SIZE = int(os.getenv('DB_STREAM_BATCH_SIZE') or (cf.DB_STREAM_BATCH_SIZE if hasattr(cf, 'DB_STREAM_BATCH_SIZE') else 500))
+
+    # 语句耗时统计与慢查询日志（优先使用环境变量）
+    _query_stats_env = os.getenv('DB_QUERY_STATS_ENABLED')
+    if _query_stats_env is not None:
+        DB_QUERY_STATS_ENABLED = _query_stats_env.lower() in ('1', 'true', 'yes', 'on')
+    else:
+        DB_QUERY_STATS_ENABLED = cf.DB_QUERY_STATS_ENABLED if hasattr(cf, 'DB_QUERY_STATS_ENABLED') else True
+    DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS') or (cf.DB_SLOW_QUERY_MS if hasattr(cf, 'DB_SLOW_QUERY_MS') else 200))
+
+    # 列表总数计数缓存与近似计数上限
+    COUNT_CACHE_TTL = float(os.getenv('COUNT_CACHE_TTL') or (cf.COUNT_CACHE_TTL if hasattr(cf, 'COUNT_CACHE_TTL') else 60))
+    COUNT_CACHE_SIZE = int(os.getenv('COUNT_CACHE_SIZE') or (cf.COUNT_CACHE_SIZE if hasattr(cf, 'COUNT_CACHE_SIZE') else 4096))
+    COUNT_APPROX_CAP = int(os.getenv('COUNT_APPROX_CAP') or (cf.COUNT_APPROX_CAP if hasattr(cf, 'COUNT_APPROX_CAP') else 1000))
+
+    # 个人提示词库缓存
+    PROMPT_CACHE_TTL = float(os.getenv('PROMPT_CACHE_TTL') or (cf.PROMPT_CACHE_TTL if hasattr(cf, 'PROMPT_CACHE_TTL') else 30))
+    PROMPT_CACHE_SIZE = int(os.getenv('PROMPT_CACHE_SIZE') or (cf.PROMPT_CACHE_SIZE if hasattr(cf, 'PROMPT_CACHE_SIZE') else 2048))
+
+    # 计数合并写入
+    COUNTER_FLUSH_INTERVAL_MS = float(os.getenv('COUNTER_FLUSH_INTERVAL_MS') or (cf.COUNTER_FLUSH_INTERVAL_MS if hasattr(cf, 'COUNTER_FLUSH_INTERVAL_MS') else 1000))
+    COUNTER_FLUSH_MAX_EVENTS = int(os.getenv('COUNTER_FLUSH_MAX_EVENTS') or (cf.COUNTER_FLUSH_MAX_EVENTS if hasattr(cf, 'COUNTER_FLUSH_MAX_EVENTS') else 1000))
+
+    # 版本差量存储关键帧间隔
+    VERSION_KEYFRAME_INTERVAL = int(os.getenv('VERSION_KEYFRAME_INTERVAL') or (cf.VERSION_KEYFRAME_INTERVAL if hasattr(cf, 'VERSION_KEYFRAME_INTERVAL') else 10))
+
+    # 大文本外置阈值（字符数）
+    TEXT_BLOB_MIN_CHARS = int(os.getenv('TEXT_BLOB_MIN_CHARS') or (cf.TEXT_BLOB_MIN_CHARS if hasattr(cf, 'TEXT_BLOB_MIN_CHARS') else 2048))
+
+    # 大文本列透明压缩（环境变量中 表.列 以逗号分隔，设为空字符串可关闭）
+    _compression_columns_env = os.getenv('COLUMN_COMPRESSION_COLUMNS')
+    if _compression_columns_env is not None:
+        COLUMN_COMPRESSION_COLUMNS = [name.strip() for name in _compression_columns_env.split(',') if name.strip()]
+    else:
+        COLUMN_COMPRESSION_COLUMNS = list(getattr(cf, 'COLUMN_COMPRESSION_COLUMNS', BaseConfig.COLUMN_COMPRESSION_COLUMNS))
+    COLUMN_COMPRESSION_MIN_BYTES = int(os.getenv('COLUMN_COMPRESSION_MIN_BYTES') or (cf.COLUMN_COMPRESSION_MIN_BYTES if hasattr(cf, 'COLUMN_COMPRESSION_MIN_BYTES') else 1024))
+    COLUMN_COMPRESSION_ALGORITHM = str(os.getenv('COLUMN_COMPRESSION_ALGORITHM') or (cf.COLUMN_COMPRESSION_ALGORITHM if hasattr(cf, 'COLUMN_COMPRESSION_ALGORITHM') else 'zstd'))
+    COLUMN_COMPRESSION_OFFLOAD_BYTES = int(os.getenv('COLUMN_COMPRESSION_OFFLOAD_BYTES') or (cf.COLUMN_COMPRESSION_OFFLOAD_BYTES if hasattr(cf, 'COLUMN_COMPRESSION_OFFLOAD_BYTES') else 262144))
+
+    # 版本对比差异缓存
+    DIFF_CACHE_TTL = float(os.getenv('DIFF_CACHE_TTL') or (cf.DIFF_CACHE_TTL if hasattr(cf, 'DIFF_CACHE_TTL') else 600))
+    DIFF_CACHE_SIZE = int(os.getenv('DIFF_CACHE_SIZE') or (cf.DIFF_CACHE_SIZE if hasattr(cf, 'DIFF_CACHE_SIZE') else 512))
+
+    # 内容哈希线程池阈值
+    CONTENT_HASH_OFFLOAD_BYTES = int(os.getenv('CONTENT_HASH_OFFLOAD_BYTES') or (cf.CONTENT_HASH_OFFLOAD_BYTES if hasattr(cf, 'CONTENT_HASH_OFFLOAD_BYTES') else 262144))
+
+    # 连接池配置（优先使用环境变量）
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE') or (cf.DB_POOL_SIZE if hasattr(cf, 'DB_POOL_SIZE') else 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW') or (cf.DB_MAX_OVERFLOW if hasattr(cf, 'DB_MAX_OVERFLOW') else 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT') or (cf.DB_POOL_TIMEOUT if hasattr(cf, 'DB_POOL_TIMEOUT') else 30))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE') or (cf.DB_POOL_RECYCLE if hasattr(cf, 'DB_POOL_RECYCLE') else 3600))
+    _pool_pre_ping_env = os.getenv('DB_POOL_PRE_PING')
+    if _pool_pre_ping_env is not None:
+        DB_POOL_PRE_PING = _pool_pre_ping_env.lower() in ('1', 'true', 'yes', 'on')
+    else:
+        DB_POOL_PRE_PING = cf.DB_POOL_PRE_PING if hasattr(cf, 'DB_POOL_PRE_PING') else True
+
     # JWT配置（优先使用环境变量）
     SECRET_KEY = os.getenv('SECRET_KEY') or cf.SECRET_KEY
     
@@ -43,3 +124,4 @@ class Config(BaseConfig):
     # 日志配置（优先使用环境变量）
     LOGGING_INFO_FILE = os.getenv('LOGGING_INFO_FILE') or (cf.LOGGING_INFO_FILE if hasattr(cf, 'LOGGING_INFO_FILE') else '../data/logs/backend/info.log')
     LOGGING_ERROR_FILE = os.getenv('LOGGING_ERROR_FILE') or (cf.LOGGING_ERROR_FILE if hasattr(cf, 'LOGGING_ERROR_FILE') else '../data/logs/backend/error.log')
+    LOGGING_SLOW_QUERY_FILE = os.getenv('LOGGING_SLOW_QUERY_FILE') or (cf.LOGGING_SLOW_QUERY_FILE if hasattr(cf, 'LOGGING_SLOW_QUERY_FILE') else '../data/logs/backend/slow_query.log')
@@ -0,0 +1,8 @@
+-- ==========================================
+-- 升级脚本: 为 MySQL 提示词表新增内容字段摘要
+-- 在执行前确保已备份数据
+-- 旧数据的摘要在首次保存时按正文计算并回写，无需回填
+-- ==========================================
+
+ALTER TABLE `prompts`
+  ADD COLUMN `content_digests` TEXT DEFAULT NULL COMMENT '核心内容各字段摘要(JSON)' AFTER `content_hash`;
@@ -0,0 +1,7 @@
+-- ==========================================
+-- 升级脚本: 为 SQLite 提示词表新增内容字段摘要
+-- 说明: SQLite 不支持 IF NOT EXISTS，重复执行会提示列已存在，可忽略
+--       旧数据的摘要在首次保存时按正文计算并回写，无需回填
+-- ==========================================
+
+ALTER TABLE prompts ADD COLUMN content_digests TEXT DEFAULT NULL;
@@ -0,0 +1,7 @@
+-- ==========================================
+-- 升级脚本: 为 MySQL 新增提示词全文检索（ngram 解析器，支持中文）
+-- 在执行前确保已备份数据；大表建索引耗时较长，建议在低峰期执行
+-- ==========================================
+
+ALTER TABLE `prompts`
+  ADD FULLTEXT KEY `ft_prompts_search` (`title`, `description`, `final_prompt`) WITH PARSER ngram;
@@ -0,0 +1,38 @@
+-- ==========================================
+-- 升级脚本: 为 SQLite 新增提示词全文检索（FTS5）
+-- 说明: 使用 IF NOT EXISTS，可重复执行；末尾 rebuild 为已有数据建立索引
+-- ==========================================
+
+-- 全文检索：FTS5 外部内容表（trigram 分词，中文按子串匹配，需 SQLite 3.34+），由触发器与 prompts 同步
+CREATE VIRTUAL TABLE IF NOT EXISTS prompts_fts USING fts5(
+  title, description, final_prompt,
+  content='prompts', content_rowid='id', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS prompts_fts_insert
+AFTER INSERT ON prompts
+FOR EACH ROW
+BEGIN
+  INSERT INTO prompts_fts(rowid, title, description, final_prompt)
+  VALUES (NEW.id, NEW.title, NEW.description, NEW.final_prompt);
+END;
+
+CREATE TRIGGER IF NOT EXISTS prompts_fts_delete
+AFTER DELETE ON prompts
+FOR EACH ROW
+BEGIN
+  INSERT INTO prompts_fts(prompts_fts, rowid, title, description, final_prompt)
+  VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.final_prompt);
+END;
+
+CREATE TRIGGER IF NOT EXISTS prompts_fts_update
+AFTER UPDATE OF title, description, final_prompt ON prompts
+FOR EACH ROW
+BEGIN
+  INSERT INTO prompts_fts(prompts_fts, rowid, title, description, final_prompt)
+  VALUES ('delete', OLD.id, OLD.title, OLD.description, OLD.final_prompt);
+  INSERT INTO prompts_fts(rowid, title, description, final_prompt)
+  VALUES (NEW.id, NEW.title, NEW.description, NEW.final_prompt);
+END;
+
+INSERT INTO prompts_fts(prompts_fts) VALUES ('rebuild');
@@ -0,0 +1,21 @@
+-- ==========================================
+-- 升级脚本: 为 MySQL 新增游标（keyset）分页复合索引
+-- 在执行前确保已备份数据
+-- ==========================================
+
+ALTER TABLE `prompts`
+  ADD KEY `idx_prompts_user_create` (`user_id`, `create_time`, `id`),
+  ADD KEY `idx_prompts_user_update` (`user_id`, `update_time`, `id`),
+  ADD KEY `idx_prompts_user_views` (`user_id`, `view_count`, `id`),
+  ADD KEY `idx_prompts_user_uses` (`user_id`, `use_count`, `id`),
+  ADD KEY `idx_prompts_public_latest` (`is_public`, `create_time`, `id`),
+  ADD KEY `idx_prompts_public_hot` (`is_public`, `hot_score`, `create_time`, `id`);
+
+ALTER TABLE `prompt_versions`
+  ADD KEY `idx_versions_prompt_keyset` (`prompt_id`, `is_deleted`, `create_time`, `id`);
+
+ALTER TABLE `prompt_comments`
+  ADD KEY `idx_comments_prompt_keyset` (`prompt_id`, `is_deleted`, `create_time`, `id`);
+
+ALTER TABLE `playground_shares`
+  ADD KEY `idx_playground_share_user_time` (`user_id`, `create_time`, `id`);
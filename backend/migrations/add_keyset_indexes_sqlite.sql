@@ -0,0 +1,14 @@
+-- ==========================================
+-- 升级脚本: 为 SQLite 新增游标（keyset）分页复合索引
+-- 说明: 使用 IF NOT EXISTS，可重复执行
+-- ==========================================
+
+CREATE INDEX IF NOT EXISTS idx_prompts_user_create ON prompts(user_id, create_time, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_user_update ON prompts(user_id, update_time, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_user_views ON prompts(user_id, view_count, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_user_uses ON prompts(user_id, use_count, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_public_latest ON prompts(is_public, create_time, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_public_hot ON prompts(is_public, hot_score, create_time, id);
+CREATE INDEX IF NOT EXISTS idx_versions_prompt_keyset ON prompt_versions(prompt_id, is_deleted, create_time, id);
+CREATE INDEX IF NOT EXISTS idx_comments_prompt_keyset ON prompt_comments(prompt_id, is_deleted, create_time, id);
+CREATE INDEX IF NOT EXISTS idx_playground_share_user_time ON playground_shares(user_id, create_time, id);
@@ -0,0 +1,12 @@
+-- ==========================================
+-- 升级脚本: 为 MySQL 提示词表新增正文预览列（列表 view=summary 使用）
+-- 在执行前确保已备份数据
+-- ==========================================
+
+ALTER TABLE `prompts`
+  ADD COLUMN `preview` VARCHAR(255) DEFAULT NULL COMMENT '正文预览（列表摘要视图）' AFTER `content_digests`;
+
+-- 回填：换行与制表符替换为空格后截取前 200 个字符（新保存的数据还会折叠连续空白）
+UPDATE `prompts`
+SET `preview` = LEFT(TRIM(REPLACE(REPLACE(REPLACE(COALESCE(`final_prompt`, ''), CHAR(13), ' '), CHAR(10), ' '), CHAR(9), ' ')), 200)
+WHERE `preview` IS NULL;
@@ -0,0 +1,11 @@
+-- ==========================================
+-- 升级脚本: 为 SQLite 提示词表新增正文预览列（列表 view=summary 使用）
+-- 说明: SQLite 不支持 IF NOT EXISTS，重复执行会提示列已存在，可忽略
+-- ==========================================
+
+ALTER TABLE prompts ADD COLUMN preview VARCHAR(255) DEFAULT NULL;
+
+-- 回填：换行与制表符替换为空格后截取前 200 个字符（新保存的数据还会折叠连续空白）
+UPDATE prompts
+SET preview = SUBSTR(TRIM(REPLACE(REPLACE(REPLACE(COALESCE(final_prompt, ''), CHAR(13), ' '), CHAR(10), ' '), CHAR(9), ' ')), 1, 200)
+WHERE preview IS NULL;
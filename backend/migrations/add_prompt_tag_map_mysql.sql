@@ -0,0 +1,48 @@
+-- ==========================================
+-- 升级脚本: 为 MySQL 新增提示词-标签关联表，并从 prompts.tags 回填
+-- 需要 MySQL 8.0+（递归 CTE）；在执行前确保已备份数据
+-- ==========================================
+
+ALTER TABLE `prompt_tags`
+  ADD KEY `idx_tags_name` (`tag_name`);
+
+CREATE TABLE IF NOT EXISTS `prompt_tag_map` (
+  `prompt_id` INT(11) NOT NULL,
+  `tag_id` INT(11) NOT NULL,
+  
+  PRIMARY KEY (`prompt_id`, `tag_id`),
+  KEY `idx_tag_map_tag` (`tag_id`, `prompt_id`),
+  CONSTRAINT `fk_tag_map_prompt_id` FOREIGN KEY (`prompt_id`) REFERENCES `prompts` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_tag_map_tag_id` FOREIGN KEY (`tag_id`) REFERENCES `prompt_tags` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='提示词-标签关联表';
+
+-- 补齐 prompt_tags 中缺失的标签（兼容旧数据中的列表字符串，如 "['a', 'b']"）
+INSERT IGNORE INTO `prompt_tags` (`user_id`, `tag_name`, `use_count`)
+WITH RECURSIVE split (prompt_id, user_id, tag_name, rest) AS (
+  SELECT `id`, `user_id`, CAST('' AS CHAR(500)), CAST(CONCAT(REPLACE(REPLACE(REPLACE(REPLACE(`tags`, '[', ''), ']', ''), '"', ''), '''', ''), ',') AS CHAR(600))
+  FROM `prompts` WHERE `tags` IS NOT NULL AND `tags` <> ''
+  UNION ALL
+  SELECT prompt_id, user_id, TRIM(SUBSTRING_INDEX(rest, ',', 1)), SUBSTRING(rest, LOCATE(',', rest) + 1)
+  FROM split WHERE rest <> ''
+)
+SELECT user_id, LEFT(tag_name, 50), COUNT(*) FROM split
+WHERE tag_name <> ''
+GROUP BY user_id, LEFT(tag_name, 50);
+
+-- 回填关联
+INSERT IGNORE INTO `prompt_tag_map` (`prompt_id`, `tag_id`)
+WITH RECURSIVE split (prompt_id, user_id, tag_name, rest) AS (
+  SELECT `id`, `user_id`, CAST('' AS CHAR(500)), CAST(CONCAT(REPLACE(REPLACE(REPLACE(REPLACE(`tags`, '[', ''), ']', ''), '"', ''), '''', ''), ',') AS CHAR(600))
+  FROM `prompts` WHERE `tags` IS NOT NULL AND `tags` <> ''
+  UNION ALL
+  SELECT prompt_id, user_id, TRIM(SUBSTRING_INDEX(rest, ',', 1)), SUBSTRING(rest, LOCATE(',', rest) + 1)
+  FROM split WHERE rest <> ''
+)
+SELECT s.prompt_id, t.id FROM split s
+JOIN `prompt_tags` t ON t.user_id = s.user_id AND t.tag_name = LEFT(s.tag_name, 50)
+WHERE s.tag_name <> '';
+
+-- use_count 统一为“使用该标签的提示词数”，按关联表重算
+UPDATE prompt_tags SET use_count = (
+  SELECT COUNT(*) FROM prompt_tag_map m WHERE m.tag_id = prompt_tags.id
+);
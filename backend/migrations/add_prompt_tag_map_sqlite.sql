@@ -0,0 +1,49 @@
+-- ==========================================
+-- 升级脚本: 为 SQLite 新增提示词-标签关联表，并从 prompts.tags 回填
+-- 说明: 使用 IF NOT EXISTS / INSERT OR IGNORE，可重复执行
+-- ==========================================
+
+CREATE INDEX IF NOT EXISTS idx_tags_name ON prompt_tags(tag_name);
+
+-- 提示词-标签关联表（按标签筛选走索引，替代 prompts.tags 上的 LIKE 扫描）
+CREATE TABLE IF NOT EXISTS prompt_tag_map (
+  prompt_id INTEGER NOT NULL,
+  tag_id INTEGER NOT NULL,
+  
+  PRIMARY KEY (prompt_id, tag_id),
+  FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE,
+  FOREIGN KEY (tag_id) REFERENCES prompt_tags(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_tag_map_tag ON prompt_tag_map(tag_id, prompt_id);
+
+-- 补齐 prompt_tags 中缺失的标签（兼容旧数据中的列表字符串，如 "['a', 'b']"）
+WITH RECURSIVE split(prompt_id, user_id, tag_name, rest) AS (
+  SELECT id, user_id, '', REPLACE(REPLACE(REPLACE(REPLACE(tags, '[', ''), ']', ''), '"', ''), '''', '') || ','
+  FROM prompts WHERE tags IS NOT NULL AND tags <> ''
+  UNION ALL
+  SELECT prompt_id, user_id, TRIM(SUBSTR(rest, 1, INSTR(rest, ',') - 1)), SUBSTR(rest, INSTR(rest, ',') + 1)
+  FROM split WHERE rest <> ''
+)
+INSERT OR IGNORE INTO prompt_tags (user_id, tag_name, use_count)
+SELECT user_id, SUBSTR(tag_name, 1, 50), COUNT(*) FROM split
+WHERE tag_name <> ''
+GROUP BY user_id, SUBSTR(tag_name, 1, 50);
+
+-- 回填关联
+WITH RECURSIVE split(prompt_id, user_id, tag_name, rest) AS (
+  SELECT id, user_id, '', REPLACE(REPLACE(REPLACE(REPLACE(tags, '[', ''), ']', ''), '"', ''), '''', '') || ','
+  FROM prompts WHERE tags IS NOT NULL AND tags <> ''
+  UNION ALL
+  SELECT prompt_id, user_id, TRIM(SUBSTR(rest, 1, INSTR(rest, ',') - 1)), SUBSTR(rest, INSTR(rest, ',') + 1)
+  FROM split WHERE rest <> ''
+)
+INSERT OR IGNORE INTO prompt_tag_map (prompt_id, tag_id)
+SELECT s.prompt_id, t.id FROM split s
+JOIN prompt_tags t ON t.user_id = s.user_id AND t.tag_name = SUBSTR(s.tag_name, 1, 50)
+WHERE s.tag_name <> '';
+
+-- use_count 统一为“使用该标签的提示词数”，按关联表重算
+UPDATE prompt_tags SET use_count = (
+  SELECT COUNT(*) FROM prompt_tag_map m WHERE m.tag_id = prompt_tags.id
+);
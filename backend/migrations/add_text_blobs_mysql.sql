@@ -0,0 +1,15 @@
+-- ==========================================
+-- 升级脚本: MySQL 新增大文本去重存储表
+-- 在执行前确保已备份数据
+-- 已有版本与分享中的原文可继续正常读取；如需外置以节省空间，由管理员调用
+-- POST /api/system/compact-versions 与 POST /api/system/compact-shares
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS `text_blobs` (
+  `hash` VARCHAR(64) NOT NULL COMMENT '原文 SHA-256',
+  `compressed_body` LONGBLOB NOT NULL COMMENT '压缩后的原文',
+  `size` INT(11) NOT NULL DEFAULT 0 COMMENT '原文字符数',
+  `refcount` INT(11) NOT NULL DEFAULT 0 COMMENT '引用该文本的行数',
+  `create_time` DATETIME DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='大文本去重存储表';
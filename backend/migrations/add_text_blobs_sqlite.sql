@@ -0,0 +1,13 @@
+-- ==========================================
+-- 升级脚本: SQLite 新增大文本去重存储表
+-- 已有版本与分享中的原文可继续正常读取；如需外置以节省空间，由管理员调用
+-- POST /api/system/compact-versions 与 POST /api/system/compact-shares
+-- ==========================================
+
+CREATE TABLE IF NOT EXISTS text_blobs (
+  hash VARCHAR(64) PRIMARY KEY,
+  compressed_body BLOB NOT NULL,
+  size INTEGER NOT NULL DEFAULT 0,
+  refcount INTEGER NOT NULL DEFAULT 0,
+  create_time DATETIME DEFAULT CURRENT_TIMESTAMP
+);
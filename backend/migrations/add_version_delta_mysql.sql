@@ -0,0 +1,13 @@
+-- ==========================================
+-- 升级脚本: 为 MySQL 版本表新增差量存储列
+-- 在执行前确保已备份数据
+-- 已有版本保持完整快照（storage_type='full'），可继续正常读取；
+-- 如需转换为关键帧+差量以节省空间，由管理员调用 POST /api/system/compact-versions
+-- ==========================================
+
+ALTER TABLE `prompt_versions`
+  ADD COLUMN `storage_type` VARCHAR(10) DEFAULT 'full' COMMENT '存储方式: full(完整快照/关键帧)/delta(相对关键帧的差量)' AFTER `is_deleted`,
+  ADD COLUMN `base_version_id` INT(11) DEFAULT NULL COMMENT '差量所基于的关键帧版本ID' AFTER `storage_type`,
+  ADD COLUMN `delta_data` MEDIUMTEXT DEFAULT NULL COMMENT '差量(JSON)' AFTER `base_version_id`;
+
+UPDATE `prompt_versions` SET `storage_type` = 'full' WHERE `storage_type` IS NULL;
@@ -0,0 +1,12 @@
+-- ==========================================
+-- 升级脚本: 为 SQLite 版本表新增差量存储列
+-- 说明: SQLite 不支持 IF NOT EXISTS，重复执行会提示列已存在，可忽略
+-- 已有版本保持完整快照（storage_type='full'），可继续正常读取；
+-- 如需转换为关键帧+差量以节省空间，由管理员调用 POST /api/system/compact-versions
+-- ==========================================
+
+ALTER TABLE prompt_versions ADD COLUMN storage_type VARCHAR(10) DEFAULT 'full';
+ALTER TABLE prompt_versions ADD COLUMN base_version_id INTEGER DEFAULT NULL;
+ALTER TABLE prompt_versions ADD COLUMN delta_data TEXT DEFAULT NULL;
+
+UPDATE prompt_versions SET storage_type = 'full' WHERE storage_type IS NULL;
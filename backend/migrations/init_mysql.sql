@@ -72,6 +72,8 @@ CREATE TABLE `prompts` (
   `system_prompt` TEXT DEFAULT NULL COMMENT '系统提示词（用户提示词上下文）',
   `conversation_history` TEXT DEFAULT NULL COMMENT '对话历史（用户提示词上下文）',
   `content_hash` VARCHAR(64) DEFAULT NULL COMMENT '核心提示词内容哈希',
+  `content_digests` TEXT DEFAULT NULL COMMENT '核心内容各字段摘要(JSON)',
+  `preview` VARCHAR(255) DEFAULT NULL COMMENT '正文预览（列表摘要视图）',
   
   -- 状态标记
   `is_favorite` TINYINT(1) DEFAULT 0,
@@ -104,6 +106,13 @@ CREATE TABLE `prompts` (
   KEY `idx_prompts_like_count` (`like_count` DESC),
   KEY `idx_prompts_public_create_time` (`is_public`, `create_time` DESC),
   KEY `idx_prompts_public_hot_score` (`is_public`, `hot_score` DESC),
+  KEY `idx_prompts_user_create` (`user_id`, `create_time`, `id`),
+  KEY `idx_prompts_user_update` (`user_id`, `update_time`, `id`),
+  KEY `idx_prompts_user_views` (`user_id`, `view_count`, `id`),
+  KEY `idx_prompts_user_uses` (`user_id`, `use_count`, `id`),
+  KEY `idx_prompts_public_latest` (`is_public`, `create_time`, `id`),
+  KEY `idx_prompts_public_hot` (`is_public`, `hot_score`, `create_time`, `id`),
+  FULLTEXT KEY `ft_prompts_search` (`title`, `description`, `final_prompt`) WITH PARSER ngram,
   CONSTRAINT `fk_prompts_user_id` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='提示词表';
 
@@ -154,6 +163,11 @@ CREATE TABLE `prompt_versions` (
   `is_auto_save` TINYINT(1) DEFAULT 0,
   `is_deleted` TINYINT(1) DEFAULT 0,
   
+  -- 差量存储
+  `storage_type` VARCHAR(10) DEFAULT 'full' COMMENT '存储方式: full(完整快照/关键帧)/delta(相对关键帧的差量)',
+  `base_version_id` INT(11) DEFAULT NULL COMMENT '差量所基于的关键帧版本ID',
+  `delta_data` MEDIUMTEXT DEFAULT NULL COMMENT '差量(JSON)',
+  
   `create_time` DATETIME DEFAULT CURRENT_TIMESTAMP,
   
   PRIMARY KEY (`id`),
@@ -161,6 +175,7 @@ CREATE TABLE `prompt_versions` (
   KEY `idx_versions_prompt_id` (`prompt_id`),
   KEY `idx_versions_created_by` (`created_by`),
   KEY `idx_versions_create_time` (`create_time`),
+  KEY `idx_versions_prompt_keyset` (`prompt_id`, `is_deleted`, `create_time`, `id`),
   CONSTRAINT `fk_versions_prompt_id` FOREIGN KEY (`prompt_id`) REFERENCES `prompts` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_versions_created_by` FOREIGN KEY (`created_by`) REFERENCES `users` (`id`) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='提示词版本表';
@@ -179,9 +194,24 @@ CREATE TABLE `prompt_tags` (
   PRIMARY KEY (`id`),
   UNIQUE KEY `uk_user_tag` (`user_id`, `tag_name`),
   KEY `idx_tags_user_id` (`user_id`),
+  KEY `idx_tags_name` (`tag_name`),
   CONSTRAINT `fk_tags_user_id` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='标签表';
 
+-- ----------------------------
+-- 提示词-标签关联表
+-- ----------------------------
+DROP TABLE IF EXISTS `prompt_tag_map`;
+CREATE TABLE `prompt_tag_map` (
+  `prompt_id` INT(11) NOT NULL,
+  `tag_id` INT(11) NOT NULL,
+  
+  PRIMARY KEY (`prompt_id`, `tag_id`),
+  KEY `idx_tag_map_tag` (`tag_id`, `prompt_id`),
+  CONSTRAINT `fk_tag_map_prompt_id` FOREIGN KEY (`prompt_id`) REFERENCES `prompts` (`id`) ON DELETE CASCADE,
+  CONSTRAINT `fk_tag_map_tag_id` FOREIGN KEY (`tag_id`) REFERENCES `prompt_tags` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='提示词-标签关联表';
+
 -- ----------------------------
 -- 分享表
 -- ----------------------------
@@ -248,10 +278,24 @@ CREATE TABLE `playground_shares` (
   UNIQUE KEY `uk_playground_share_code` (`share_code`),
   KEY `idx_playground_share_user` (`user_id`),
   KEY `idx_playground_share_prompt` (`prompt_id`),
+  KEY `idx_playground_share_user_time` (`user_id`, `create_time`, `id`),
   CONSTRAINT `fk_playground_share_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_playground_share_prompt` FOREIGN KEY (`prompt_id`) REFERENCES `prompts` (`id`) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='操练场分享表';
 
+-- ----------------------------
+-- 大文本去重存储表（版本关键帧、操练场分享中的大文本按内容哈希只存一份）
+-- ----------------------------
+DROP TABLE IF EXISTS `text_blobs`;
+CREATE TABLE `text_blobs` (
+  `hash` VARCHAR(64) NOT NULL COMMENT '原文 SHA-256',
+  `compressed_body` LONGBLOB NOT NULL COMMENT '压缩后的原文',
+  `size` INT(11) NOT NULL DEFAULT 0 COMMENT '原文字符数',
+  `refcount` INT(11) NOT NULL DEFAULT 0 COMMENT '引用该文本的行数',
+  `create_time` DATETIME DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='大文本去重存储表';
+
 -- ----------------------------
 -- 用户提示词规则表
 -- ----------------------------
@@ -387,6 +431,7 @@ CREATE TABLE `prompt_comments` (
   KEY `idx_comments_parent_id` (`parent_id`),
   KEY `idx_comments_create_time` (`create_time`),
   KEY `idx_comments_is_deleted` (`is_deleted`),
+  KEY `idx_comments_prompt_keyset` (`prompt_id`, `is_deleted`, `create_time`, `id`),
   CONSTRAINT `fk_comments_prompt_id` FOREIGN KEY (`prompt_id`) REFERENCES `prompts` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_comments_user_id` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_comments_parent_id` FOREIGN KEY (`parent_id`) REFERENCES `prompt_comments` (`id`) ON DELETE CASCADE
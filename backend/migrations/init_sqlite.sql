@@ -98,6 +98,8 @@ CREATE TABLE IF NOT EXISTS prompts (
   system_prompt TEXT DEFAULT NULL,
   conversation_history TEXT DEFAULT NULL,
   content_hash VARCHAR(64) DEFAULT NULL,
+  content_digests TEXT DEFAULT NULL,
+  preview VARCHAR(255) DEFAULT NULL,
   
   -- 状态标记
   is_favorite INTEGER DEFAULT 0,
@@ -128,6 +130,16 @@ CREATE INDEX IF NOT EXISTS idx_prompts_user_id ON prompts(user_id);
 CREATE INDEX IF NOT EXISTS idx_prompts_is_favorite ON prompts(is_favorite);
 CREATE INDEX IF NOT EXISTS idx_prompts_is_public ON prompts(is_public);
 CREATE INDEX IF NOT EXISTS idx_prompts_create_time ON prompts(create_time);
+-- 游标分页复合索引：(筛选列, 排序键, id)
+CREATE INDEX IF NOT EXISTS idx_prompts_user_create ON prompts(user_id, create_time, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_user_update ON prompts(user_id, update_time, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_user_views ON prompts(user_id, view_count, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_user_uses ON prompts(user_id, use_count, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_public_latest ON prompts(is_public, create_time, id);
+CREATE INDEX IF NOT EXISTS idx_prompts_public_hot ON prompts(is_public, hot_score, create_time, id);
+
+-- 全文检索（FTS5 trigram，需 SQLite 3.34+）不在此创建：新库初始化时检测支持后执行
+-- add_fulltext_search_sqlite.sql，不支持时关键词搜索退回 LIKE
 
 -- 提示词版本表
 CREATE TABLE IF NOT EXISTS prompt_versions (
@@ -173,6 +185,11 @@ CREATE TABLE IF NOT EXISTS prompt_versions (
   is_auto_save INTEGER DEFAULT 0,
   is_deleted INTEGER DEFAULT 0,
   
+  -- 差量存储：full 为完整快照（关键帧）；delta 时大文本字段为空，内容由 base_version_id 指向的关键帧加 delta_data 还原
+  storage_type VARCHAR(10) DEFAULT 'full',
+  base_version_id INTEGER DEFAULT NULL,
+  delta_data TEXT DEFAULT NULL,
+  
   create_time DATETIME DEFAULT CURRENT_TIMESTAMP,
   
   FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE,
@@ -183,6 +200,7 @@ CREATE UNIQUE INDEX IF NOT EXISTS uk_prompt_version ON prompt_versions(prompt_id
 CREATE INDEX IF NOT EXISTS idx_versions_prompt_id ON prompt_versions(prompt_id);
 CREATE INDEX IF NOT EXISTS idx_versions_created_by ON prompt_versions(created_by);
 CREATE INDEX IF NOT EXISTS idx_versions_create_time ON prompt_versions(create_time);
+CREATE INDEX IF NOT EXISTS idx_versions_prompt_keyset ON prompt_versions(prompt_id, is_deleted, create_time, id);
 
 -- 标签表
 CREATE TABLE IF NOT EXISTS prompt_tags (
@@ -197,6 +215,19 @@ CREATE TABLE IF NOT EXISTS prompt_tags (
 
 CREATE UNIQUE INDEX IF NOT EXISTS uk_user_tag ON prompt_tags(user_id, tag_name);
 CREATE INDEX IF NOT EXISTS idx_tags_user_id ON prompt_tags(user_id);
+CREATE INDEX IF NOT EXISTS idx_tags_name ON prompt_tags(tag_name);
+
+-- 提示词-标签关联表（按标签筛选走索引，替代 prompts.tags 上的 LIKE 扫描）
+CREATE TABLE IF NOT EXISTS prompt_tag_map (
+  prompt_id INTEGER NOT NULL,
+  tag_id INTEGER NOT NULL,
+  
+  PRIMARY KEY (prompt_id, tag_id),
+  FOREIGN KEY (prompt_id) REFERENCES prompts(id) ON DELETE CASCADE,
+  FOREIGN KEY (tag_id) REFERENCES prompt_tags(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_tag_map_tag ON prompt_tag_map(tag_id, prompt_id);
 
 -- 分享表
 CREATE TABLE IF NOT EXISTS prompt_shares (
@@ -339,6 +370,7 @@ CREATE TABLE IF NOT EXISTS playground_shares (
 CREATE UNIQUE INDEX IF NOT EXISTS uk_playground_share_code ON playground_shares(share_code);
 CREATE INDEX IF NOT EXISTS idx_playground_share_user ON playground_shares(user_id);
 CREATE INDEX IF NOT EXISTS idx_playground_share_prompt ON playground_shares(prompt_id);
+CREATE INDEX IF NOT EXISTS idx_playground_share_user_time ON playground_shares(user_id, create_time, id);
 
 CREATE TRIGGER IF NOT EXISTS update_playground_shares_timestamp 
 AFTER UPDATE ON playground_shares
@@ -347,6 +379,17 @@ BEGIN
   UPDATE playground_shares SET update_time = CURRENT_TIMESTAMP WHERE id = OLD.id;
 END;
 
+-- ==========================================
+-- 大文本去重存储表（版本关键帧、操练场分享中的大文本按内容哈希只存一份）
+-- ==========================================
+CREATE TABLE IF NOT EXISTS text_blobs (
+  hash VARCHAR(64) PRIMARY KEY,
+  compressed_body BLOB NOT NULL,
+  size INTEGER NOT NULL DEFAULT 0,
+  refcount INTEGER NOT NULL DEFAULT 0,
+  create_time DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ==========================================
 -- 社区功能 - 大厅、点赞、评论
 -- ==========================================
@@ -393,6 +436,7 @@ CREATE INDEX IF NOT EXISTS idx_comments_user_id ON prompt_comments(user_id);
 CREATE INDEX IF NOT EXISTS idx_comments_parent_id ON prompt_comments(parent_id);
 CREATE INDEX IF NOT EXISTS idx_comments_create_time ON prompt_comments(create_time);
 CREATE INDEX IF NOT EXISTS idx_comments_is_deleted ON prompt_comments(is_deleted);
+CREATE INDEX IF NOT EXISTS idx_comments_prompt_keyset ON prompt_comments(prompt_id, is_deleted, create_time, id);
 
 CREATE TRIGGER IF NOT EXISTS update_prompt_comments_timestamp 
 AFTER UPDATE ON prompt_comments